@@ -72,27 +72,18 @@ static int check_standard(const char *judge, size_t jlen, const char *process, s
 }
 
 static PyObject *checker_standard(PyObject *self, PyObject *args) {
-    PyObject *expected, *actual, *result;
+    Py_buffer expected, actual;
+    int passed;
 
     UNREFERENCED_PARAMETER(self);
-    if (!PyArg_ParseTuple(args, "OO:standard", &expected, &actual))
+    // Any bytes-like object will do, so that output captured in a file can be checked straight from its mapping.
+    if (!PyArg_ParseTuple(args, "y*y*:standard", &expected, &actual))
         return NULL;
 
-    if (!PyBytes_Check(expected) || !PyBytes_Check(actual)) {
-        PyErr_SetString(PyExc_ValueError, "expected strings");
-        return NULL;
-    }
-
-    Py_INCREF(expected);
-    Py_INCREF(actual);
-    Py_BEGIN_ALLOW_THREADS result = check_standard(PyBytes_AsString(expected), PyBytes_Size(expected),
-                                                   PyBytes_AsString(actual), PyBytes_Size(actual))
-                                        ? Py_True
-                                        : Py_False;
-    Py_END_ALLOW_THREADS Py_DECREF(expected);
-    Py_DECREF(actual);
-    Py_INCREF(result);
-    return result;
+    Py_BEGIN_ALLOW_THREADS passed = check_standard(expected.buf, expected.len, actual.buf, actual.len);
+    Py_END_ALLOW_THREADS PyBuffer_Release(&expected);
+    PyBuffer_Release(&actual);
+    return PyBool_FromLong(passed);
 }
 
 static PyMethodDef checker_methods[] = { { "standard", checker_standard, METH_VARARGS, "Standard DMOJ checker." },
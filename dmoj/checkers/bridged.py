@@ -3,6 +3,7 @@ import shlex
 import subprocess
 
 from dmoj.contrib import contrib_modules
+from dmoj.contrib.batch import BatchChecker
 from dmoj.error import InternalError
 from dmoj.judgeenv import env, get_problem_root
 from dmoj.result import CheckerResult
@@ -10,12 +11,18 @@ from dmoj.utils.helper_files import compile_with_auxiliary_files, mktemp
 from dmoj.utils.unicode import utf8text
 
 
-def get_executor(problem_id, files, flags, lang, compiler_time_limit):
+def get_executor(problem_id, files, flags, lang, compiler_time_limit, problem=None):
     if isinstance(files, str):
         filenames = [files]
     elif isinstance(files.unwrap(), list):
         filenames = list(files.unwrap())
 
+    if problem is not None:
+        # Compiled once for the problem, rather than looked up in the binary cache by the hash of every source file for
+        # every case.
+        filenames = [os.path.join(problem.root_dir, f) for f in filenames]
+        return problem.get_helper_executor(filenames, list(flags), lang, compiler_time_limit)
+
     filenames = [os.path.join(get_problem_root(problem_id), f) for f in filenames]
     executor = compile_with_auxiliary_files(filenames, flags, lang, compiler_time_limit)
 
@@ -37,16 +44,41 @@ def check(
     type='default',
     args_format_string=None,
     point_value=None,
+    problem=None,
     **kwargs,
 ) -> CheckerResult:
-    executor = get_executor(problem_id, files, flags, lang, compiler_time_limit)
+    executor = get_executor(problem_id, files, flags, lang, compiler_time_limit, problem)
 
     if type not in contrib_modules:
         raise InternalError('%s is not a valid contrib module' % type)
 
-    args_format_string = args_format_string or contrib_modules[type].ContribModule.get_checker_args_format_string()
+    contrib_module = contrib_modules[type].ContribModule
+    # Batch checkers are handed the files they'd get by default, so custom arguments leave them checking case by case.
+    use_batch = problem is not None and getattr(contrib_module, 'supports_batch', False) and not args_format_string
+    args_format_string = args_format_string or contrib_module.get_checker_args_format_string()
 
     with mktemp(judge_input) as input_file, mktemp(process_output) as output_file, mktemp(judge_output) as answer_file:
+        if use_batch:
+            key = ('checker', id(executor), time_limit, memory_limit)
+            batch_checker = problem.helper_processes.get(key)
+            if batch_checker is None:
+                batch_checker = problem.helper_processes.setdefault(
+                    key, BatchChecker(executor, time_limit, memory_limit, contrib_module.batch_exit_codes)
+                )
+            result = batch_checker.check(input_file.name, output_file.name, answer_file.name)
+            if result is not None:
+                return contrib_module.parse_return_code(
+                    result,
+                    executor,
+                    point_value,
+                    time_limit,
+                    memory_limit,
+                    feedback=utf8text(result.stdout) if feedback else '',
+                    name='checker',
+                    stderr=result.stderr,
+                )
+            # Otherwise, the checker is launched for this case alone, as usual.
+
         checker_args = shlex.split(
             args_format_string.format(
                 input_file=shlex.quote(input_file.name),
@@ -61,7 +93,7 @@ def check(
         proc_output, error = process.communicate()
         proc_output = utf8text(proc_output)
 
-        return contrib_modules[type].ContribModule.parse_return_code(
+        return contrib_module.parse_return_code(
             process,
             executor,
             point_value,
@@ -71,3 +103,8 @@ def check(
             name='checker',
             stderr=error,
         )
+
+
+# Test data and output are written to files for the checker straight from their mappings, without copying them.
+check.accepts_buffers = True  # type: ignore
+check.accepts_problem = True  # type: ignore
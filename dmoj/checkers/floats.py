@@ -1,4 +1,6 @@
-from re import split as resplit
+from itertools import zip_longest
+from re import finditer
+from typing import Iterator
 
 from dmoj.error import InternalError
 from dmoj.utils.unicode import utf8bytes
@@ -29,16 +31,16 @@ def verify_default(process_float: float, judge_float: float, epsilon: float) ->
     )
 
 
+def _lines(data) -> Iterator[bytes]:
+    # Discount empty lines. Lines are found one at a time, so that mapped test data is never copied whole.
+    if isinstance(data, str):
+        data = utf8bytes(data)
+    return (match.group() for match in finditer(b'[^\r\n]+', data))
+
+
 def check(
     process_output: bytes, judge_output: bytes, precision: int = 6, error_mode: str = 'default', **kwargs
 ) -> bool:
-    # Discount empty lines
-    process_lines = list(filter(None, resplit(b'[\r\n]', utf8bytes(process_output))))
-    judge_lines = list(filter(None, resplit(b'[\r\n]', utf8bytes(judge_output))))
-
-    if len(process_lines) != len(judge_lines):
-        return False
-
     verify_float = {'absolute': verify_absolute, 'relative': verify_relative, 'default': verify_default}.get(error_mode)
 
     if not verify_float:
@@ -47,7 +49,11 @@ def check(
     epsilon = 10 ** -int(precision)
 
     try:
-        for process_line, judge_line in zip(process_lines, judge_lines):
+        for process_line, judge_line in zip_longest(_lines(process_output), _lines(judge_output)):
+            if process_line is None or judge_line is None:
+                # The line counts differ.
+                return False
+
             process_tokens = process_line.split()
             judge_tokens = judge_line.split()
 
@@ -70,3 +76,6 @@ def check(
     except Exception:
         return False
     return True
+
+
+check.accepts_buffers = True  # type: ignore
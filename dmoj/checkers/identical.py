@@ -2,14 +2,33 @@ from typing import Union
 
 from dmoj.checkers._checker import standard
 from dmoj.result import CheckerResult
+from dmoj.utils.streamed_data import STREAM_CHUNK_SIZE
 from dmoj.utils.unicode import utf8bytes
 
 
+def _identical(a, b) -> bool:
+    # Either side may be a mapping of a multi-gigabyte file, so compare a chunk at a time rather than copying it whole.
+    if len(a) != len(b):
+        return False
+    return all(
+        a[start : start + STREAM_CHUNK_SIZE] == b[start : start + STREAM_CHUNK_SIZE]
+        for start in range(0, len(a), STREAM_CHUNK_SIZE)
+    )
+
+
 def check(process_output: bytes, judge_output: bytes, pe_allowed: bool = True, **kwargs) -> Union[CheckerResult, bool]:
-    if judge_output == process_output:
+    if isinstance(process_output, str):
+        process_output = utf8bytes(process_output)
+    if isinstance(judge_output, str):
+        judge_output = utf8bytes(judge_output)
+
+    if _identical(judge_output, process_output):
         return True
     feedback = None
-    if pe_allowed and standard(utf8bytes(judge_output), utf8bytes(process_output)):
+    if pe_allowed and standard(judge_output, process_output):
         # in the event the standard checker would have passed the problem, raise a presentation error
         feedback = 'Presentation Error, check your whitespace'
     return CheckerResult(False, 0, feedback=feedback)
+
+
+check.accepts_buffers = True  # type: ignore
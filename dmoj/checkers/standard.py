@@ -7,7 +7,14 @@ from ..utils.unicode import utf8bytes
 def check(
     process_output: bytes, judge_output: bytes, _checker: Callable[[bytes, bytes], bool] = standard, **kwargs
 ) -> bool:
-    return _checker(utf8bytes(judge_output), utf8bytes(process_output))
+    if isinstance(process_output, str):
+        process_output = utf8bytes(process_output)
+    if isinstance(judge_output, str):
+        judge_output = utf8bytes(judge_output)
+    return _checker(judge_output, process_output)
 
 
+# The native checker reads any buffer, so mapped output and test data are checked without copying them.
+check.accepts_buffers = True  # type: ignore
+
 del standard
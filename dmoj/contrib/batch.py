@@ -0,0 +1,182 @@
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+from dmoj.contrib.testlib import ContribModule as TestlibContribModule
+from dmoj.utils.unicode import utf8bytes
+
+# Passed as the sole argument to a checker to have it serve cases over its standard input, rather than check one case.
+BATCH_ARGUMENT = '--dmoj-batch'
+# Written by the checker to both stdout and stderr once it's done with a case; the one on stdout is followed by a space,
+# the case's exit code, and a newline.
+BATCH_END_MARKER = b'\0DMOJ-BATCH-END'
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+class BatchCaseResult(NamedTuple):
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+
+
+class BatchChecker:
+    """
+    A checker process that's kept alive to check case after case, instead of being launched anew for every case.
+
+    For each case, the judge writes the paths of the input, output, and answer files to the checker's stdin, one per
+    line. The checker checks the case as it would when passed those paths as arguments, then writes `BATCH_END_MARKER`
+    to stderr, and to stdout followed by the exit code it would have exited with. It exits when its stdin is closed.
+
+    The sandbox can't enforce limits per case on a process that outlives them, so the CPU time and peak memory of each
+    case are read from `/proc` instead, and the peak is reset between cases. Should a case go over its limits, take too
+    long, or leave the checker dead or misbehaving, the checker is killed for good and `check` returns None, so that the
+    case is checked by launching the checker for it alone, which reports whatever went wrong as usual. That's also the
+    case for exit codes outside of `exit_codes`, whose meaning depends on how the checker process ended.
+    """
+
+    def __init__(self, executor, time_limit: float, memory_limit: int, exit_codes: FrozenSet[int]) -> None:
+        self.executor = executor
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.exit_codes = exit_codes
+        self._process: Optional[subprocess.Popen] = None
+        self._broken = not sys.platform.startswith('linux')
+        self._lock = threading.Lock()
+
+    def check(self, input_path: str, output_path: str, answer_path: str) -> Optional[BatchCaseResult]:
+        # Cases checked concurrently don't wait for one another; all but one just launch the checker themselves.
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if self._broken:
+                return None
+            try:
+                result = self._check(input_path, output_path, answer_path)
+            except OSError:
+                result = None
+            if result is None:
+                self.close()
+                self._broken = True
+            elif result.returncode not in self.exit_codes:
+                # The checker is fine, but only a checker launched for this case can say what the exit code means.
+                return None
+            return result
+        finally:
+            self._lock.release()
+
+    def _check(self, input_path: str, output_path: str, answer_path: str) -> Optional[BatchCaseResult]:
+        if self._process is None:
+            self._process = self.executor.launch(
+                BATCH_ARGUMENT,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                memory=self.memory_limit,
+                # Time is accounted for per case below, rather than over the life of the process.
+                time=0,
+            )
+        process = self._process
+        assert process.stdin is not None
+        proc_dir = f'/proc/{process.pid}'
+
+        with open(os.path.join(proc_dir, 'clear_refs'), 'w') as f:
+            # Resets the peak resident set size.
+            f.write('5')
+        start_cpu = self._cpu_time(proc_dir)
+
+        process.stdin.write(b''.join(utf8bytes(path) + b'\n' for path in (input_path, output_path, answer_path)))
+        process.stdin.flush()
+
+        response = self._read_response(process, time.monotonic() + self.time_limit * 3)
+        if response is None:
+            return None
+        returncode, stdout, stderr = response
+
+        if self._cpu_time(proc_dir) - start_cpu > self.time_limit:
+            return None
+        if self.memory_limit and self._peak_memory(proc_dir) > self.memory_limit:
+            return None
+        return BatchCaseResult(returncode, stdout, stderr)
+
+    @staticmethod
+    def _read_response(process, deadline: float) -> Optional[Tuple[int, bytes, bytes]]:
+        buffers = {process.stdout.fileno(): bytearray(), process.stderr.fileno(): bytearray()}
+        stdout, stderr = buffers.values()
+        poller = select.poll()
+        for fd in buffers:
+            poller.register(fd, select.POLLIN)
+
+        while True:
+            end = stdout.find(BATCH_END_MARKER)
+            if end >= 0 and stdout.endswith(b'\n') and stderr.endswith(BATCH_END_MARKER + b'\n'):
+                try:
+                    returncode = int(stdout[end + len(BATCH_END_MARKER) :])
+                except ValueError:
+                    return None
+                return returncode, bytes(stdout[:end]), bytes(stderr[: -len(BATCH_END_MARKER) - 1])
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            for fd, _ in poller.poll(remaining * 1000):
+                data = os.read(fd, 65536)
+                if not data:
+                    # The checker died.
+                    return None
+                buffers[fd] += data
+
+    @staticmethod
+    def _cpu_time(proc_dir: str) -> float:
+        with open(os.path.join(proc_dir, 'stat'), 'rb') as f:
+            # The command name may contain spaces, so the fields are counted from after it; utime and stime are the
+            # 14th and 15th fields.
+            fields = f.read().rsplit(b')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+
+    @staticmethod
+    def _peak_memory(proc_dir: str) -> int:
+        with open(os.path.join(proc_dir, 'status'), 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1])
+        return 0
+
+    def close(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.stdin is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+        process.kill()
+        process.wait()
+        for stream in (process.stdout, process.stderr):
+            if stream is not None:
+                stream.close()
+
+
+class ContribModule(TestlibContribModule):
+    """
+    testlib exit codes, from a checker that can check many cases in one process; see `BatchChecker`. testlib checkers
+    speak this protocol when built with `testlib_batch.h`.
+    """
+
+    name = 'batch'
+    supports_batch = True
+    # Any other exit code is reported by a checker launched for the case alone.
+    batch_exit_codes = frozenset(
+        (
+            TestlibContribModule.AC,
+            TestlibContribModule.WA,
+            TestlibContribModule.PE,
+            TestlibContribModule.IE,
+            TestlibContribModule.PARTIAL,
+        )
+    )
@@ -0,0 +1,102 @@
+/*
+ * Lets a testlib checker check many cases in one process, as the judge's `batch` contrib module expects.
+ *
+ * Include this instead of testlib.h, keep testlib.h alongside it, and list both among the checker's files:
+ *
+ *     checker:
+ *       name: bridged
+ *       args:
+ *         files: [checker.cpp, testlib.h, testlib_batch.h]
+ *         type: batch
+ *
+ * The checker itself needs no changes. Run as usual, it checks the case named by its arguments. Run with --dmoj-batch,
+ * it reads the paths of the input, output, and answer files of case after case from stdin, one per line, and after
+ * each case writes a marker followed by the exit code testlib would have exited with. Global state that a checker
+ * leaves behind is seen by the next case, so checkers must not rely on starting afresh.
+ */
+#ifndef DMOJ_TESTLIB_BATCH_H
+#define DMOJ_TESTLIB_BATCH_H
+
+/* Everything that could declare exit() must be included before it's redefined below. */
+#include <stdlib.h>
+#include <cstdlib>
+#include <climits>
+#include <algorithm>
+#include <cstdio>
+#include <cctype>
+#include <string>
+#include <vector>
+#include <map>
+#include <set>
+#include <cmath>
+#include <iostream>
+#include <sstream>
+#include <fstream>
+#include <cstring>
+#include <limits>
+#include <stdarg.h>
+#include <fcntl.h>
+
+/* testlib ends a check by exiting; here, it throws instead, so that the process can go on to the next case. */
+struct dmoj_batch_exit {
+    int code;
+};
+
+namespace std {
+__attribute__((noreturn)) inline void dmoj_batch_quit(int code) {
+    ::dmoj_batch_exit e;
+    e.code = code;
+    throw e;
+}
+}  // namespace std
+using std::dmoj_batch_quit;
+
+#define exit(code) dmoj_batch_quit(code)
+#include "testlib.h"
+#undef exit
+
+int dmoj_checker_main(int argc, char *argv[]);
+
+static int dmoj_batch_check(int argc, char *argv[]) {
+    int quit_count = testlibFinalizeGuard.quitCount;
+    __testlib_points = std::numeric_limits<float>::infinity();
+    try {
+        dmoj_checker_main(argc, argv);
+        /* What testlib would otherwise complain about when the process exits. */
+        if (testlibFinalizeGuard.quitCount == quit_count)
+            quit(_fail, "Checker must end with quit or quitf call.");
+    } catch (const dmoj_batch_exit &e) {
+        return e.code;
+    }
+    return 0;
+}
+
+int main(int argc, char *argv[]) {
+    int code = 0;
+    if (argc == 2 && !std::strcmp(argv[1], "--dmoj-batch")) {
+        std::string input, output, answer;
+        while (std::getline(std::cin, input) && std::getline(std::cin, output) && std::getline(std::cin, answer)) {
+            char *case_argv[] = {argv[0], &input[0], &output[0], &answer[0], NULL};
+            int case_code = dmoj_batch_check(4, case_argv);
+
+            std::cout.flush();
+            std::cerr.flush();
+            std::fputc('\0', stdout);
+            std::fprintf(stdout, "DMOJ-BATCH-END %d\n", case_code);
+            std::fflush(stdout);
+            std::fputc('\0', stderr);
+            std::fputs("DMOJ-BATCH-END\n", stderr);
+            std::fflush(stderr);
+        }
+    } else {
+        code = dmoj_batch_check(argc, argv);
+    }
+
+    /* Every check has been accounted for above. */
+    disableFinalizeGuard();
+    return code;
+}
+
+#define main dmoj_checker_main
+
+#endif
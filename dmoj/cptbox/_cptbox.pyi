@@ -50,6 +50,7 @@ class Process:
     _cpu_time: int
     _nproc: int
     _fsize: int
+    _cpu_affinity: Optional[List[int]]
 
     use_seccomp: bool
     _trace_syscalls: bool
@@ -91,6 +92,7 @@ PTBOX_SPAWN_FAIL_NO_NEW_PRIVS: int
 PTBOX_SPAWN_FAIL_SECCOMP: int
 PTBOX_SPAWN_FAIL_TRACEME: int
 PTBOX_SPAWN_FAIL_EXECVE: int
+PTBOX_SPAWN_FAIL_SETAFFINITY: int
 
 AT_FDCWD: int
 bsd_get_proc_cwd: Callable[[int], str]
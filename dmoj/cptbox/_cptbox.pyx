@@ -14,7 +14,7 @@ __all__ = ['Process', 'Debugger', 'bsd_get_proc_cwd', 'bsd_get_proc_fdno', 'MAX_
            'PTBOX_ABI_X86', 'PTBOX_ABI_X64', 'PTBOX_ABI_X32', 'PTBOX_ABI_ARM', 'PTBOX_ABI_ARM64',
            'PTBOX_ABI_FREEBSD_X64', 'PTBOX_ABI_INVALID', 'PTBOX_ABI_COUNT',
            'PTBOX_SPAWN_FAIL_NO_NEW_PRIVS', 'PTBOX_SPAWN_FAIL_SECCOMP', 'PTBOX_SPAWN_FAIL_TRACEME',
-           'PTBOX_SPAWN_FAIL_EXECVE']
+           'PTBOX_SPAWN_FAIL_EXECVE', 'PTBOX_SPAWN_FAIL_SETAFFINITY']
 
 
 cdef extern from 'ptbox.h' nogil:
@@ -119,6 +119,8 @@ cdef extern from 'helper.h' nogil:
         int stderr_
         int abi_for_seccomp
         int *seccomp_handlers
+        int *cpu_affinity
+        int cpu_affinity_count
 
     void cptbox_closefrom(int lowfd)
     int cptbox_child_run(child_config *)
@@ -130,6 +132,7 @@ cdef extern from 'helper.h' nogil:
         PTBOX_SPAWN_FAIL_SECCOMP
         PTBOX_SPAWN_FAIL_TRACEME
         PTBOX_SPAWN_FAIL_EXECVE
+        PTBOX_SPAWN_FAIL_SETAFFINITY
 
     int _memory_fd_create "memory_fd_create"()
     int _memory_fd_seal "memory_fd_seal"(int fd)
@@ -416,6 +419,7 @@ cdef class Process:
     cdef public unsigned long _child_memory, _child_address, _child_personality
     cdef public unsigned int _cpu_time
     cdef public int _nproc, _fsize
+    cdef public list _cpu_affinity
     cdef unsigned long _max_memory
 
     cpdef Debugger create_debugger(self):
@@ -483,6 +487,8 @@ cdef class Process:
         config.argv = NULL
         config.envp = NULL
         config.seccomp_handlers = NULL
+        config.cpu_affinity = NULL
+        config.cpu_affinity_count = 0
 
         try:
             config.address_space = self._child_address
@@ -510,12 +516,22 @@ cdef class Process:
                 for i in range(MAX_SYSCALL):
                     config.seccomp_handlers[i] = handlers[i]
 
+            if self._cpu_affinity:
+                config.cpu_affinity = <int*>malloc(sizeof(int) * len(self._cpu_affinity))
+                if not config.cpu_affinity:
+                    PyErr_NoMemory()
+
+                for i, cpu in enumerate(self._cpu_affinity):
+                    config.cpu_affinity[i] = cpu
+                config.cpu_affinity_count = len(self._cpu_affinity)
+
             if self.process.spawn(pt_child, &config):
                 raise RuntimeError('failed to spawn child')
         finally:
             free(config.argv)
             free(config.envp)
             free(config.seccomp_handlers)
+            free(config.cpu_affinity)
 
     cpdef _monitor(self):
         cdef int exitcode
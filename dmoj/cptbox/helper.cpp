@@ -20,7 +20,9 @@
 #include <sys/sysctl.h>
 
 #include <libprocstat.h>
+#include <sys/cpuset.h>
 #else
+#include <sched.h>
 // No ASLR on FreeBSD... not as of 11.0, anyway
 #include <sys/personality.h>
 #include <sys/prctl.h>
@@ -43,7 +45,27 @@ inline void setrlimit2(int resource, rlim_t limit) {
     setrlimit2(resource, limit, limit);
 }
 
+static int cptbox_set_affinity(const struct child_config *config) {
+    // Nothing may be written to stderr here, since it already belongs to the submission.
+#ifdef __FreeBSD__
+    cpuset_t set;
+    CPU_ZERO(&set);
+    for (int i = 0; i < config->cpu_affinity_count; ++i)
+        CPU_SET(config->cpu_affinity[i], &set);
+    return cpuset_setaffinity(CPU_LEVEL_WHICH, CPU_WHICH_PID, -1, sizeof set, &set);
+#else
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    for (int i = 0; i < config->cpu_affinity_count; ++i)
+        CPU_SET(config->cpu_affinity[i], &set);
+    return sched_setaffinity(0, sizeof set, &set);
+#endif
+}
+
 int cptbox_child_run(const struct child_config *config) {
+    if (config->cpu_affinity_count > 0 && cptbox_set_affinity(config))
+        return PTBOX_SPAWN_FAIL_SETAFFINITY;
+
 #ifndef __FreeBSD__
     // There is no ASLR on FreeBSD, but disable it elsewhere
     if (config->personality > 0)
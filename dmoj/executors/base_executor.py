@@ -117,8 +117,14 @@ class BaseExecutor(metaclass=ExecutorMeta):
     fs: List[FilesystemAccessRule] = []
     write_fs: List[FilesystemAccessRule] = []
     syscalls: List[Union[str, Tuple[str, Any]]] = []
+    # Whether several cases may run the submission at once. Executors whose runtime writes to fixed paths in the
+    # submission directory must disable this.
+    supports_concurrent_cases = True
 
     _dir: Optional[str] = None
+    # Whether the directory already holds the agent preloaded into launched processes. Entries in the on-disk binary
+    # cache get theirs before they're committed, and are never written to afterwards.
+    _agent_installed = False
 
     def __init__(
         self,
@@ -250,6 +256,22 @@ class BaseExecutor(metaclass=ExecutorMeta):
             env['CPTBOX_STDOUT_BUFFER_SIZE'] = '0'
         return env
 
+    def _install_agent(self) -> str:
+        agent = self._file('setbufsize.so')
+        # Other threads or processes may be launching from this directory at the same time, so copy the agent under a
+        # name unique to this call and move it into place atomically: a starting process must never preload a partially
+        # copied agent.
+        fd, agent_copy = tempfile.mkstemp(dir=self._dir)
+        os.close(fd)
+        try:
+            shutil.copyfile(setbufsize_path, agent_copy)
+            os.chmod(agent_copy, 0o644)
+            os.replace(agent_copy, agent)
+        except BaseException:
+            os.unlink(agent_copy)
+            raise
+        return agent
+
     def launch(self, *args, **kwargs) -> TracedPopen:
         assert self._dir is not None
         for src, dst in kwargs.get('symlinks', {}).items():
@@ -264,8 +286,7 @@ class BaseExecutor(metaclass=ExecutorMeta):
             else:
                 raise InternalError('cannot symlink outside of submission directory')
 
-        agent = self._file('setbufsize.so')
-        shutil.copyfile(setbufsize_path, agent)
+        agent = self._file('setbufsize.so') if self._agent_installed else self._install_agent()
         env = {
             # Forward LD_LIBRARY_PATH for systems (e.g. Android Termux) that require
             # it to find shared libraries
@@ -294,7 +315,8 @@ class BaseExecutor(metaclass=ExecutorMeta):
             env=env,
             cwd=utf8bytes(self._dir),
             nproc=self.get_nproc(),
-            fsize=self.fsize,
+            fsize=max(self.fsize, kwargs.get('fsize', 0)),
+            cpu_affinity=kwargs.get('cpu_affinity'),
         )
 
     @classmethod
@@ -0,0 +1,195 @@
+import fcntl
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Tuple
+
+from dmoj.judgeenv import env
+
+# Prefix of names in the cache directory that aren't cache entries: locks, and entry manifests being written.
+_RESERVED_PREFIX = '.'
+# Written into an entry once it's completely built, naming the executable relative to the entry.
+_MANIFEST_NAME = '.manifest'
+
+
+class CompiledBinaryCache:
+    """
+    Compiled binaries kept on disk, shared by every judge and worker process on the host, and across restarts.
+
+    An in-memory cache of compiled checkers, interactors and generators dies with the worker process that compiled them,
+    so a testlib helper that takes ten seconds to build is rebuilt over and over. Here, each entry is a directory named
+    by the executor's cache key, which the executor compiles into directly.
+
+    Whoever builds an entry holds a `flock` on its lock file throughout, so that concurrent builders wait for the first
+    one rather than compile the same thing again. A manifest naming the executable is written last, so an entry without
+    one is a build that failed or died halfway, and is built anew, or removed on eviction if nobody is building it.
+    Looking up an entry bumps the manifest's mtime, and whoever
+    completes an entry evicts the least recently used ones until at most `max_entries` remain, taking up at most
+    `max_bytes` bytes, if nonzero. Executors hold a shared `flock` on the manifest of the entry they run from for as
+    long as they live, and entries still locked that way are never evicted.
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int = 0) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    @contextmanager
+    def _locked(self, name: str, blocking: bool = True) -> Iterator[None]:
+        path = os.path.join(self.directory, _RESERVED_PREFIX + name)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            yield
+        finally:
+            # Closing the descriptor releases the lock.
+            os.close(fd)
+
+    def lock(self, key: str, blocking: bool = True):
+        """
+        Holds the lock for building `key`, across all processes. Unless `blocking`, raises `BlockingIOError` instead of
+        waiting for it.
+        """
+        return self._locked(key + '.lock', blocking)
+
+    def get(self, key: str) -> Optional[Tuple[str, IO[str]]]:
+        """
+        Returns the path of the executable in a completely built entry for `key`, or None if there isn't one. Along
+        with it comes the entry's open manifest, which keeps the entry from being evicted until it's closed.
+        """
+        manifest = os.path.join(self.entry_dir(key), _MANIFEST_NAME)
+        try:
+            f = open(manifest)
+        except OSError:
+            return None
+        try:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            # The entry may have been evicted while we waited for the lock.
+            if os.fstat(f.fileno()).st_nlink:
+                executable = os.path.join(self.entry_dir(key), f.read())
+                if os.path.isfile(executable):
+                    os.utime(manifest)
+                    return executable, f
+        except OSError:
+            pass
+        f.close()
+        return None
+
+    def prepare(self, key: str) -> str:
+        """
+        Returns an empty directory to build the entry for `key` in, discarding what a failed build may have left. The
+        caller must hold the lock for `key`.
+        """
+        entry_dir = self.entry_dir(key)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.mkdir(entry_dir)
+        return entry_dir
+
+    def discard(self, key: str) -> None:
+        """
+        Removes what a failed build of `key` left. The caller must hold the lock for `key`.
+        """
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    def commit(self, key: str, executable: str) -> IO[str]:
+        """
+        Marks the entry for `key` as built, with `executable` inside it, and returns its open manifest, as `get` does.
+        The caller must hold the lock for `key`.
+        """
+        entry_dir = self.entry_dir(key)
+        temp_path = os.path.join(entry_dir, _MANIFEST_NAME + '.tmp')
+        f = open(temp_path, 'w')
+        try:
+            f.write(os.path.relpath(executable, entry_dir))
+            f.flush()
+            fcntl.flock(f, fcntl.LOCK_SH)
+            os.rename(temp_path, os.path.join(entry_dir, _MANIFEST_NAME))
+        except BaseException:
+            f.close()
+            raise
+
+        self._evict()
+        return f
+
+    def _evict(self) -> None:
+        with self._locked('lock'):
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.startswith(_RESERVED_PREFIX) or not entry.is_dir(follow_symlinks=False):
+                        continue
+                    try:
+                        last_used = os.stat(os.path.join(entry.path, _MANIFEST_NAME)).st_mtime_ns
+                    except OSError:
+                        self._discard_abandoned(entry.name)
+                        continue
+                    entries.append((last_used, self._du(entry.path), entry.name))
+
+            count = len(entries)
+            total = sum(size for _, size, _ in entries)
+            entries.sort()
+            for _, size, name in entries:
+                if count <= self.max_entries and (not self.max_bytes or total <= self.max_bytes):
+                    break
+                if self._remove_unused(name):
+                    count -= 1
+                    total -= size
+
+    def _discard_abandoned(self, key: str) -> None:
+        try:
+            with self.lock(key, blocking=False):
+                # Whoever was building this entry is gone, or failed without cleaning up.
+                if not os.path.exists(os.path.join(self.entry_dir(key), _MANIFEST_NAME)):
+                    self.discard(key)
+        except BlockingIOError:
+            # Still being built.
+            pass
+
+    def _remove_unused(self, key: str) -> bool:
+        try:
+            f = open(os.path.join(self.entry_dir(key), _MANIFEST_NAME))
+        except OSError:
+            return False
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Some executor still runs from this entry.
+                return False
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+        return True
+
+    @staticmethod
+    def _du(path: str) -> int:
+        size = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    size += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return size
+
+
+_cache: Optional[CompiledBinaryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_compiled_binary_cache() -> Optional[CompiledBinaryCache]:
+    global _cache
+
+    # Binaries are only kept on disk when there's somewhere specific to keep them.
+    if not env.compiled_binary_cache_dir:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompiledBinaryCache(
+                env.compiled_binary_cache_dir, env.compiled_binary_cache_size, env.compiled_binary_cache_max_bytes
+            )
+        return _cache
@@ -3,6 +3,7 @@ import os
 import pty
 import struct
 import sys
+import threading
 from typing import Any, Dict, IO, List, Optional, Sequence
 
 import pylru
@@ -15,6 +16,7 @@ from dmoj.cptbox.syscalls import *
 from dmoj.cptbox.tracer import AdvancedDebugger
 from dmoj.error import CompileError, OutputLimitExceeded
 from dmoj.executors.base_executor import BASE_FILESYSTEM, BASE_WRITE_FILESYSTEM, BaseExecutor, ExecutorMeta
+from dmoj.executors.binary_cache import get_compiled_binary_cache
 from dmoj.judgeenv import env
 from dmoj.utils.communicate import safe_communicate
 from dmoj.utils.error import print_protection_fault
@@ -30,7 +32,8 @@ from dmoj.utils.unicode import utf8bytes
 # Using a metaclass also allows us to handle caching executors transparently.
 # Contract: if cached=True is specified and an entry exists in the cache,
 # `create_files` and `compile` will not be run, and `_executable` will be loaded
-# from the cache.
+# from the cache. If `compiled_binary_cache_dir` is set, the cache lives on disk
+# and is shared between processes; otherwise, it's kept in memory.
 class _CompiledExecutorMeta(ExecutorMeta):
     @staticmethod
     def _cleanup_cache_entry(_key, executor: 'CompiledExecutor') -> None:
@@ -41,6 +44,8 @@ class _CompiledExecutorMeta(ExecutorMeta):
     compiled_binary_cache: Dict[str, 'CompiledExecutor'] = pylru.lrucache(
         env.compiled_binary_cache_size, _cleanup_cache_entry
     )
+    # Test cases may be graded concurrently, and `pylru.lrucache` is not thread-safe.
+    compiled_binary_cache_lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs) -> 'CompiledExecutor':
         is_cached: bool = kwargs.pop('cached', False)
@@ -55,8 +60,32 @@ class _CompiledExecutorMeta(ExecutorMeta):
         if is_cached:
             cache_key_material = utf8bytes(obj.__class__.__name__ + obj.__module__) + obj.get_binary_cache_key()
             cache_key = hashlib.sha384(cache_key_material).hexdigest()
-            if cache_key in cls.compiled_binary_cache:
-                executor = cls.compiled_binary_cache[cache_key]
+
+            binary_cache = get_compiled_binary_cache()
+            if binary_cache is not None:
+                # Entries on disk are never cleaned up by the executor, which stays marked as cached. Instead, it keeps
+                # the entry's manifest open, so that the entry isn't evicted while it may still be launched.
+                with binary_cache.lock(cache_key):
+                    found = binary_cache.get(cache_key)
+                    if found is None:
+                        obj._dir = binary_cache.prepare(cache_key)
+                        try:
+                            obj.create_files(*args, **kwargs)
+                            obj.compile()
+                            obj._install_agent()
+                            obj._binary_cache_manifest = binary_cache.commit(cache_key, obj.get_executable())
+                        except BaseException:
+                            binary_cache.discard(cache_key)
+                            raise
+                    else:
+                        obj._dir = binary_cache.entry_dir(cache_key)
+                        obj._executable, obj._binary_cache_manifest = found
+                obj._agent_installed = True
+                return obj
+
+            with cls.compiled_binary_cache_lock:
+                executor = cls.compiled_binary_cache.get(cache_key)
+            if executor is not None:
                 assert executor._executable is not None
                 # Minimal sanity checking: is the file still there? If not, we'll just recompile.
                 if os.path.isfile(executor._executable):
@@ -68,7 +97,8 @@ class _CompiledExecutorMeta(ExecutorMeta):
         obj.compile()
 
         if is_cached:
-            cls.compiled_binary_cache[cache_key] = obj
+            with cls.compiled_binary_cache_lock:
+                cls.compiled_binary_cache[cache_key] = obj
 
         return obj
 
@@ -241,6 +271,7 @@ class CompiledExecutor(BaseExecutor, metaclass=_CompiledExecutorMeta):
     warning: Optional[bytes] = None
     _executable: Optional[str] = None
     _code: Optional[str] = None
+    _binary_cache_manifest: Optional[IO[str]] = None
 
     compiler_read_fs: Sequence[FilesystemAccessRule] = []
     compiler_write_fs: Sequence[FilesystemAccessRule] = []
@@ -251,6 +282,8 @@ class CompiledExecutor(BaseExecutor, metaclass=_CompiledExecutorMeta):
         self._executable = None
 
     def cleanup(self) -> None:
+        if self._binary_cache_manifest is not None:
+            self._binary_cache_manifest.close()
         if not self.is_cached:
             super().cleanup()
 
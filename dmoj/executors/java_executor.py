@@ -57,6 +57,8 @@ class JavaExecutor(SingleDigitVersionMixin, CompiledExecutor):
     compiler: str
     nproc = -1
     fsize = 1048576  # Allow 1 MB for writing crash log.
+    # Every JVM writes its crash log to the same file, which concurrent cases would clobber.
+    supports_concurrent_cases = False
     address_grace = 786432
     syscalls = [
         'pread64',
@@ -1,8 +1,16 @@
+import threading
+from typing import Any, Dict, IO, Iterable, List, Optional
+
 from dmoj.problem import BatchedTestCase, TestCase
 from dmoj.utils.unicode import utf8bytes
 
 
 class BaseGrader:
+    # Whether `grade` may be called for several cases at once from different threads. Graders that keep per-case state
+    # on `self` (other than `_current_proc`, which is tracked per thread) must leave this disabled. Graders that enable
+    # it also split `grade` into `run_case` and `check_case`, so that one case may be checked while another runs.
+    supports_concurrent_cases = False
+
     def __init__(self, judge, problem, language, source):
         self.source = utf8bytes(source)
         self.language = language
@@ -11,10 +19,53 @@ class BaseGrader:
         self.binary = self._generate_binary()
         self.is_pretested = self.problem.meta.pretests_only and 'pretest_test_cases' in self.problem.config
         self._abort_requested = False
+        self._local = threading.local()
+        self._running_procs: Dict[int, Any] = {}
         self._current_proc = None
         self._batch_counter = 0
         self._testcase_counter = 0
 
+    @property
+    def _current_proc(self):
+        return getattr(self._local, 'proc', None)
+
+    @_current_proc.setter
+    def _current_proc(self, proc):
+        # Processes are tracked per grading thread, so that concurrently graded cases don't trample each other, and so
+        # that an abort can reach every process that is still running.
+        self._local.proc = proc
+        if proc is None:
+            self._running_procs.pop(threading.get_ident(), None)
+        else:
+            self._running_procs[threading.get_ident()] = proc
+
+    @property
+    def _cpu_affinity(self) -> Optional[List[int]]:
+        # CPUs leased to the case being graded on this thread, if sandbox CPU pinning is enabled.
+        return getattr(self._local, 'cpu_affinity', None)
+
+    @_cpu_affinity.setter
+    def _cpu_affinity(self, cpus: Optional[List[int]]):
+        self._local.cpu_affinity = cpus
+
+    @property
+    def _input_file(self) -> Optional[IO[bytes]]:
+        # File to use as the stdin of the case being graded on this thread, instead of a pipe.
+        return getattr(self._local, 'input_file', None)
+
+    @_input_file.setter
+    def _input_file(self, input_file: Optional[IO[bytes]]):
+        self._local.input_file = input_file
+
+    @property
+    def _output_file(self) -> Optional[IO[bytes]]:
+        # File to capture the stdout of the case being graded on this thread in, instead of a pipe.
+        return getattr(self._local, 'output_file', None)
+
+    @_output_file.setter
+    def _output_file(self, output_file: Optional[IO[bytes]]):
+        self._local.output_file = output_file
+
     def grade(self, case):
         raise NotImplementedError
 
@@ -23,9 +74,17 @@ class BaseGrader:
 
     def abort_grading(self):
         self._abort_requested = True
-        if self._current_proc:
+        self.kill_running_processes()
+
+    def kill_running_processes(self, thread_idents: Optional[Iterable[int]] = None):
+        if thread_idents is None:
+            procs = list(self._running_procs.values())
+        else:
+            procs = [proc for proc in map(self._running_procs.get, thread_idents) if proc is not None]
+
+        for proc in procs:
             try:
-                self._current_proc.kill()
+                proc.kill()
             except OSError:
                 pass
 
@@ -11,6 +11,11 @@ from dmoj.utils.unicode import utf8text
 
 
 class BridgedInteractiveGrader(StandardGrader):
+    # The interactor process and its pipes are passed between grading stages through `self`.
+    supports_concurrent_cases = False
+    supports_input_file = False
+    supports_output_file = False
+
     def __init__(self, judge, problem, language, source):
         super().__init__(judge, problem, language, source)
         self.handler_data = self.problem.config.interactive
@@ -49,12 +54,13 @@ class BridgedInteractiveGrader(StandardGrader):
             stdout=submission_stdout_pipe,
             stderr=subprocess.PIPE,
             wall_time=case.config.wall_time_factor * self.problem.time_limit,
+            cpu_affinity=self._cpu_affinity,
         )
         os.close(submission_stdin_pipe)
         os.close(submission_stdout_pipe)
 
     def _interact_with_process(self, case, result, input):
-        judge_output = case.output_data()
+        judge_output = case.output_buffer()
         # Give TL + 2s by default, so we do not race (and incorrectly throw IE) if submission gets TLE
         self._interactor_time_limit = (self.handler_data.preprocessing_time or 2) + self.problem.time_limit
         self._interactor_memory_limit = self.handler_data.memory_limit or env['generator_memory_limit']
@@ -5,6 +5,9 @@ from dmoj.utils.module import load_module_from_file
 
 
 class CustomGrader:
+    # We know nothing about how custom graders keep their state, so never grade their cases concurrently.
+    supports_concurrent_cases = False
+
     def __init__(self, judge, problem, language, source):
         self.judge = judge
         self.mod = load_module_from_file(os.path.join(get_problem_root(problem.id), problem.config['custom_judge']))
@@ -91,6 +91,11 @@ class Interactor:
 
 
 class InteractiveGrader(StandardGrader):
+    # The interaction verdict is passed to `check_result` through `self`.
+    supports_concurrent_cases = False
+    supports_input_file = False
+    supports_output_file = False
+
     def _interact_with_process(self, case, result, input):
         interactor = Interactor(self._current_proc)
         self.check = False
@@ -1,28 +1,68 @@
 import logging
+import mmap
+import os
+import signal
 import subprocess
 
+from dmoj.cptbox.utils import MemoryIO
 from dmoj.error import OutputLimitExceeded
 from dmoj.executors import executors
 from dmoj.graders.base import BaseGrader
+from dmoj.judgeenv import env
 from dmoj.result import CheckerResult, Result
+from dmoj.utils.cpu_slots import claim_cpu_slot
 
 log = logging.getLogger('dmoj.graders')
 
 
 class StandardGrader(BaseGrader):
+    supports_concurrent_cases = True
+    # Whether the submission may read its input straight from a file, if `input_file_stdin` is enabled, rather than
+    # from a pipe that `_interact_with_process` writes the input to. Graders that launch the submission with their own
+    # stdin, or that talk to it through `process.stdin`, must disable this.
+    supports_input_file = True
+    # Whether the submission's stdout may go to a file, if `output_file_capture` is enabled, rather than to a pipe.
+    # Graders that read from `process.stdout` must disable this.
+    supports_output_file = True
+
     def grade(self, case):
-        result = Result(case)
+        return self.check_case(case, self.run_case(case))
 
-        input = case.input_data()  # cache generator data
+    def run_case(self, case):
+        """
+        Runs the submission on `case`, returning a result whose output is yet to be checked by `check_case`.
+        """
+        result = Result(case)
 
-        self._launch_process(case)
+        input_file = case.input_file() if self.supports_input_file and env.input_file_stdin else None
+        # With the input on stdin, there's nothing to write to the submission.
+        input = case.input_buffer() if input_file is None else None  # cache generator data
+        output_file = MemoryIO() if self.supports_output_file and env.output_file_capture else None
 
-        error = self._interact_with_process(case, result, input)
+        with claim_cpu_slot() as cpus:
+            self._cpu_affinity = cpus
+            self._input_file = input_file
+            self._output_file = output_file
+            try:
+                self._launch_process(case)
+                error = self._interact_with_process(case, result, input)
+            finally:
+                self._cpu_affinity = None
+                self._input_file = None
+                self._output_file = None
+                for file in (input_file, output_file):
+                    if file is not None:
+                        file.close()
 
         process = self._current_proc
 
         self.populate_result(error, result, process)
+        return result
 
+    def check_case(self, case, result):
+        """
+        Checks the output of a run of `case` by `run_case`, completing its result.
+        """
         check = self.check_result(case, result)
 
         # checkers must either return a boolean (True: full points, False: 0 points)
@@ -41,6 +81,10 @@ class StandardGrader(BaseGrader):
 
     def populate_result(self, error, result, process):
         self.binary.populate_result(error, result, process)
+        if process.is_ole and process.signal == signal.SIGXFSZ:
+            # Output captured in a file that goes over the limit gets the submission killed by SIGXFSZ, which isn't a
+            # runtime error of its own.
+            result.result_flag &= ~Result.RTE
 
     def check_result(self, case, result):
         # If the submission didn't crash and didn't time out, there's a chance it might be AC
@@ -50,12 +94,23 @@ class StandardGrader(BaseGrader):
         checker = case.checker()
         # checker is a `partial` object, NOT a `function` object
         if not result.result_flag or getattr(checker.func, 'run_on_error', False):
+            process_output = result.proc_output
+            judge_output = case.output_buffer()
+            judge_input = case.input_buffer()
+            # Output captured in a file and streamed test data are mapped rather than read into memory. Checkers that
+            # can't handle a mapping get a copy.
+            if not getattr(checker.func, 'accepts_buffers', False):
+                process_output, judge_output, judge_input = (
+                    data[:] if isinstance(data, mmap.mmap) else data
+                    for data in (process_output, judge_output, judge_input)
+                )
+
             try:
                 check = checker(
-                    result.proc_output,
-                    case.output_data(),
+                    process_output,
+                    judge_output,
                     submission_source=self.source,
-                    judge_input=case.input_data(),
+                    judge_input=judge_input,
                     point_value=case.points,
                     case_position=case.position,
                     batch=case.batch,
@@ -75,14 +130,19 @@ class StandardGrader(BaseGrader):
         return check
 
     def _launch_process(self, case):
+        output_file = self._output_file
         self._current_proc = self.binary.launch(
             time=self.problem.time_limit,
             memory=self.problem.memory_limit,
             symlinks=case.config.symlinks,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
+            stdin=self._input_file or subprocess.PIPE,
+            stdout=output_file or subprocess.PIPE,
             stderr=subprocess.PIPE,
             wall_time=case.config.wall_time_factor * self.problem.time_limit,
+            # With output going to a file, the sandbox enforces the output limit. Allowing one byte more than the limit
+            # lets us tell whether it was exceeded.
+            fsize=case.config.output_limit_length + 1 if output_file else 0,
+            cpu_affinity=self._cpu_affinity,
         )
 
     def _interact_with_process(self, case, result, input):
@@ -96,8 +156,22 @@ class StandardGrader(BaseGrader):
             process.kill()
         finally:
             process.wait()
+
+        if self._output_file is not None:
+            result.proc_output = self._map_output_file(case, process)
         return error
 
+    def _map_output_file(self, case, process):
+        size = os.fstat(self._output_file.fileno()).st_size
+        if size > case.config.output_limit_length:
+            process.mark_ole()
+            return b''
+        if not size:
+            # Empty files can't be mapped.
+            return b''
+        # The mapping outlives the file object, and only goes away once the result has been trimmed.
+        return mmap.mmap(self._output_file.fileno(), size, access=mmap.ACCESS_READ)
+
     def _generate_binary(self):
         return executors[self.language].Executor(
             self.problem.id,
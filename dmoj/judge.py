@@ -6,18 +6,30 @@ import signal
 import sys
 import threading
 import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from enum import Enum
 from http.server import HTTPServer
 from itertools import groupby
 from operator import itemgetter
-from typing import Any, Callable, Dict, Generator, List, NamedTuple, Optional, Tuple, Union
+from typing import Any, Callable, Deque, Dict, Generator, Iterable, List, NamedTuple, Optional, Set, Tuple
 
 from dmoj import packet
 from dmoj.control import JudgeControlRequestHandler
 from dmoj.error import CompileError
-from dmoj.judgeenv import clear_problem_dirs_cache, env, get_supported_problems_and_mtimes, startup_warnings
+from dmoj.judgeenv import clear_problem_root_cache, env, startup_warnings
 from dmoj.monitor import Monitor
-from dmoj.problem import BatchedTestCase, Problem, TestCase
+from dmoj.problem import (
+    ArchivePrefetcher,
+    BatchedTestCase,
+    CachedProblemConfig,
+    CasePrefetcher,
+    GeneratorPrefetcher,
+    Problem,
+    ProblemConfigCache,
+    TestCase,
+)
+from dmoj.problem_index import ProblemIndex
 from dmoj.result import Result
 from dmoj.utils import builtin_int_patch
 from dmoj.utils.ansi import ansi_style, print_ansi, strip_ansi
@@ -44,6 +56,12 @@ class IPC(Enum):
     GRADING_ABORTED = 'GRADING-ABORTED'
     UNHANDLED_EXCEPTION = 'UNHANDLED-EXCEPTION'
     REQUEST_ABORT = 'REQUEST-ABORT'
+    GRADE_SUBMISSION = 'GRADE-SUBMISSION'
+    COMPILED = 'COMPILED'
+    START_GRADING = 'START-GRADING'
+    PING = 'PING'
+    PONG = 'PONG'
+    PROBLEM_CONFIG = 'PROBLEM-CONFIG'
 
 
 IPC_TEARDOWN_TIMEOUT = 5  # seconds
@@ -70,17 +88,34 @@ Submission = NamedTuple(
 class Judge:
     def __init__(self, packet_manager: packet.PacketManager) -> None:
         self.packet_manager = packet_manager
-        self.current_judge_worker: Optional[JudgeWorker] = None
-        self._grading_lock = threading.Lock()
+        self.current_judge_workers: Dict[int, JudgeWorker] = {}
+        self._workers_lock = threading.Lock()
+        self.grading_slots = max(1, env.grading_slots)
+        self._grading_slots = threading.BoundedSemaphore(self.grading_slots)
+        # If set, submissions compile in their own slots, ahead of a grading slot becoming free.
+        self._compile_slots: Optional[threading.BoundedSemaphore] = None
+        if env.compile_slots:
+            self._compile_slots = threading.BoundedSemaphore(env.compile_slots)
+
+        self.worker_pool: Optional[JudgeWorkerPool] = None
+        if env.worker_pool_size:
+            self.worker_pool = JudgeWorkerPool(env.worker_pool_size, env.worker_pool_max_jobs)
+            self.worker_pool.start()
+
+        self.problem_index = ProblemIndex()
+        self.problem_configs = ProblemConfigCache(env.problem_config_cache_size)
+        self._problem_updates_lock = threading.Lock()
+        self._changed_problem_paths: Set[str] = set()
+        self._problem_rescan_requested = False
 
         self.updater_exit = False
         self.updater_signal = threading.Event()
         self.updater = threading.Thread(target=self._updater_thread)
 
     @property
-    def current_submission(self):
-        worker = self.current_judge_worker
-        return worker.submission if worker else None
+    def current_submissions(self) -> List[Submission]:
+        with self._workers_lock:
+            return [worker.submission for worker in self.current_judge_workers.values()]
 
     def _updater_thread(self) -> None:
         log = logging.getLogger('dmoj.updater')
@@ -97,26 +132,48 @@ class Judge:
             # if thread:
             #    thread.join()
 
+            with self._problem_updates_lock:
+                paths, self._changed_problem_paths = self._changed_problem_paths, set()
+                rescan, self._problem_rescan_requested = self._problem_rescan_requested, False
+
             try:
-                clear_problem_dirs_cache()
-                self.packet_manager.supported_problems_packet(get_supported_problems_and_mtimes())
+                delta = self.problem_index.rebuild() if rescan else self.problem_index.update(paths)
+                # Files may have changed inside a problem without changing its mtime, so any problem that was touched
+                # must be reloaded, even if the site needn't hear about it.
+                self.problem_configs.invalidate(delta.touched)
+                if delta.updated or delta.removed:
+                    changed = [problem for problem, _ in delta.updated] + delta.removed
+                    log.info('Problems changed: %s', ', '.join(sorted(changed)))
+                    clear_problem_root_cache(changed)
+                    self.packet_manager.supported_problems_delta_packet(delta.updated, delta.removed)
             except Exception:
                 log.exception('Failed to update problems.')
 
-    def update_problems(self) -> None:
+    def update_problems(self, paths: Optional[Iterable[str]] = None) -> None:
         """
-        Pushes current problem set to server.
+        Pushes changes to the problem set to server.
+        :param paths: The changed filesystem paths, or None to rescan every problem.
         """
+        with self._problem_updates_lock:
+            if paths is None:
+                self._problem_rescan_requested = True
+            else:
+                self._changed_problem_paths.update(paths)
         self.updater_signal.set()
 
     def begin_grading(self, submission: Submission, report=logger.info, blocking=False) -> None:
-        # Ensure only one submission is running at a time; this lock is released at the end of submission grading.
-        # This is necessary because `begin_grading` is "re-entrant"; after e.g. grading-end is sent, the network
-        # thread may receive a new submission before the grading thread and worker from the *previous* submission
-        # have finished tearing down. Trashing global state (e.g. `self.current_judge_worker`) before then would be
-        # an error.
-        self._grading_lock.acquire()
-        assert self.current_judge_worker is None
+        # Ensure at most `grading_slots` submissions are running at a time; the slot is released at the end of
+        # submission grading. This is necessary because `begin_grading` is "re-entrant"; after e.g. grading-end is sent,
+        # the network thread may receive a new submission before the grading thread and worker from the *previous*
+        # submission have finished tearing down. Reusing the slot before then would oversubscribe the judge.
+        #
+        # With the compile pipeline enabled, the submission starts out in a compile slot instead, and trades it for a
+        # grading slot once compilation is done (see `_grading_thread_main`).
+        held_slot = self._compile_slots or self._grading_slots
+        held_slot.acquire()
+
+        with self._workers_lock:
+            assert submission.id not in self.current_judge_workers, 'submission %d is already grading' % submission.id
 
         report(
             ansi_style(
@@ -127,11 +184,18 @@ class Judge:
 
         # FIXME(tbrindus): what if we receive an abort from the judge before IPC handshake completes? We'll send
         # an abort request down the pipe, possibly messing up the handshake.
-        self.current_judge_worker = JudgeWorker(submission)
+        problem_config = self.problem_configs.get(submission.problem_id)
+        worker: JudgeWorker
+        if self.worker_pool:
+            worker = self.worker_pool.acquire(submission, problem_config)
+        else:
+            worker = JudgeWorker(submission, problem_config)
+        with self._workers_lock:
+            self.current_judge_workers[submission.id] = worker
 
         ipc_ready_signal = threading.Event()
         grading_thread = threading.Thread(
-            target=self._grading_thread_main, args=(ipc_ready_signal, report), daemon=True
+            target=self._grading_thread_main, args=(worker, held_slot, ipc_ready_signal, report), daemon=True
         )
         grading_thread.start()
 
@@ -140,12 +204,31 @@ class Judge:
         if blocking:
             grading_thread.join()
 
-    def _grading_thread_main(self, ipc_ready_signal: threading.Event, report) -> None:
-        assert self.current_judge_worker is not None
+    def _grading_thread_main(
+        self,
+        worker: 'JudgeWorker',
+        held_slot: threading.BoundedSemaphore,
+        ipc_ready_signal: threading.Event,
+        report,
+    ) -> None:
+        submission = worker.submission
+
+        def _ipc_compiled(_submission, _report) -> None:
+            nonlocal held_slot
+            # The worker has compiled the submission and is waiting for a grading slot. Keep the compile slot until we
+            # have one, so that the number of compiled submissions waiting around stays bounded.
+            while not self._grading_slots.acquire(timeout=0.1):
+                if worker.abort_requested:
+                    # The worker won't wait for a grading slot after an abort.
+                    return
+            held_slot.release()
+            held_slot = self._grading_slots
+            worker.start_grading()
 
         try:
             ipc_handler_dispatch: Dict[IPC, Callable] = {
-                IPC.HELLO: lambda _report: ipc_ready_signal.set(),
+                IPC.HELLO: lambda _submission, _report: ipc_ready_signal.set(),
+                IPC.COMPILED: _ipc_compiled,
                 IPC.COMPILE_ERROR: self._ipc_compile_error,
                 IPC.COMPILE_MESSAGE: self._ipc_compile_message,
                 IPC.GRADING_BEGIN: self._ipc_grading_begin,
@@ -155,9 +238,10 @@ class Judge:
                 IPC.BATCH_END: self._ipc_batch_end,
                 IPC.RESULT: self._ipc_result,
                 IPC.UNHANDLED_EXCEPTION: self._ipc_unhandled_exception,
+                IPC.PROBLEM_CONFIG: self._ipc_problem_config,
             }
 
-            for ipc_type, data in self.current_judge_worker.communicate():
+            for ipc_type, data in worker.communicate():
                 try:
                     handler_func = ipc_handler_dispatch[ipc_type]
                 except KeyError:
@@ -165,41 +249,46 @@ class Judge:
                         'judge got unexpected IPC message from worker: %s' % ((ipc_type, data),)
                     ) from None
 
-                handler_func(report, *data)
+                handler_func(submission, report, *data)
 
             report(
                 ansi_style(
-                    'Done grading #ansi[%s](yellow)/#ansi[%s](green|bold).\n'
-                    % (self.current_submission.problem_id, self.current_submission.id)
+                    'Done grading #ansi[%s](yellow)/#ansi[%s](green|bold).\n' % (submission.problem_id, submission.id)
                 )
             )
         except Exception:  # noqa: E722, we want to catch everything
-            self.log_internal_error()
+            self.log_internal_error(submission_id=submission.id)
         finally:
-            self.current_judge_worker.wait_with_timeout()
-            self.current_judge_worker = None
+            worker.wait_with_timeout()
+            with self._workers_lock:
+                del self.current_judge_workers[submission.id]
+            if self.worker_pool is not None:
+                assert isinstance(worker, PooledJudgeWorker)
+                self.worker_pool.release(worker)
 
             # Might not have been set if an exception was encountered before HELLO message, so signal here to keep the
             # other side from waiting forever.
             ipc_ready_signal.set()
 
-            self._grading_lock.release()
+            held_slot.release()
 
-    def _ipc_compile_error(self, report, error_message: str) -> None:
+    def _ipc_compile_error(self, submission: Submission, report, error_message: str) -> None:
         report(ansi_style('#ansi[Failed compiling submission!](red|bold)'))
         report(error_message.rstrip())  # don't print extra newline
-        self.packet_manager.compile_error_packet(error_message)
+        self.packet_manager.compile_error_packet(submission.id, error_message)
 
-    def _ipc_compile_message(self, _report, compile_message: str) -> None:
-        self.packet_manager.compile_message_packet(compile_message)
+    def _ipc_compile_message(self, submission: Submission, _report, compile_message: str) -> None:
+        self.packet_manager.compile_message_packet(submission.id, compile_message)
 
-    def _ipc_grading_begin(self, _report, is_pretested: bool) -> None:
-        self.packet_manager.begin_grading_packet(is_pretested)
+    def _ipc_grading_begin(self, submission: Submission, _report, is_pretested: bool) -> None:
+        self.packet_manager.begin_grading_packet(submission.id, is_pretested)
 
-    def _ipc_grading_end(self, _report) -> None:
-        self.packet_manager.grading_end_packet()
+    def _ipc_grading_end(self, submission: Submission, _report) -> None:
+        self.packet_manager.grading_end_packet(submission.id)
 
-    def _ipc_result(self, report, batch_number: Optional[int], case_number: int, result: Result) -> None:
+    def _ipc_result(
+        self, submission: Submission, report, batch_number: Optional[int], case_number: int, result: Result
+    ) -> None:
         codes = result.readable_codes()
 
         is_sc = result.result_flag & Result.SC
@@ -218,40 +307,57 @@ class Judge:
             )
         case_padding = '  ' if batch_number is not None else ''
         report(ansi_style('%sTest case %2d %-3s %s' % (case_padding, case_number, colored_codes[0], case_info)))
-        self.packet_manager.test_case_status_packet(case_number, result)
+        self.packet_manager.test_case_status_packet(submission.id, case_number, result)
 
-    def _ipc_batch_begin(self, report, batch_number: int) -> None:
-        self.packet_manager.batch_begin_packet()
+    def _ipc_batch_begin(self, submission: Submission, report, batch_number: int) -> None:
+        self.packet_manager.batch_begin_packet(submission.id)
         report(ansi_style('#ansi[Batch #%d](yellow|bold)' % batch_number))
 
-    def _ipc_batch_end(self, _report, _batch_number: int) -> None:
-        self.packet_manager.batch_end_packet()
+    def _ipc_batch_end(self, submission: Submission, _report, _batch_number: int) -> None:
+        self.packet_manager.batch_end_packet(submission.id)
 
-    def _ipc_grading_aborted(self, report) -> None:
-        self.packet_manager.submission_aborted_packet()
+    def _ipc_grading_aborted(self, submission: Submission, report) -> None:
+        self.packet_manager.submission_aborted_packet(submission.id)
         report(ansi_style('#ansi[Forcefully terminating grading. Temporary files may not be deleted.](red|bold)'))
 
-    def _ipc_unhandled_exception(self, _report, message: str) -> None:
+    def _ipc_problem_config(self, submission: Submission, _report, problem_config: CachedProblemConfig) -> None:
+        self.problem_configs.store(submission.problem_id, problem_config)
+
+    def _ipc_unhandled_exception(self, submission: Submission, _report, message: str) -> None:
         logger.error('Unhandled exception in worker process')
-        self.log_internal_error(message=message)
+        self.log_internal_error(message=message, submission_id=submission.id)
 
     def abort_grading(self, submission_id: Optional[int] = None) -> None:
         # Capture locally so we don't end up with a TOCTOU NoneType error. This function is typically called
-        # from the network thread, but `current_judge_worker` is updated from the grading thread.
-        worker = self.current_judge_worker
-        if not worker:
+        # from the network thread, but `current_judge_workers` is updated from the grading threads.
+        with self._workers_lock:
+            running = list(self.current_judge_workers)
+            if submission_id is None:
+                workers = list(self.current_judge_workers.values())
+            elif submission_id in self.current_judge_workers:
+                workers = [self.current_judge_workers[submission_id]]
+            else:
+                workers = []
+
+        if not workers:
             if submission_id is not None:
                 # This can happen because message delivery is async; the user may have pressed "Abort" before we
                 # finished grading, but by the time the message reached us we may have finished grading already.
-                logger.info('Received abortion request, but nothing is running')
-        elif submission_id is not None and worker.submission.id != submission_id:
-            logger.warning(
-                'Received abortion request for %d, but %d is currently running', submission_id, worker.submission.id
-            )
-        else:
+                if running:
+                    logger.warning(
+                        'Received abortion request for %d, but %s is currently running',
+                        submission_id,
+                        ', '.join(map(str, running)),
+                    )
+                else:
+                    logger.info('Received abortion request, but nothing is running')
+            return
+
+        for worker in workers:
             logger.info('Received abortion request for %d', worker.submission.id)
             # These calls are idempotent, so it doesn't matter if we raced and the worker has exited already.
             worker.request_abort_grading()
+        for worker in workers:
             worker.wait_with_timeout()
 
     def listen(self) -> None:
@@ -266,12 +372,16 @@ class Judge:
         End any submission currently executing, and exit the judge.
         """
         self.abort_grading()
+        if self.worker_pool is not None:
+            self.worker_pool.close()
         self.updater_exit = True
         self.updater_signal.set()
         if self.packet_manager:
             self.packet_manager.close()
 
-    def log_internal_error(self, exc: BaseException = None, message: str = None) -> None:
+    def log_internal_error(
+        self, exc: BaseException = None, message: str = None, submission_id: Optional[int] = None
+    ) -> None:
         if not message:
             # If exc exists, raise it so that sys.exc_info() is populated with its data.
             if exc:
@@ -291,27 +401,41 @@ class Judge:
             # Strip ANSI from the message, since this might be a checker's CompileError ...we don't want to see the raw
             # ANSI codes from GCC/Clang on the site. We could use format_ansi and send HTML to the site, but the site
             # doesn't presently support HTML internal error formatting.
-            self.packet_manager.internal_error_packet(strip_ansi(message))
+            self.packet_manager.internal_error_packet(submission_id, strip_ansi(message))
         except Exception:  # noqa E722: don't want `log_internal_error` to trigger `log_internal_error`, ever
             logger.exception('Error encountered while reporting error to site!')
 
 
 class JudgeWorker:
-    def __init__(self, submission: Submission) -> None:
-        self.submission = submission
+    submission: Submission
+
+    def __init__(
+        self, submission: Optional[Submission] = None, problem_config: Optional[CachedProblemConfig] = None
+    ) -> None:
+        # Pooled workers are only given a submission once their process is up; see `PooledJudgeWorker.assign`.
+        if submission is not None:
+            self.submission = submission
+        self.problem_config = problem_config
+        self.abort_requested = False
         self._abort_requested = False
+        self._grading_slot_granted = threading.Event()
         # FIXME(tbrindus): marked Any pending grader cleanups.
         self.grader: Any = None
+        self._problem: Optional[Problem] = None
+        self._prefetchers: List[CasePrefetcher] = []
 
         self.worker_process_conn, child_conn = multiprocessing.Pipe()
         self.worker_process = multiprocessing.Process(
-            name='DMOJ Judge Handler for %s/%d' % (self.submission.problem_id, self.submission.id),
+            name=self._process_name(),
             target=self._worker_process_main,
             args=(child_conn, self.worker_process_conn),
         )
         self.worker_process.start()
         child_conn.close()
 
+    def _process_name(self) -> str:
+        return 'DMOJ Judge Handler for %s/%d' % (self.submission.problem_id, self.submission.id)
+
     def communicate(self) -> Generator[Tuple[IPC, tuple], None, None]:
         recv_timeout = max(60, int(2 * self.submission.time_limit))
         while True:
@@ -346,9 +470,13 @@ class JudgeWorker:
                     logger.error('Worker is still alive, sending SIGKILL!')
                     self.worker_process.kill()
 
+    def start_grading(self) -> None:
+        self.worker_process_conn.send((IPC.START_GRADING, ()))
+
     def request_abort_grading(self) -> None:
         assert self.worker_process_conn
 
+        self.abort_requested = True
         try:
             self.worker_process_conn.send((IPC.REQUEST_ABORT, ()))
         except Exception:
@@ -365,6 +493,14 @@ class JudgeWorker:
         """
         worker_process_conn.close()
         setproctitle(multiprocessing.current_process().name)
+        self._grade_submission(judge_process_conn)
+
+    def _grade_submission(self, judge_process_conn: 'multiprocessing.connection.Connection') -> bool:
+        """
+        Grades `self.submission` inside the worker process, from the HELLO handshake to the final IPC.BYE.
+
+        Returns whether the IPC connection is left in a clean state, i.e. ready to be used for another submission.
+        """
 
         def _ipc_recv_thread_main() -> None:
             """
@@ -382,6 +518,8 @@ class JudgeWorker:
                     return
                 elif ipc_type == IPC.REQUEST_ABORT:
                     self._do_abort()
+                elif ipc_type == IPC.START_GRADING:
+                    self._grading_slot_granted.set()
                 else:
                     raise RuntimeError('worker got unexpected IPC message from judge: %s' % ((ipc_type, data),))
 
@@ -392,6 +530,8 @@ class JudgeWorker:
             judge_process_conn.send((IPC.BYE, ()))
 
         ipc_recv_thread = None
+        is_clean = True
+        self._grading_slot_granted.clear()
         try:
             judge_process_conn.send((IPC.HELLO, ()))
 
@@ -403,16 +543,15 @@ class JudgeWorker:
                 try:
                     ipc_msg = next(case_gen)
                 except StopIteration:
+                    judge_process_conn.send((IPC.BYE, ()))
                     break
                 except BrokenPipeError:
                     # A grader can raise a `BrokenPipeError` that's indistinguishable from one caused by
                     # `judge_process_conn.send`, but should be handled differently (i.e. not quit the judge).
                     _report_unhandled_exception()
-                    return
+                    break
 
                 judge_process_conn.send(ipc_msg)
-
-            judge_process_conn.send((IPC.BYE, ()))
         except BrokenPipeError:
             # There's nothing we can do about this... the general except branch would just fail again. Just re-raise and
             # hope for the best.
@@ -427,17 +566,35 @@ class JudgeWorker:
                 ipc_recv_thread.join(timeout=IPC_TEARDOWN_TIMEOUT)
                 if ipc_recv_thread.is_alive():
                     logger.error('Judge IPC recv thread is still alive after timeout, shutting worker down anyway!')
+                    is_clean = False
 
             # FIXME(tbrindus): we need to do this because cleaning up temporary directories happens on __del__, which
             # won't get called if we exit the process right now (so we'd leak all files created by the grader). This
             # should be refactored to have an explicit `cleanup()` or similar, rather than relying on refcounting
             # working out.
+            for prefetcher in self._prefetchers:
+                prefetcher.close()
+            self._prefetchers = []
+
+            # The problem may have been loaded even if the grader couldn't be created.
+            if self._problem is not None:
+                self._problem.close()
+            self._problem = None
             self.grader = None
 
+        return is_clean
+
     def _grade_cases(self) -> Generator[Tuple[IPC, tuple], None, None]:
         problem = Problem(
-            self.submission.problem_id, self.submission.time_limit, self.submission.memory_limit, self.submission.meta
+            self.submission.problem_id,
+            self.submission.time_limit,
+            self.submission.memory_limit,
+            self.submission.meta,
+            self.problem_config,
         )
+        self._problem = problem
+        if self.problem_config is None and problem.cached_config is not None:
+            yield IPC.PROBLEM_CONFIG, (problem.cached_config,)
 
         try:
             self.grader = problem.grader_class(
@@ -452,9 +609,18 @@ class JudgeWorker:
             if hasattr(binary, 'warning') and binary.warning is not None:
                 yield IPC.COMPILE_MESSAGE, (binary.warning,)
 
+        if env.compile_slots:
+            # We were compiled ahead of time in a compile slot; let the judge know, and wait until it hands us a grading
+            # slot before running anything.
+            yield IPC.COMPILED, ()
+            self._grading_slot_granted.wait()
+            if self._abort_requested:
+                yield IPC.GRADING_ABORTED, ()
+                return
+
         yield IPC.GRADING_BEGIN, (self.grader.is_pretested,)
 
-        flattened_cases: List[Tuple[Optional[int], Union[TestCase, BatchedTestCase]]] = []
+        flattened_cases: List[Tuple[Optional[int], TestCase]] = []
         batch_number = 0
         for case in self.grader.cases():
             if isinstance(case, BatchedTestCase):
@@ -464,6 +630,13 @@ class JudgeWorker:
             else:
                 flattened_cases.append((None, case))
 
+        # Data for upcoming cases is prepared in the background while earlier cases are graded.
+        all_cases = [case for _, case in flattened_cases]
+        if env.archive_prefetch > 0 and self.grader.problem.problem_data.archive:
+            self._prefetchers.append(ArchivePrefetcher(all_cases, env.archive_prefetch))
+        if env.generator_prefetch > 0:
+            self._prefetchers.append(GeneratorPrefetcher(all_cases, env.generator_prefetch))
+
         case_number = 0
         is_short_circuiting = False
         is_short_circuiting_enabled = self.submission.short_circuit
@@ -471,47 +644,349 @@ class JudgeWorker:
             if batch_number:
                 yield IPC.BATCH_BEGIN, (batch_number,)
 
-            for _, case in cases:
-                case_number += 1
+            group = [case for _, case in cases]
+            # Results are graded lazily: nothing runs until the first result is requested, and closing the generator
+            # cancels any cases that were speculatively started ahead of the one being reported.
+            graded_results = self._grade_group(group, batch_number)
+            try:
+                for case in group:
+                    case_number += 1
+
+                    # Stop grading if we're short circuiting
+                    if is_short_circuiting:
+                        result = Result(case, result_flag=Result.SC)
+                    else:
+                        for prefetcher in self._prefetchers:
+                            prefetcher.advance(case_number - 1)
+                        result = next(graded_results)
+
+                        # If the submission was killed due to a user-initiated abort, any result is meaningless.
+                        if self._abort_requested:
+                            yield IPC.GRADING_ABORTED, ()
+                            return
+
+                        if result.result_flag & Result.WA:
+                            # If we failed a 0-point case, we will short-circuit every case after this.
+                            is_short_circuiting_enabled |= not case.points
+
+                            # Short-circuit if we just failed a case in a batch, or if short-circuiting is currently
+                            # enabled for all test cases (either this was requested by the site, or we failed a 0-point
+                            # case in the past).
+                            is_short_circuiting |= batch_number is not None or is_short_circuiting_enabled
+                            if is_short_circuiting:
+                                graded_results.close()
+
+                    # Legacy hack: we need to allow graders to read and write `proc_output` on the `Result` object, but
+                    # the judge controller only cares about the trimmed output, and shouldn't waste memory buffering the
+                    # full output. So, we trim it here so we don't run out of memory in the controller.
+                    result.proc_output = result.output
+                    yield IPC.RESULT, (batch_number, case_number, result)
+            finally:
+                graded_results.close()
 
-                # Stop grading if we're short circuiting
-                if is_short_circuiting:
-                    result = Result(case, result_flag=Result.SC)
-                else:
-                    result = self.grader.grade(case)
+            if batch_number:
+                yield IPC.BATCH_END, (batch_number,)
+                is_short_circuiting &= is_short_circuiting_enabled
 
-                    # If the submission was killed due to a user-initiated abort, any result is meaningless.
-                    if self._abort_requested:
-                        yield IPC.GRADING_ABORTED, ()
-                        return
+        yield IPC.GRADING_END, ()
 
-                    if result.result_flag & Result.WA:
-                        # If we failed a 0-point case, we will short-circuit every case after this.
-                        is_short_circuiting_enabled |= not case.points
+    def _grade_group(self, cases: List[TestCase], batch_number: Optional[int]) -> Generator[Result, None, None]:
+        concurrency = env.case_concurrency
+        if batch_number is not None:
+            concurrency = max(concurrency, env.speculative_batches)
+        concurrency = min(concurrency, len(cases))
+
+        # Cases that set up symlinks share files in the submission directory, so they can't run side by side.
+        has_symlinks = any(case.config.symlinks for case in cases)
+        if concurrency > 1 and self._supports_concurrent_cases() and not has_symlinks:
+            # Any failure in a batch short-circuits the rest of it, so once a case fails, the cases after it are wasted
+            # work and can be killed right away, without waiting for the cases before it to be reported.
+            return self._grade_group_concurrently(cases, concurrency, cancel_after_failure=batch_number is not None)
+        if env.pipelined_checking and len(cases) > 1 and self.grader.supports_concurrent_cases:
+            return self._grade_group_pipelined(cases, cancel_after_failure=batch_number is not None)
+        return (self.grader.grade(case) for case in cases)
+
+    def _supports_concurrent_cases(self) -> bool:
+        return self.grader.supports_concurrent_cases and self.grader.binary.supports_concurrent_cases
+
+    def _grade_group_pipelined(
+        self, cases: List[TestCase], cancel_after_failure: bool
+    ) -> Generator[Result, None, None]:
+        """
+        Grades `cases` one at a time, yielding results in case order, but checks the output of each case while the next
+        case runs on another thread. An expensive checker then no longer holds up the cases after it.
 
-                        # Short-circuit if we just failed a case in a batch, or if short-circuiting is currently enabled
-                        # for all test cases (either this was requested by the site, or we failed a 0-point case in the
-                        # past).
-                        is_short_circuiting |= batch_number is not None or is_short_circuiting_enabled
+        When the generator is closed early (i.e. on short-circuit or abort), the case running ahead is killed. If
+        `cancel_after_failure` is set, it is killed as soon as the case before it fails, as with
+        `_grade_group_concurrently`, and the caller must likewise short-circuit the remaining cases.
+        """
+        runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='case')
+        running: Optional[Future] = None
+        try:
+            for index, case in enumerate(cases):
+                if running is None:
+                    running = runner.submit(self.grader.run_case, case)
+                result = running.result()
+                running = runner.submit(self.grader.run_case, cases[index + 1]) if index + 1 < len(cases) else None
+
+                result = self.grader.check_case(case, result)
+                if cancel_after_failure and result.result_flag & Result.WA and running is not None:
+                    running.cancel()
+                    self.grader.kill_running_processes()
+                yield result
+        finally:
+            if running is not None:
+                running.cancel()
+                while not running.done():
+                    # The case may be between starting and launching its process, so keep killing until it's done.
+                    self.grader.kill_running_processes()
+                    wait([running], timeout=0.1)
+            runner.shutdown()
+
+    def _grade_group_concurrently(
+        self, cases: List[TestCase], concurrency: int, cancel_after_failure: bool
+    ) -> Generator[Result, None, None]:
+        """
+        Grades `cases` on up to `concurrency` threads, yielding results in case order.
 
-                # Legacy hack: we need to allow graders to read and write `proc_output` on the `Result` object, but the
-                # judge controller only cares about the trimmed output, and shouldn't waste memory buffering the full
-                # output. So, we trim it here so we don't run out of memory in the controller.
-                result.proc_output = result.output
-                yield IPC.RESULT, (batch_number, case_number, result)
+        At most `2 * concurrency` cases are started ahead of the result being yielded, to bound the memory held by
+        finished but unreported results. When the generator is closed early (i.e. on short-circuit or abort), cases that
+        haven't started are cancelled, and those that are running are killed.
 
-            if batch_number:
-                yield IPC.BATCH_END, (batch_number,)
-                is_short_circuiting &= is_short_circuiting_enabled
+        If `cancel_after_failure` is set, the first failing case also kills every case after it as soon as it fails.
+        The caller must short-circuit the remaining cases upon seeing that failure, since they are never graded.
+        """
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='case')
+        pending: Deque[Future] = deque()
+        remaining = iter(enumerate(cases))
 
-        yield IPC.GRADING_END, ()
+        lock = threading.Lock()
+        first_failure = len(cases)
+        grading_threads: Dict[int, int] = {}
+
+        def grade(index: int, case: TestCase) -> Optional[Result]:
+            nonlocal first_failure
+            with lock:
+                if index > first_failure:
+                    return None
+                grading_threads[index] = threading.get_ident()
+
+            try:
+                result = self.grader.grade(case)
+            finally:
+                with lock:
+                    del grading_threads[index]
+
+            if cancel_after_failure and result.result_flag & Result.WA:
+                with lock:
+                    if index >= first_failure:
+                        return result
+                    first_failure = index
+                    doomed = [ident for other, ident in grading_threads.items() if other > index]
+                self.grader.kill_running_processes(doomed)
+            return result
+
+        def fill() -> None:
+            while len(pending) < 2 * concurrency:
+                item = next(remaining, None)
+                if item is None:
+                    return
+                pending.append(executor.submit(grade, *item))
+
+        try:
+            fill()
+            while pending:
+                result = pending.popleft().result()
+                fill()
+                assert result is not None, 'consumed a case that was cancelled after an earlier failure'
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            running = [future for future in pending if not future.done()]
+            while running:
+                # A case may be between starting and launching its process, so keep killing until everything is done.
+                self.grader.kill_running_processes()
+                _, not_done = wait(running, timeout=0.1)
+                running = list(not_done)
+            executor.shutdown()
 
     def _do_abort(self) -> None:
         self._abort_requested = True
+        self._grading_slot_granted.set()
         if self.grader:
             self.grader.abort_grading()
 
 
+class PooledJudgeWorker(JudgeWorker):
+    """
+    A judge worker whose process is spawned ahead of time and reused for several submissions.
+
+    The process idles until the judge sends it a submission with IPC.GRADE_SUBMISSION; from then on, the exchange is
+    identical to that of a regular `JudgeWorker`, ending with IPC.BYE. Any state built up inside the process (e.g.
+    compiled checker caches or loaded checker modules) is kept for the next submission.
+    """
+
+    def __init__(self) -> None:
+        self.jobs_done = 0
+        self._judge_pid = os.getpid()
+        self._session_done = threading.Event()
+        self._session_done.set()
+        super().__init__()
+
+    def _process_name(self) -> str:
+        return 'DMOJ Judge Handler (idle)'
+
+    def assign(self, submission: Submission, problem_config: Optional[CachedProblemConfig] = None) -> None:
+        self.submission = submission
+        self.abort_requested = False
+        self._session_done.clear()
+        self.worker_process_conn.send((IPC.GRADE_SUBMISSION, (submission, problem_config)))
+
+    def communicate(self) -> Generator[Tuple[IPC, tuple], None, None]:
+        try:
+            yield from super().communicate()
+        finally:
+            self.jobs_done += 1
+            self._session_done.set()
+
+    def wait_with_timeout(self, timeout=IPC_TEARDOWN_TIMEOUT) -> None:
+        # The process outlives the submission, so wait for the grading session to end rather than for the process to
+        # exit. If the session doesn't end in time, the process is in an unknown state and can't be reused.
+        if not self._session_done.wait(timeout) and self.worker_process.is_alive():
+            logger.error('Worker did not finish grading in time, sending SIGKILL!')
+            self.worker_process.kill()
+
+    def is_healthy(self, timeout=IPC_TEARDOWN_TIMEOUT) -> bool:
+        if not self._session_done.is_set() or not self.worker_process.is_alive():
+            return False
+
+        try:
+            self.worker_process_conn.send((IPC.PING, ()))
+            if not self.worker_process_conn.poll(timeout=timeout):
+                return False
+            ipc_type, _ = self.worker_process_conn.recv()
+        except Exception:
+            logger.exception('Failed to health check pooled worker')
+            return False
+        return ipc_type == IPC.PONG
+
+    def shutdown(self) -> None:
+        try:
+            self.worker_process_conn.send((IPC.BYE, ()))
+        except Exception:
+            pass
+        super().wait_with_timeout()
+        self.worker_process_conn.close()
+
+    def _worker_process_main(
+        self,
+        judge_process_conn: 'multiprocessing.connection.Connection',
+        worker_process_conn: 'multiprocessing.connection.Connection',
+    ) -> None:
+        """
+        Main body of a pooled judge worker process, which waits for submissions and grades them one after another.
+        """
+        worker_process_conn.close()
+        setproctitle(multiprocessing.current_process().name)
+
+        while True:
+            try:
+                # Sibling workers inherit our end of the pipe from the judge, so we can't rely on EOF to notice that the
+                # judge has died while we're idle.
+                while not judge_process_conn.poll(timeout=1):
+                    if os.getppid() != self._judge_pid:
+                        return
+                ipc_type, data = judge_process_conn.recv()
+            except EOFError:
+                return
+
+            if ipc_type == IPC.BYE:
+                return
+            elif ipc_type == IPC.PING:
+                judge_process_conn.send((IPC.PONG, ()))
+            elif ipc_type == IPC.REQUEST_ABORT:
+                # The abort raced with the end of grading, so there's nothing left to abort.
+                continue
+            elif ipc_type == IPC.GRADE_SUBMISSION:
+                self.submission, self.problem_config = data
+                self._abort_requested = False
+                setproctitle('DMOJ Judge Handler for %s/%d' % (self.submission.problem_id, self.submission.id))
+                if not self._grade_submission(judge_process_conn):
+                    # Someone else may still be reading from the connection, so we can't safely take another job.
+                    return
+                setproctitle('DMOJ Judge Handler (idle)')
+            else:
+                raise RuntimeError('pooled worker got unexpected IPC message from judge: %s' % ((ipc_type, data),))
+
+
+class JudgeWorkerPool:
+    """
+    Keeps `size` pre-spawned `PooledJudgeWorker`s warm. Each worker is recycled after `max_jobs` submissions, and
+    is health checked before being handed a submission.
+    """
+
+    def __init__(self, size: int, max_jobs: int) -> None:
+        self.size = size
+        self.max_jobs = max_jobs
+        self._idle: List[PooledJudgeWorker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> None:
+        for _ in range(self.size):
+            self._idle.append(PooledJudgeWorker())
+
+    def acquire(
+        self, submission: Submission, problem_config: Optional[CachedProblemConfig] = None
+    ) -> PooledJudgeWorker:
+        while True:
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+
+            if worker is None:
+                # More submissions than warm workers: spawn one on demand, it'll stay in the pool if there's room.
+                worker = PooledJudgeWorker()
+                break
+            if worker.is_healthy():
+                break
+
+            logger.warning('Pooled worker %s failed health check, replacing it', worker.worker_process.pid)
+            worker.worker_process.kill()
+            worker.shutdown()
+
+        worker.assign(submission, problem_config)
+        return worker
+
+    def release(self, worker: PooledJudgeWorker) -> None:
+        if worker.jobs_done < self.max_jobs and worker.worker_process.is_alive():
+            with self._lock:
+                if not self._closed and len(self._idle) < self.size:
+                    self._idle.append(worker)
+                    return
+        else:
+            logger.info('Recycling pooled worker %s after %d submissions', worker.worker_process.pid, worker.jobs_done)
+
+        worker.shutdown()
+
+        with self._lock:
+            if self._closed or len(self._idle) >= self.size:
+                return
+        replacement = PooledJudgeWorker()
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(replacement)
+                return
+        replacement.shutdown()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.shutdown()
+
+
 class ClassicJudge(Judge):
     def __init__(self, host, port, **kwargs) -> None:
         super().__init__(packet.PacketManager(host, port, self, env['id'], env['key'], **kwargs))
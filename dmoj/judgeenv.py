@@ -2,7 +2,7 @@ import argparse
 import os
 import ssl
 from operator import itemgetter
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Set
 
 import yaml
 
@@ -24,6 +24,34 @@ env = ConfigNode(
         'compiler_output_character_limit': 65536,  # Number of characters allowed in compile output
         'compiled_binary_cache_dir': None,  # Location to store cached binaries, defaults to tempdir
         'compiled_binary_cache_size': 100,  # Maximum number of executables to cache (LRU order)
+        'compiled_binary_cache_max_bytes': 0,  # Maximum bytes of executables to keep on disk, 0 for no limit
+        'grading_slots': 1,  # Number of submissions to grade concurrently
+        'compile_slots': 0,  # Number of submissions to compile ahead of a free grading slot, 0 to compile in the slot
+        'worker_pool_size': 0,  # Number of pre-spawned worker processes to keep warm, 0 to spawn one per submission
+        'worker_pool_max_jobs': 100,  # Number of submissions a pooled worker grades before it is recycled
+        'case_concurrency': 1,  # Number of test cases of a submission to run at once, if the grader supports it
+        # Number of cases of a batch to run at once; as soon as one fails, the cases after it are killed
+        'speculative_batches': 0,
+        'pipelined_checking': False,  # Check each case's output while the next case runs, if the grader supports it
+        # CPUs to pin submissions to: each entry (a CPU number, or a list of them) is a slot that runs one submission
+        # process at a time, shared by every judge on the host. Leave empty to not pin submissions.
+        'sandbox_cpus': [],
+        'packet_compression_threshold': 1024,  # Packets smaller than this are sent uncompressed, if the site agrees
+        'packet_replay_buffer_size': 10000,  # Number of unacknowledged packets to keep for replay after a reconnect
+        'testcase_flush_window': 0.1,  # Seconds to coalesce test case results for after sending one to the site
+        'problem_update_window': 1,  # Seconds to collect problem file changes for before updating the site
+        'problem_config_cache_size': 256,  # Number of resolved problem configurations to keep between submissions
+        'archive_cache_size': 16,  # Number of problem archives each worker keeps open between submissions
+        'test_data_cache_dir': None,  # Location to share normalized test data between workers, defaults to /dev/shm
+        'test_data_cache_size': 0,  # Maximum bytes of test data to share between workers, 0 to not share test data
+        'test_data_stream_threshold': 268435456,  # Stream test data files larger than this from disk, 0 to never stream
+        'archive_prefetch': 0,  # Number of upcoming cases to decompress archived test data for, 0 to not run ahead
+        'generator_prefetch': 0,  # Number of upcoming cases to run generators for while grading, 0 to not run ahead
+        'generator_cache_dir': None,  # Location to store generator output in, defaults to tempdir
+        'generator_cache_size': 0,  # Maximum bytes of generator output to keep between submissions, 0 to not keep any
+        'helper_file_dir': None,  # Location to hand test data to checkers and interactors in, defaults to /dev/shm
+        'input_file_stdin': False,  # Give submissions their input as a read-only file on stdin, rather than a pipe
+        'output_file_capture': False,  # Capture submission output in a memory file capped by the sandbox, not a pipe
         'runtime': {},
         # Map of executor: fs_config, used to configure
         # the filesystem sandbox on a per-machine basis, without having to hack
@@ -298,6 +326,11 @@ def clear_problem_dirs_cache():
     _problem_dirs_cache = None
 
 
+def clear_problem_root_cache(problem_ids: Iterable[str]) -> None:
+    for problem_id in problem_ids:
+        _problem_root_cache.pop(problem_id, None)
+
+
 def get_problem_watches():
     return problem_watches
 
@@ -1,6 +1,7 @@
 import logging
 from contextlib import closing
-from threading import Event, Thread
+from threading import Event, Lock, Thread, Timer
+from typing import Optional, Set
 from urllib.request import urlopen
 
 from dmoj import judgeenv
@@ -49,16 +50,47 @@ class RefreshWorker(Thread):
 
 
 class SendProblemsHandler(FileSystemEventHandler):
-    def __init__(self, refresher=None):
+    def __init__(self, refresher=None, window=0):
         self.refresher = refresher
         self.callback = None
+        # Uploading a problem produces a burst of events, one per file. Collect the paths touched over `window`
+        # seconds, so that the whole burst results in a single targeted update, and a single round of pings.
+        self.window = window
+        self._lock = Lock()
+        self._changed_paths: Set[str] = set()
+        self._timer: Optional[Timer] = None
 
     def on_any_event(self, event):
+        with self._lock:
+            self._changed_paths.add(event.src_path)
+            # Moves touch both the source and the destination.
+            if getattr(event, 'dest_path', None):
+                self._changed_paths.add(event.dest_path)
+
+            if self._timer is None:
+                self._timer = Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            paths, self._changed_paths = self._changed_paths, set()
+            self._timer = None
+
+        if not paths:
+            return
+        logger.debug('Problem files changed: %d paths', len(paths))
         if self.callback is not None:
-            self.callback()
+            self.callback(sorted(paths))
         if self.refresher is not None:
             self.refresher.refresh()
 
+    def stop(self):
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
 
 class Monitor:
     def __init__(self):
@@ -69,7 +101,7 @@ class Monitor:
             else:
                 self._refresher = None
 
-            self._handler = SendProblemsHandler(self._refresher)
+            self._handler = SendProblemsHandler(self._refresher, judgeenv.env.problem_update_window)
             self._monitor = Observer()
             for dir in get_problem_watches():
                 self._monitor.schedule(self._handler, dir, recursive=True)
@@ -113,6 +145,7 @@ class Monitor:
         if self._monitor is not None:
             self._monitor.stop()
             self._monitor.join(1)
+            self._handler.stop()
 
     def __enter__(self):
         self.start()
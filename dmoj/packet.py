@@ -1,25 +1,32 @@
-import errno
+import asyncio
 import json
 import logging
 import os
 import socket
 import ssl
 import struct
-import sys
 import threading
 import time
 import traceback
+import uuid
 import zlib
-from typing import List, Optional, TYPE_CHECKING, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Set, TYPE_CHECKING, Tuple
 
 from dmoj import sysinfo
-from dmoj.judgeenv import get_runtime_versions, get_supported_problems_and_mtimes
+from dmoj.judgeenv import env, get_runtime_versions
 from dmoj.result import Result
 from dmoj.utils.unicode import utf8bytes, utf8text
 
 if TYPE_CHECKING:
     from dmoj.judge import Judge
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 log = logging.getLogger(__name__)
 
 
@@ -27,8 +34,62 @@ class JudgeAuthenticationFailed(Exception):
     pass
 
 
-class PacketManager:
+class PacketCodec:
+    """
+    Serializes packets for the wire. The default codec speaks the original protocol, where every packet is
+    zlib-compressed JSON; a more compact one may be negotiated during the handshake.
+    """
+
     SIZE_PACK = struct.Struct('!I')
+    # When a compression threshold is negotiated, the top bit of the size prefix marks a compressed payload.
+    COMPRESSED_FLAG = 1 << 31
+
+    def __init__(self, encoding: str = 'json', compression_threshold: Optional[int] = None):
+        if encoding == 'json':
+            self._dumps = lambda packet: utf8bytes(json.dumps(packet))
+            self._loads = lambda payload: json.loads(utf8text(payload))
+        elif encoding == 'msgpack' and msgpack is not None:
+            self._dumps = lambda packet: msgpack.packb(packet, use_bin_type=True)
+            self._loads = lambda payload: msgpack.unpackb(payload, raw=False)
+        else:
+            raise ValueError(f'unsupported packet encoding: {encoding}')
+
+        self.encoding = encoding
+        # Without a threshold, every packet is compressed, and the size prefix carries no flags.
+        self.compression_threshold = compression_threshold
+
+    @staticmethod
+    def supported_encodings() -> List[str]:
+        return ['msgpack', 'json'] if msgpack is not None else ['json']
+
+    def encode(self, packet: dict) -> bytes:
+        payload = self._dumps(packet)
+        if self.compression_threshold is None:
+            payload = zlib.compress(payload)
+            size = len(payload)
+        elif len(payload) >= self.compression_threshold:
+            payload = zlib.compress(payload)
+            size = len(payload) | self.COMPRESSED_FLAG
+        else:
+            size = len(payload)
+        return self.SIZE_PACK.pack(size) + payload
+
+    def payload_size(self, header: bytes) -> int:
+        size = self.SIZE_PACK.unpack(header)[0]
+        return size if self.compression_threshold is None else size & ~self.COMPRESSED_FLAG
+
+    def decode(self, header: bytes, payload: bytes) -> dict:
+        size = self.SIZE_PACK.unpack(header)[0]
+        if self.compression_threshold is None or size & self.COMPRESSED_FLAG:
+            payload = zlib.decompress(payload)
+        return self._loads(payload)
+
+
+OutboundPacket = Tuple[int, dict, PacketCodec, bytes]
+
+
+class PacketManager:
+    SIZE_PACK = PacketCodec.SIZE_PACK
 
     ssl_context: Optional[ssl.SSLContext]
     judge: 'Judge'
@@ -74,160 +135,276 @@ class PacketManager:
         self.no_cert_check = no_cert_check
         self.cert_store = cert_store
 
-        self._lock = threading.RLock()
-        self._batch = 0
         self._testcase_queue_lock = threading.Lock()
-        self._testcase_queue: List[Tuple[int, Result]] = []
+        self._testcase_queue_cond = threading.Condition(self._testcase_queue_lock)
+        self._testcase_queue: Dict[int, List[Tuple[int, Result]]] = {}
 
         # Exponential backoff: starting at 4 seconds.
-        # Certainly hope it won't stack overflow, since it will take days if not years.
         self.fallback = 4
 
-        self.conn = None
-        self._do_reconnect()
-
-    def _connect(self):
-        problems = get_supported_problems_and_mtimes()
-        versions = get_runtime_versions()
+        # All socket I/O happens on this event loop, which `run` drives on the calling thread. Other threads only ever
+        # hand it encoded packets through `_send_packet`, so a slow site can never stall a grading thread.
+        self._loop = asyncio.new_event_loop()
+        self._main_task: Optional[asyncio.Future] = None
+        self._codec = PacketCodec()
+        # Each entry keeps the packet's sequence number, the packet, and the codec it was encoded with, so that it can
+        # be re-encoded should a reconnection negotiate a different codec before it is sent.
+        self._outbound: Deque[OutboundPacket] = deque()
+        self._outbound_ready: Optional[asyncio.Event] = None
+
+        # Packets are numbered within a session, which lasts as long as this judge process. After a dropped connection,
+        # the site tells us the last packet it processed, and we replay everything after it from `_unacknowledged`.
+        self.session_id = uuid.uuid4().hex
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        self._unacknowledged: Deque[OutboundPacket] = deque(maxlen=env.packet_replay_buffer_size)
+        self._last_written_seq = 0
+        # Whether the site supports resuming sessions; if not, there's no point in keeping packets around for replay.
+        self._resumable = False
+        # Whether the site understands `supported-problems-delta` packets, rather than only full problem lists.
+        self._problem_deltas = False
+        self._has_connected = False
+        # Submissions the site gave up on when it didn't resume our session. Only changed on the event loop, which drops
+        # whatever their grading threads still send until the site asks for them again.
+        self._forgotten_submissions: Set[int] = set()
+
+        # Packets that call into the judge may block (e.g. waiting for a free grading slot), so they are handled off the
+        # event loop. A single thread keeps them in the order the site sent them.
+        self._dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='packet-dispatch')
+
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        problems, versions = await self._loop.run_in_executor(
+            None, lambda: (self.judge.problem_index.problems(), get_runtime_versions())
+        )
 
         log.info('Opening connection to: [%s]:%s', self.host, self.port)
-
-        while True:
-            try:
-                self.conn = socket.create_connection((self.host, self.port), timeout=5)
-            except OSError as e:
-                if e.errno != errno.EINTR:
-                    raise
-            else:
-                break
-
-        self.conn.settimeout(300)
-        self.conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
-
         if self.ssl_context:
-            log.info('Starting TLS on: [%s]:%s', self.host, self.port)
-            self.conn = self.ssl_context.wrap_socket(self.conn, server_hostname=self.host)
+            log.info('Using TLS on: [%s]:%s', self.host, self.port)
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self.ssl_context,
+                server_hostname=self.host if self.ssl_context else None,
+            ),
+            timeout=5,
+        )
+        self.writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
 
         log.info('Starting handshake with: [%s]:%s', self.host, self.port)
-        self.input = self.conn.makefile('rb')
-        self.output = self.conn.makefile('wb', 0)
-        self.handshake(problems, versions, self.name, self.key)
+        resp = await self.handshake(problems, versions, self.name, self.key)
+        self._resume_session(resp.get('last-seq'))
         log.info('Judge "%s" online: [%s]:%s', self.name, self.host, self.port)
 
-    def _reconnect(self):
-        log.warning('Attempting reconnection in %.0fs: [%s]:%s', self.fallback, self.host, self.port)
-
-        if self.conn is not None:
+    def _drop_connection(self):
+        if self.writer is not None:
             log.info('Dropping old connection.')
-            self.conn.close()
-        time.sleep(self.fallback)
-        self.fallback = min(self.fallback * 1.5, 60)
-        self._do_reconnect()
+            self.writer.close()
+            self.reader = self.writer = None
 
-    def _do_reconnect(self):
+    async def _try_connect(self) -> bool:
         try:
-            self._connect()
+            await self._connect()
         except JudgeAuthenticationFailed:
             log.error('Authentication as "%s" failed on: [%s]:%s', self.name, self.host, self.port)
-            self._reconnect()
-        except socket.error:
+        except (OSError, asyncio.TimeoutError):
             log.exception('Connection failed due to socket error: [%s]:%s', self.host, self.port)
-            self._reconnect()
+        else:
+            return True
+        return False
+
+    async def _reconnect(self):
+        while True:
+            log.warning('Attempting reconnection in %.0fs: [%s]:%s', self.fallback, self.host, self.port)
+            self._drop_connection()
+            await asyncio.sleep(self.fallback)
+            self.fallback = min(self.fallback * 1.5, 60)
+            if await self._try_connect():
+                return
 
     def __del__(self):
         self.close()
 
     def close(self):
-        if self.conn and not self._closed:
+        if not self._closed:
+            self._closed = True
             try:
-                # May already be closed despite self._closed == False if a network error occurred and `close` is being
-                # called as part of cleanup.
-                self.conn.shutdown(socket.SHUT_RDWR)
-            except socket.error:
+                self._loop.call_soon_threadsafe(self._shutdown)
+            except RuntimeError:  # The event loop is already closed.
                 pass
-        self._closed = True
 
-    def _read_forever(self):
-        try:
-            while True:
-                self._receive_packet(self._read_single())
-        except KeyboardInterrupt:
-            pass
-        except Exception:  # connection reset by peer
-            log.exception('Exception while reading packet from site, will not attempt to reconnect! Quitting judge.')
-            # TODO(tbrindus): this is really sad. This isn't equivalent to `raise SystemExit(1)` since we're not on the
-            # main thread, and doing the latter would only exit the network thread. We should fix mid-grading reconnects
-            # so that we don't need this sledgehammer approach that relies on Docker restarting the judge for us.
-            os._exit(1)
+        # Wake up the testcase flushing thread so that it notices we're closed.
+        with self._testcase_queue_cond:
+            self._testcase_queue_cond.notify_all()
+
+    def _shutdown(self):
+        if self._main_task is not None:
+            self._main_task.cancel()
+
+    async def _read_packet(self) -> dict:
+        assert self.reader is not None
+        codec = self._codec
+        header = await self.reader.readexactly(codec.SIZE_PACK.size)
+        return codec.decode(header, await self.reader.readexactly(codec.payload_size(header)))
+
+    async def _read_forever(self):
+        while True:
+            try:
+                packet = await asyncio.wait_for(self._read_packet(), timeout=300)
+            except (OSError, EOFError, asyncio.TimeoutError, zlib.error):
+                return
+            self._receive_packet(packet)
+
+    async def _write_forever(self, writer: asyncio.StreamWriter):
+        assert self._outbound_ready is not None
+        while True:
+            while not self._outbound:
+                self._outbound_ready.clear()
+                await self._outbound_ready.wait()
+
+            try:
+                while self._outbound:
+                    seq, packet, codec, data = self._outbound.popleft()
+                    if codec is not self._codec:
+                        codec = self._codec
+                        data = self._encode_packet(packet, codec)
+                    if self._resumable:
+                        # Kept until the site acknowledges it, since it's lost if the connection drops before then.
+                        self._unacknowledged.append((seq, packet, codec, data))
+                    self._last_written_seq = seq
+                    writer.write(data)
+                await writer.drain()
+            except Exception:  # connection reset by peer
+                log.warning('Lost connection while sending to site: [%s]:%s', self.host, self.port, exc_info=True)
+                # Closing the connection makes `_read_forever` return, and `_main` then reconnects.
+                writer.close()
+                return
+
+    async def _main(self):
+        self._outbound_ready = asyncio.Event()
+        if not await self._try_connect():
+            await self._reconnect()
 
-    def _read_single(self) -> dict:
-        try:
-            data = self.input.read(PacketManager.SIZE_PACK.size)
-        except socket.error:
-            self._reconnect()
-            return self._read_single()
-        if not data:
-            self._reconnect()
-            return self._read_single()
-        size = PacketManager.SIZE_PACK.unpack(data)[0]
         try:
-            packet = zlib.decompress(self.input.read(size))
-        except zlib.error:
-            self._reconnect()
-            return self._read_single()
-        else:
-            return json.loads(utf8text(packet))
+            while True:
+                assert self.writer is not None
+                writer_task = asyncio.ensure_future(self._write_forever(self.writer))
+                try:
+                    # Returns once the connection to the site is lost.
+                    await self._read_forever()
+                finally:
+                    writer_task.cancel()
+                await self._reconnect()
+        finally:
+            self._drop_connection()
+
+    def _queue_outbound(self, entry: OutboundPacket):
+        if entry[1].get('submission-id') in self._forgotten_submissions:
+            return
+        self._outbound.append(entry)
+        if self._outbound_ready is not None:
+            self._outbound_ready.set()
+
+    def _acknowledge(self, last_seq: int):
+        while self._unacknowledged and self._unacknowledged[0][0] <= last_seq:
+            self._unacknowledged.popleft()
+
+    def _resume_session(self, last_seq: Optional[int]):
+        has_connected, self._has_connected = self._has_connected, True
+        self._resumable = last_seq is not None
+
+        # Without a gap between what the site processed and what we still hold, we can pick up where we left off.
+        oldest_seq = self._unacknowledged[0][0] if self._unacknowledged else self._last_written_seq + 1
+        if last_seq is not None and last_seq + 1 >= oldest_seq:
+            self._acknowledge(last_seq)
+            if self._unacknowledged:
+                log.info('Resuming session, replaying %d packets', len(self._unacknowledged))
+            self._outbound.extendleft(reversed(self._unacknowledged))
+            self._unacknowledged.clear()
+            if self._outbound and self._outbound_ready is not None:
+                self._outbound_ready.set()
+        elif has_connected:
+            # The site doesn't know this session (e.g. it restarted, or predates session resumption), so it has already
+            # given up on whatever we were grading. Results for it would only confuse the site.
+            # Nothing queued is written before this, since the handshake bypasses the queue. Packets that grading
+            # threads send until the abort takes effect are dropped in `_queue_outbound`.
+            log.warning('Site did not resume session, aborting grading: [%s]:%s', self.host, self.port)
+            self._forgotten_submissions.update(submission.id for submission in self.judge.current_submissions)
+            self._unacknowledged.clear()
+            self._outbound.clear()
+            self._dispatcher.submit(self.judge.abort_grading)
 
     def run(self):
-        threading.Thread(target=self._periodically_flush_testcase_queue).start()
-        self._read_forever()
+        threading.Thread(target=self._flush_testcase_queue_forever).start()
+        self._main_task = asyncio.ensure_future(self._main(), loop=self._loop)
+        if self._closed:
+            self._main_task.cancel()
+
+        try:
+            self._loop.run_until_complete(self._main_task)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+        finally:
+            self._dispatcher.shutdown(wait=False)
 
     def disconnect(self):
-        self.close()
         self.judge.abort_grading()
-        sys.exit(0)
+        self.close()
 
-    def _flush_testcase_queue(self):
+    def _flush_testcase_queue(self, submission_id: Optional[int] = None):
         with self._testcase_queue_lock:
-            if not self._testcase_queue:
-                return
-
-            self._send_packet(
-                {
-                    'name': 'test-case-status',
-                    'submission-id': self.judge.current_submission.id,
-                    'cases': [
-                        {
-                            'position': position,
-                            'status': result.result_flag,
-                            'time': result.execution_time,
-                            'points': result.points,
-                            'total-points': result.total_points,
-                            'memory': result.max_memory,
-                            'output': result.output,
-                            'extended-feedback': result.extended_feedback,
-                            'feedback': result.feedback,
-                        }
-                        for position, result in self._testcase_queue
-                    ],
-                }
-            )
-
-            self._testcase_queue.clear()
+            if submission_id is None:
+                submission_ids = list(self._testcase_queue)
+            else:
+                submission_ids = [submission_id]
+
+            for id in submission_ids:
+                queue = self._testcase_queue.pop(id, None)
+                if not queue:
+                    continue
+
+                self._send_packet(
+                    {
+                        'name': 'test-case-status',
+                        'submission-id': id,
+                        'cases': [
+                            {
+                                'position': position,
+                                'status': result.result_flag,
+                                'time': result.execution_time,
+                                'points': result.points,
+                                'total-points': result.total_points,
+                                'memory': result.max_memory,
+                                'output': result.output,
+                                'extended-feedback': result.extended_feedback,
+                                'feedback': result.feedback,
+                            }
+                            for position, result in queue
+                        ],
+                    }
+                )
 
-    def _periodically_flush_testcase_queue(self):
+    def _flush_testcase_queue_forever(self):
         while not self._closed:
             try:
-                time.sleep(0.25)
-                # It is okay if we flush the testcase queue even while the connection is not open or there's nothing
-                # grading, since the only thing that can queue testcases is a currently-grading submission.
+                with self._testcase_queue_cond:
+                    while not self._testcase_queue and not self._closed:
+                        self._testcase_queue_cond.wait()
+
+                # The first result after a quiet period goes out immediately. Results that arrive while we wait out the
+                # flush window are coalesced into the next packet, which bounds the packet rate for fast cases.
                 self._flush_testcase_queue()
+                with self._testcase_queue_cond:
+                    self._testcase_queue_cond.wait_for(lambda: self._closed, env.testcase_flush_window)
             except KeyboardInterrupt:
                 break
             except Exception:
                 traceback.print_exc()
 
-    def _send_packet(self, packet: dict):
+    def _encode_packet(self, packet: dict, codec: PacketCodec) -> bytes:
         for k, v in packet.items():
             if isinstance(v, bytes):
                 # Make sure we don't have any garbage utf-8 from e.g. weird compilers
@@ -235,21 +412,48 @@ class PacketManager:
                 # We cannot use utf8text because it may not be text.
                 packet[k] = v.decode('utf-8', 'replace')
 
-        raw = zlib.compress(utf8bytes(json.dumps(packet)))
-        with self._lock:
+        return codec.encode(packet)
+
+    def _send_packet(self, packet: dict):
+        # Encoding happens on the calling thread, keeping the event loop free to service the connection.
+        # Sequence numbers must reach the outbound queue in order, so numbering and queueing happen under one lock.
+        with self._seq_lock:
+            self._seq += 1
+            packet['seq'] = self._seq
+            codec = self._codec
+            data = self._encode_packet(packet, codec)
             try:
-                self.output.writelines((PacketManager.SIZE_PACK.pack(len(raw)), raw))
-            except Exception:  # connection reset by peer
-                log.exception('Exception while sending packet to site, will not attempt to reconnect! Quitting judge.')
-                os._exit(1)
+                self._loop.call_soon_threadsafe(self._queue_outbound, (self._seq, packet, codec, data))
+            except RuntimeError:  # The event loop is closed, so we're shutting down anyway.
+                pass
 
     def _receive_packet(self, packet: dict):
-        name = packet['name']
-        if name == 'ping':
+        if packet.get('name') == 'ping':
+            if 'last-seq' in packet:
+                self._acknowledge(packet['last-seq'])
+            # Answered straight from the event loop, so that pings keep flowing while the judge is busy.
             self.ping_packet(packet['when'])
-        elif name == 'get-current-submission':
+        else:
+            self._dispatcher.submit(self._dispatch_packet, packet)
+
+    def _dispatch_packet(self, packet: dict):
+        try:
+            self._handle_packet(packet)
+        except Exception:
+            log.exception('Exception while handling packet from site, will not attempt to reconnect! Quitting judge.')
+            # Dropped connections are resumed (see `_resume_session`), but that can't help here: the connection is
+            # fine, and it's the judge that is in an unknown state, e.g. holding a grading slot for a submission that
+            # never started. A restarted judge (e.g. by Docker) starts a new session, which makes the site give up on
+            # whatever this one was grading, so nothing is left waiting on us.
+            os._exit(1)
+
+    def _handle_packet(self, packet: dict):
+        name = packet['name']
+        if name == 'get-current-submission':
             self.current_submission_packet()
         elif name == 'submission-request':
+            # Queued ahead of the acknowledgement, so that it isn't dropped if the site forgot an earlier attempt.
+            self._loop.call_soon_threadsafe(self._forgotten_submissions.discard, packet['submission-id'])
             self.submission_acknowledged_packet(packet['submission-id'])
             from dmoj.judge import Submission
 
@@ -265,7 +469,6 @@ class PacketManager:
                     meta=packet['meta'],
                 )
             )
-            self._batch = 0
             log.info(
                 'Accept submission: %d: executor: %s, code: %s',
                 packet['submission-id'],
@@ -273,21 +476,33 @@ class PacketManager:
                 packet['problem-id'],
             )
         elif name == 'terminate-submission':
-            self.judge.abort_grading()
+            self.judge.abort_grading(packet.get('submission-id'))
         elif name == 'disconnect':
             log.info('Received disconnect request, shutting down...')
             self.disconnect()
         else:
             log.error('Unknown packet %s, payload %s', name, packet)
 
-    def handshake(self, problems: str, runtimes, id: str, key: str):
-        self._send_packet({'name': 'handshake', 'problems': problems, 'executors': runtimes, 'id': id, 'key': key})
+    async def handshake(self, problems: str, runtimes, id: str, key: str):
+        assert self.writer is not None
+        # The handshake itself always uses the original protocol, since we don't know what the site speaks yet.
+        self._codec = PacketCodec()
+        packet = {
+            'name': 'handshake',
+            'problems': problems,
+            'executors': runtimes,
+            'id': id,
+            'key': key,
+            'session-id': self.session_id,
+            'encodings': PacketCodec.supported_encodings(),
+            'compression-threshold': env.packet_compression_threshold,
+        }
+        # The handshake must precede anything queued for the site, so it bypasses the outbound queue.
+        self.writer.write(self._encode_packet(packet, self._codec))
+        await self.writer.drain()
         log.info('Awaiting handshake response: [%s]:%s', self.host, self.port)
         try:
-            data = self.input.read(PacketManager.SIZE_PACK.size)
-            size = PacketManager.SIZE_PACK.unpack(data)[0]
-            packet = utf8text(zlib.decompress(self.input.read(size)))
-            resp = json.loads(packet)
+            resp = await asyncio.wait_for(self._read_packet(), timeout=300)
         except Exception:
             log.exception('Cannot understand handshake response: [%s]:%s', self.host, self.port)
             raise JudgeAuthenticationFailed()
@@ -296,14 +511,32 @@ class PacketManager:
                 log.error('Handshake failed.')
                 raise JudgeAuthenticationFailed()
 
-    def supported_problems_packet(self, problems: List[Tuple[str, int]]):
+        # Sites that predate negotiation reply with neither field, and keep getting the original protocol.
+        try:
+            self._codec = PacketCodec(resp.get('encoding', 'json'), resp.get('compression-threshold'))
+            self._problem_deltas = bool(resp.get('problem-deltas'))
+        except ValueError:
+            log.exception('Site picked an unsupported packet encoding: [%s]:%s', self.host, self.port)
+            raise JudgeAuthenticationFailed()
+        log.info('Using %s packets, compression threshold: %s', self._codec.encoding, self._codec.compression_threshold)
+        return resp
+
+    def supported_problems_packet(self, problems: List[Tuple[str, float]]):
         log.debug('Update problems')
         self._send_packet({'name': 'supported-problems', 'problems': problems})
 
-    def test_case_status_packet(self, position: int, result: Result):
+    def supported_problems_delta_packet(self, updated: List[Tuple[str, float]], removed: List[str]):
+        if not self._problem_deltas:
+            self.supported_problems_packet(self.judge.problem_index.problems())
+            return
+
+        log.debug('Update problems: %d updated, %d removed', len(updated), len(removed))
+        self._send_packet({'name': 'supported-problems-delta', 'updated': updated, 'removed': removed})
+
+    def test_case_status_packet(self, submission_id: int, position: int, result: Result):
         log.debug(
             'Test case on %d: #%d, %s [%.3fs | %.2f MB], %.1f/%.0f',
-            self.judge.current_submission.id,
+            submission_id,
             position,
             ', '.join(result.readable_codes()),
             result.execution_time,
@@ -311,61 +544,76 @@ class PacketManager:
             result.points,
             result.total_points,
         )
-        with self._testcase_queue_lock:
-            self._testcase_queue.append((position, result))
+        with self._testcase_queue_cond:
+            self._testcase_queue.setdefault(submission_id, []).append((position, result))
+            self._testcase_queue_cond.notify()
 
-    def compile_error_packet(self, message: str):
-        log.debug('Compile error: %d', self.judge.current_submission.id)
+    def compile_error_packet(self, submission_id: int, message: str):
+        log.debug('Compile error: %d', submission_id)
         self.fallback = 4
-        self._send_packet({'name': 'compile-error', 'submission-id': self.judge.current_submission.id, 'log': message})
+        self._send_packet({'name': 'compile-error', 'submission-id': submission_id, 'log': message})
 
-    def compile_message_packet(self, message: str):
-        log.debug('Compile message: %d', self.judge.current_submission.id)
-        self._send_packet(
-            {'name': 'compile-message', 'submission-id': self.judge.current_submission.id, 'log': message}
-        )
+    def compile_message_packet(self, submission_id: int, message: str):
+        log.debug('Compile message: %d', submission_id)
+        self._send_packet({'name': 'compile-message', 'submission-id': submission_id, 'log': message})
 
-    def internal_error_packet(self, message: str):
-        log.debug('Internal error: %d', self.judge.current_submission.id)
-        self._flush_testcase_queue()
-        self._send_packet(
-            {'name': 'internal-error', 'submission-id': self.judge.current_submission.id, 'message': message}
-        )
+    def internal_error_packet(self, submission_id: Optional[int], message: str):
+        log.debug('Internal error: %s', submission_id)
+        self._flush_testcase_queue(submission_id)
+        self._send_packet({'name': 'internal-error', 'submission-id': submission_id, 'message': message})
 
-    def begin_grading_packet(self, is_pretested: bool):
-        log.debug('Begin grading: %d', self.judge.current_submission.id)
-        self._send_packet(
-            {'name': 'grading-begin', 'submission-id': self.judge.current_submission.id, 'pretested': is_pretested}
-        )
+    def begin_grading_packet(self, submission_id: int, is_pretested: bool):
+        log.debug('Begin grading: %d', submission_id)
+        self._send_packet({'name': 'grading-begin', 'submission-id': submission_id, 'pretested': is_pretested})
 
-    def grading_end_packet(self):
-        log.debug('End grading: %d', self.judge.current_submission.id)
+    def grading_end_packet(self, submission_id: int):
+        log.debug('End grading: %d', submission_id)
         self.fallback = 4
-        self._flush_testcase_queue()
-        self._send_packet({'name': 'grading-end', 'submission-id': self.judge.current_submission.id})
-
-    def batch_begin_packet(self):
-        self._batch += 1
-        log.debug('Enter batch number %d: %d', self._batch, self.judge.current_submission.id)
-        self._flush_testcase_queue()
-        self._send_packet({'name': 'batch-begin', 'submission-id': self.judge.current_submission.id})
-
-    def batch_end_packet(self):
-        log.debug('Exit batch number %d: %d', self._batch, self.judge.current_submission.id)
-        self._flush_testcase_queue()
-        self._send_packet({'name': 'batch-end', 'submission-id': self.judge.current_submission.id})
+        self._flush_testcase_queue(submission_id)
+        self._send_packet({'name': 'grading-end', 'submission-id': submission_id})
+
+    def batch_begin_packet(self, submission_id: int):
+        log.debug('Enter batch: %d', submission_id)
+        self._flush_testcase_queue(submission_id)
+        self._send_packet({'name': 'batch-begin', 'submission-id': submission_id})
+
+    def batch_end_packet(self, submission_id: int):
+        log.debug('Exit batch: %d', submission_id)
+        self._flush_testcase_queue(submission_id)
+        self._send_packet({'name': 'batch-end', 'submission-id': submission_id})
+
+    def _current_submission_ids(self) -> List[int]:
+        return [
+            submission.id
+            for submission in self.judge.current_submissions
+            if submission.id not in self._forgotten_submissions
+        ]
 
     def current_submission_packet(self):
-        log.debug('Current submission query: %d', self.judge.current_submission.id)
-        self._send_packet({'name': 'current-submission-id', 'submission-id': self.judge.current_submission.id})
+        submission_ids = self._current_submission_ids()
+        log.debug('Current submission query: %s', submission_ids)
+        # Older sites only understand a single submission ID, so report the first running submission there.
+        self._send_packet(
+            {
+                'name': 'current-submission-id',
+                'submission-id': submission_ids[0] if submission_ids else None,
+                'submission-ids': submission_ids,
+            }
+        )
 
-    def submission_aborted_packet(self):
-        log.debug('Submission aborted: %d', self.judge.current_submission.id)
-        self._flush_testcase_queue()
-        self._send_packet({'name': 'submission-terminated', 'submission-id': self.judge.current_submission.id})
+    def submission_aborted_packet(self, submission_id: int):
+        log.debug('Submission aborted: %d', submission_id)
+        self._flush_testcase_queue(submission_id)
+        self._send_packet({'name': 'submission-terminated', 'submission-id': submission_id})
 
     def ping_packet(self, when: float):
-        data = {'name': 'ping-response', 'when': when, 'time': time.time()}
+        data = {
+            'name': 'ping-response',
+            'when': when,
+            'time': time.time(),
+            'grading-slots': self.judge.grading_slots,
+            'submission-ids': self._current_submission_ids(),
+        }
         for fn in sysinfo.report_callbacks:
             key, value = fn()
             data[key] = value
@@ -1,10 +1,16 @@
+import copy
+import hashlib
 import itertools
+import logging
 import os
 import re
 import subprocess
+import threading
 import zipfile
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from typing import List, NamedTuple, Optional, Tuple
 
 import yaml
 from yaml.parser import ParserError
@@ -12,35 +18,215 @@ from yaml.scanner import ScannerError
 
 from dmoj import checkers
 from dmoj.config import ConfigNode, InvalidInitException
+from dmoj.cptbox.utils import MemoryIO
 from dmoj.judgeenv import env, get_problem_root
 from dmoj.utils.helper_files import compile_with_auxiliary_files, parse_helper_file_error
 from dmoj.utils.module import load_module_from_file
+from dmoj.utils.shared_data_cache import get_generator_cache, get_shared_data_cache
+from dmoj.utils.streamed_data import StreamedData
+
+log = logging.getLogger(__name__)
 
 DEFAULT_TEST_CASE_INPUT_PATTERN = r'^(?=.*?\.in|in).*?(?:(?:^|\W)(?P<batch>\d+)[^\d\s]+)?(?P<case>\d+)[^\d\s]*$'
 DEFAULT_TEST_CASE_OUTPUT_PATTERN = r'^(?=.*?\.out|out).*?(?:(?:^|\W)(?P<batch>\d+)[^\d\s]+)?(?P<case>\d+)[^\d\s]*$'
 
+CachedProblemConfig = NamedTuple(
+    'CachedProblemConfig',
+    [
+        ('root_dir', str),
+        # (filename, mtime, size) of every file the configuration was resolved from.
+        ('stamp', Tuple[Tuple[str, int, int], ...]),
+        ('doc', dict),
+        # Test cases matched from the archive listing, if the problem didn't list them itself.
+        ('test_cases', Optional[List[dict]]),
+    ],
+)
+
+
+def stamp_problem_files(root_dir, filenames):
+    stamp = []
+    for filename in filenames:
+        stat = os.stat(os.path.join(root_dir, filename))
+        stamp.append((filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+class ProblemConfigCache:
+    """
+    Resolved problem configurations, kept by the judge across submissions.
+
+    Parsing `init.yml` and matching test cases against the archive listing is repeated for every submission otherwise,
+    and for problems with thousands of test files, it takes longer than running the first case. Workers resolve the
+    configuration on a miss and send it back to the judge, which hands it to every later worker grading the problem.
+
+    An entry is only used while its problem root and the mtimes and sizes of the files it was read from are unchanged.
+    The judge also drops entries for the problems that the problem monitor reports as changed.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, problem_id):
+        with self._lock:
+            entry = self._entries.get(problem_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(problem_id)
+
+        try:
+            fresh = get_problem_root(problem_id) == entry.root_dir and (
+                stamp_problem_files(entry.root_dir, [filename for filename, _, _ in entry.stamp]) == entry.stamp
+            )
+        except OSError:
+            fresh = False
+
+        if not fresh:
+            with self._lock:
+                if self._entries.get(problem_id) is entry:
+                    del self._entries[problem_id]
+            return None
+        return entry
+
+    def store(self, problem_id, entry):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[problem_id] = entry
+            self._entries.move_to_end(problem_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, problem_ids):
+        with self._lock:
+            for problem_id in problem_ids:
+                self._entries.pop(problem_id, None)
+
+
+class ArchiveCache:
+    """
+    Open problem archives, kept by workers across submissions.
+
+    Opening an archive parses its central directory, which for archives of thousands of test files takes as long as
+    matching test cases against it. The open archive holds the parsed index, so every later submission for the problem
+    that the same worker grades gets to look members up right away.
+
+    An archive is reopened once its mtime or size changes. Every `open` must be matched by a `release` once the caller
+    is done reading from the archive; archives that were evicted, or never cached, are closed on their last release.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Number of unreleased opens, by archive.
+        self._users = {}
+
+    def open(self, path):
+        stat = os.stat(path)
+        stamp = stat.st_mtime_ns, stat.st_size
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                self._users[entry[1]] += 1
+                return entry[1]
+
+        archive = zipfile.ZipFile(path, 'r')
+        with self._lock:
+            self._users[archive] = 1
+            if self.size > 0:
+                evicted = [self._entries.pop(path)] if path in self._entries else []
+                self._entries[path] = stamp, archive
+                while len(self._entries) > self.size:
+                    evicted.append(self._entries.popitem(last=False)[1])
+                for _, old_archive in evicted:
+                    self._close_if_unused(old_archive)
+        return archive
+
+    def release(self, archive):
+        with self._lock:
+            self._users[archive] -= 1
+            self._close_if_unused(archive)
+
+    def _close_if_unused(self, archive):
+        if self._users[archive] or any(cached is archive for _, cached in self._entries.values()):
+            return
+        del self._users[archive]
+        archive.close()
+
+
+_archive_cache = None
+_archive_cache_lock = threading.Lock()
+
+
+def get_archive_cache():
+    global _archive_cache
+
+    with _archive_cache_lock:
+        if _archive_cache is None:
+            _archive_cache = ArchiveCache(env.archive_cache_size)
+        return _archive_cache
+
 
 class Problem:
-    def __init__(self, problem_id, time_limit, memory_limit, meta):
+    def __init__(self, problem_id, time_limit, memory_limit, meta, cached_config=None):
         self.id = problem_id
         self.time_limit = time_limit
         self.memory_limit = memory_limit
         self.meta = ConfigNode(meta)
 
         # Cache root dir so that we don't need to scan all roots (potentially very slow on networked mount).
-        self.root_dir = get_problem_root(problem_id)
+        self.root_dir = cached_config.root_dir if cached_config else get_problem_root(problem_id)
         self.problem_data = ProblemDataManager(self.root_dir)
 
         # Checkers modules must be stored in a dict, for the duration of execution,
         # lest globals be deleted with the module.
         self._checkers = {}
-
-        self.config = ProblemConfig(self.problem_data, meta)
+        # Checkers as resolved for test cases, and helper programs compiled for them, so that it's done once per problem
+        # rather than once per case.
+        self.resolved_checkers = {}
+        self._helper_executors = {}
+        self._helper_executors_lock = threading.Lock()
+        # Helper processes kept running across cases, such as batch checkers; see `close`.
+        self.helper_processes = {}
+
+        if cached_config:
+            self.config = ProblemConfig(self.problem_data, meta, doc=cached_config.doc)
+        else:
+            # Stamp the files before reading them, so that a change made while we're reading can't go unnoticed.
+            stamp = self._stamp_files(['init.yml'])
+            self.config = ProblemConfig(self.problem_data, meta)
+            # Dynamic keys are evaluated in place, so hold on to the document as it was parsed for the cache.
+            doc = copy.deepcopy(self.config.doc)
+            if stamp is not None:
+                # Without an archive, the problem's data lives in its directory, whose mtime changes as files are added,
+                # removed or renamed in it.
+                listing_stamp = self._stamp_files([self.config.archive or '.'])
+                stamp = stamp + listing_stamp if listing_stamp is not None else None
 
         self.problem_data.archive = self._resolve_archive_files()
+        try:
+            self._matched_test_cases = cached_config.test_cases if cached_config else None
+            if self._matched_test_cases is not None:
+                self.config['test_cases'] = self._matched_test_cases
 
-        if not self._resolve_test_cases():
-            raise InvalidInitException('No test cases? What am I judging?')
+            if not self._resolve_test_cases():
+                raise InvalidInitException('No test cases? What am I judging?')
+        except BaseException:
+            self.close()
+            raise
+
+        self.cached_config = cached_config
+        if cached_config is None and stamp is not None:
+            self.cached_config = CachedProblemConfig(self.root_dir, stamp, doc, self._matched_test_cases)
+
+    def _stamp_files(self, filenames):
+        try:
+            return stamp_problem_files(self.root_dir, filenames)
+        except (OSError, TypeError):
+            return None
 
     def _match_test_cases(self, filenames, input_case_pattern, output_case_pattern, case_points):
         def try_match_int(match, group):
@@ -130,7 +316,7 @@ class Problem:
             return test_cases[name] or default
 
         # If the `test_cases` node is None, we try to guess the testcase name format.
-        self.config['test_cases'] = self._match_test_cases(
+        self.config['test_cases'] = self._matched_test_cases = self._match_test_cases(
             self._problem_file_list(),
             re.compile(get_with_default('input_format', DEFAULT_TEST_CASE_INPUT_PATTERN), re.IGNORECASE),
             re.compile(get_with_default('output_format', DEFAULT_TEST_CASE_OUTPUT_PATTERN), re.IGNORECASE),
@@ -145,6 +331,31 @@ class Problem:
         self._checkers[name] = checker = load_module_from_file(os.path.join(self.root_dir, name))
         return checker
 
+    def get_helper_executor(self, filenames, flags, lang, compiler_time_limit, unbuffered=False):
+        """
+        Compiles a helper program, such as a checker or generator, the first time it's asked for.
+        """
+        key = tuple(filenames), tuple(flags), lang, compiler_time_limit, unbuffered
+        # Held while compiling, so that cases asking for the same helper at once wait for it to be compiled just once.
+        with self._helper_executors_lock:
+            executor = self._helper_executors.get(key)
+            if executor is None:
+                executor = compile_with_auxiliary_files(filenames, flags, lang, compiler_time_limit, unbuffered)
+                self._helper_executors[key] = executor
+        return executor
+
+    def close(self):
+        """
+        Stops the helper processes kept running across cases, and releases the archive, once grading is done.
+        """
+        for process in self.helper_processes.values():
+            process.close()
+        self.helper_processes.clear()
+
+        archive, self.problem_data.archive = self.problem_data.archive, None
+        if archive is not None:
+            get_archive_cache().release(archive)
+
     @property
     def grader_class(self):
         from dmoj import graders
@@ -164,13 +375,87 @@ class Problem:
             if not os.path.exists(archive_path):
                 raise InvalidInitException('archive file "%s" does not exist' % archive_path)
             try:
-                archive = zipfile.ZipFile(archive_path, 'r')
+                archive = get_archive_cache().open(archive_path)
             except zipfile.BadZipfile:
                 raise InvalidInitException('bad archive: "%s"' % archive_path)
             return archive
         return None
 
 
+class CasePrefetcher:
+    """
+    Prepares the data of upcoming test cases in the background, while earlier cases are being graded.
+
+    The `window` cases following the one being graded are prefetched, on up to `workers` threads, so that at most that
+    many cases' data is held ahead of time. Failures are left for grading to run into and report.
+    """
+
+    def __init__(self, cases, window, workers):
+        self.cases = cases
+        self.window = window
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=type(self).__name__)
+        self._lock = threading.Lock()
+        self._position = 0
+        self._next = 0
+        self._futures = []
+
+    def advance(self, position):
+        """
+        Notes that the case at index `position` of `cases` is being graded, and prefetches the cases after it.
+        """
+        with self._lock:
+            self._position = position
+            self._next = max(self._next, position + 1)
+            while self._next < min(len(self.cases), position + 1 + self.window):
+                self._futures.append(self._executor.submit(self._prefetch, self._next))
+                self._next += 1
+
+    def _prefetch(self, index):
+        with self._lock:
+            if index <= self._position:
+                # Grading got here first, and would have to free whatever we prepared.
+                return
+        try:
+            self.prefetch_case(self.cases[index])
+        except Exception:
+            log.debug('Failed to prefetch data for case %d', index, exc_info=True)
+
+    def prefetch_case(self, case):
+        raise NotImplementedError()
+
+    def close(self):
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.cancel()
+        # Prefetches that are already running are bounded by the size of one case, so let them finish on their own.
+        self._executor.shutdown(wait=False)
+
+
+class GeneratorPrefetcher(CasePrefetcher):
+    """
+    Runs the generators of up to `concurrency` upcoming cases at once.
+    """
+
+    def __init__(self, cases, concurrency):
+        super().__init__(cases, concurrency, concurrency)
+
+    def prefetch_case(self, case):
+        case.prefetch_data()
+
+
+class ArchivePrefetcher(CasePrefetcher):
+    """
+    Decompresses the archive members of up to `window` upcoming cases, one at a time.
+    """
+
+    def __init__(self, cases, window):
+        super().__init__(cases, window, 1)
+
+    def prefetch_case(self, case):
+        case.prefetch_archive_data()
+
+
 class ProblemDataManager(dict):
     def __init__(self, problem_root_dir, **kwargs):
         super().__init__(**kwargs)
@@ -188,20 +473,75 @@ class ProblemDataManager(dict):
                     return f.read()
             raise KeyError('file "%s" could not be found in "%s"' % (key, self.problem_root_dir))
 
-    def __del__(self):
+    def open(self, key):
+        """
+        Opens `key` for reading, without reading it into memory.
+        """
+        try:
+            return open(os.path.join(self.problem_root_dir, key), 'rb')
+        except IOError:
+            if self.archive:
+                return self.archive.open(self.archive.getinfo(key))
+            raise KeyError('file "%s" could not be found in "%s"' % (key, self.problem_root_dir))
+
+    def in_archive(self, key):
+        """
+        Returns whether `key` would be read from the archive.
+        """
+        if not self.archive or key in self or os.path.exists(os.path.join(self.problem_root_dir, key)):
+            return False
+        return key in self.archive.NameToInfo
+
+    def size(self, key):
+        """
+        Returns the size of `key` in bytes, without reading it, or None if `key` doesn't exist.
+        """
+        if key in self:
+            return len(self[key])
+        try:
+            return os.path.getsize(os.path.join(self.problem_root_dir, key))
+        except OSError:
+            pass
         if self.archive:
-            self.archive.close()
+            try:
+                return self.archive.getinfo(key).file_size
+            except KeyError:
+                pass
+        return None
+
+    def content_key(self, key):
+        """
+        Returns a value identifying the current contents of `key`, without reading it, or None if `key` doesn't exist.
+        """
+        path = os.path.join(self.problem_root_dir, key)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            pass
+        else:
+            return path, stat.st_mtime_ns, stat.st_size
+
+        if self.archive:
+            try:
+                zipinfo = self.archive.getinfo(key)
+                stat = os.stat(self.archive.filename)
+            except (KeyError, OSError):
+                return None
+            return self.archive.filename, stat.st_mtime_ns, stat.st_size, key, zipinfo.CRC, zipinfo.file_size
+        return None
 
 
 class ProblemConfig(ConfigNode):
-    def __init__(self, problem_data, meta={}):
+    def __init__(self, problem_data, meta={}, doc=None):
         try:
-            doc = yaml.safe_load(problem_data['init.yml'])
+            if doc is None:
+                doc = yaml.safe_load(problem_data['init.yml'])
         except (IOError, KeyError, ParserError, ScannerError) as e:
             raise InvalidInitException(str(e))
         else:
             if not doc:
                 raise InvalidInitException('I find your lack of content disturbing.')
+            self.doc = doc
             super().__init__(
                 doc,
                 defaults={
@@ -241,6 +581,12 @@ class TestCase:
         self.output_prefix_length = config.output_prefix_length
         self.has_binary_data = config.binary_data
         self._generated = None
+        # Test data too large to be read into memory, by filename.
+        self._streamed = {}
+        # Test data decompressed from the archive ahead of time, by filename.
+        self._prefetched = {}
+        # Generators may be run ahead of time by a `GeneratorPrefetcher`, which grading must wait for rather than race.
+        self._generator_lock = threading.Lock()
 
     def _normalize(self, data):
         # Perhaps the correct answer may be 'no output', in which case it'll be
@@ -264,6 +610,44 @@ class TestCase:
 
         return data
 
+    def _data_key(self, filename):
+        if get_shared_data_cache() is None:
+            return None
+        key = self.problem.problem_data.content_key(filename)
+        # Normalization depends on whether the data is binary, so it's part of the key.
+        return key + (self.has_binary_data,) if key is not None else None
+
+    def _read_data(self, filename):
+        data = self._prefetched.get(filename)
+        if data is not None:
+            return data
+
+        key = self._data_key(filename)
+        if key is None:
+            return self._normalize(self.problem.problem_data[filename])
+
+        cache = get_shared_data_cache()
+        data = cache.get(key)
+        if data is None:
+            data = self._normalize(self.problem.problem_data[filename])
+            cache.put(key, data)
+        return data
+
+    def _should_stream(self, filename):
+        threshold = env.test_data_stream_threshold
+        if not threshold:
+            return False
+        size = self.problem.problem_data.size(filename)
+        return size is not None and size > threshold
+
+    def _streamed_data(self, filename):
+        data = self._streamed.get(filename)
+        if data is None:
+            with self.problem.problem_data.open(filename) as source:
+                data = StreamedData.from_stream(source, normalize=not self.has_binary_data)
+            self._streamed[filename] = data
+        return data
+
     def _run_generator(self, gen, args=None):
         flags = []
         args = args or []
@@ -301,10 +685,24 @@ class TestCase:
             filenames = [filenames]
 
         filenames = [os.path.abspath(os.path.join(base, name)) for name in filenames]
-        executor = compile_with_auxiliary_files(filenames, flags, lang, compiler_time_limit)
 
         # convert all args to str before launching; allows for smoother int passing
-        args = map(str, args)
+        args = [str(arg) for arg in args]
+
+        try:
+            input = self.problem.problem_data[self.config['in']] if self.config['in'] else None
+        except KeyError:
+            input = None
+
+        cache = get_generator_cache()
+        if cache is not None:
+            key = self._generator_cache_key(filenames, flags, lang, args, input)
+            generated = [cache.get(key + (stream,)) for stream in ('stdout', 'stderr')]
+            if None not in generated:
+                self._generated = generated
+                return
+
+        executor = self.problem.get_helper_executor(filenames, flags, lang, compiler_time_limit)
 
         # setting large buffers is really important, because otherwise stderr is unbuffered
         # and the generator begins calling into cptbox Python code really frequently
@@ -319,42 +717,146 @@ class TestCase:
             stdout_buffer_size=65536
         )
 
-        try:
-            input = self.problem.problem_data[self.config['in']] if self.config['in'] else None
-        except KeyError:
-            input = None
-
         stdout, stderr = proc.unsafe_communicate(input)
         self._generated = list(map(self._normalize, (stdout, stderr)))
 
         parse_helper_file_error(proc, executor, 'generator', stderr, time_limit, memory_limit)
 
-    def input_data(self):
+        if cache is not None:
+            for stream, data in zip(('stdout', 'stderr'), self._generated):
+                cache.put(key + (stream,), data)
+
+    def _generator_cache_key(self, filenames, flags, lang, args, input):
+        # Generator output is addressed by everything that goes into producing it, so a changed generator or input
+        # simply misses the cache, and the stale output ages out.
+        sources = []
+        for filename in filenames:
+            with open(filename, 'rb') as f:
+                sources.append((os.path.basename(filename), hashlib.sha256(f.read()).hexdigest()))
+        input_digest = hashlib.sha256(input).hexdigest() if input is not None else None
+        return 'generator', tuple(sources), tuple(flags), lang, tuple(args), input_digest, self.has_binary_data
+
+    def _generated_input(self):
         gen = self.config.generator
 
         # don't try running the generator if we specify an output file explicitly,
         # otherwise generator may segfault and we end up returning the output file anyway
         if gen and (not self.config['out'] or not self.config['in']):
-            if self._generated is None:
-                self._run_generator(gen, args=self.config.generator_args)
-            if self._generated[0]:
-                return self._generated[0]
+            self._generate(gen)
+            return self._generated[0] or None
+        return None
+
+    def input_data(self):
+        generated = self._generated_input()
+        if generated:
+            return generated
         # in file is optional
-        return self._normalize(self.problem.problem_data[self.config['in']]) if self.config['in'] else b''
+        return self._read_data(self.config['in']) if self.config['in'] else b''
+
+    def _data_buffer(self, filename, read):
+        if self._should_stream(filename):
+            return self._streamed_data(filename).buffer()
+        key = self._data_key(filename)
+        buffer = get_shared_data_cache().map(key) if key is not None else None
+        return buffer if buffer is not None else read()
+
+    def input_buffer(self):
+        """
+        Returns `input_data()`, or for large or shared test data, a read-only mapping of the file holding it.
+        """
+        if self._generated_input() is None and self.config['in']:
+            return self._data_buffer(self.config['in'], self.input_data)
+        return self.input_data()
+
+    def input_file(self):
+        """
+        Returns a read-only file holding `input_data()`, positioned at its start, for use as the submission's stdin.
+
+        Streamed and shared test data is opened directly; anything else is copied into a sealed memory file in one go.
+        """
+        if self._generated_input() is None and self.config['in']:
+            if self._should_stream(self.config['in']):
+                return self._streamed_data(self.config['in']).open()
+            key = self._data_key(self.config['in'])
+            input_file = get_shared_data_cache().open(key) if key is not None else None
+            if input_file is not None:
+                return input_file
+
+        # Reading the data shares it, if it can be, so that later cases find it in the cache.
+        data = self.input_data()
+        input_file = MemoryIO()
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[input_file.write(view) :]
+            try:
+                input_file.seal()
+            except OSError:
+                # Not supported on FreeBSD; the submission could only ever change its own input.
+                pass
+            input_file.seek(0)
+        except BaseException:
+            input_file.close()
+            raise
+        return input_file
 
     def output_data(self):
         if self.config.out:
-            return self._normalize(self.problem.problem_data[self.config.out])
+            return self._read_data(self.config.out)
         gen = self.config.generator
         if gen:
-            if self._generated is None:
-                self._run_generator(gen, args=self.config.generator_args)
+            self._generate(gen)
             return self._generated[1]
         return b''
 
+    def output_buffer(self):
+        """
+        Returns `output_data()`, or for large or shared test data, a read-only mapping of the file holding it.
+        """
+        if self.config.out:
+            return self._data_buffer(self.config.out, self.output_data)
+        return self.output_data()
+
+    def _generate(self, gen):
+        with self._generator_lock:
+            if self._generated is None:
+                self._run_generator(gen, args=self.config.generator_args)
+
+    def prefetch_data(self):
+        """
+        Runs this case's generator, if it has one, so that its data is ready by the time the case is graded.
+        """
+        gen = self.config.generator
+        if gen and (not self.config['out'] or not self.config['in']):
+            self._generate(gen)
+
+    def prefetch_archive_data(self):
+        """
+        Decompresses and normalizes this case's test data from the archive, so that it's ready by the time the case is
+        graded. With shared test data, it goes into the shared cache, where other workers benefit from it too.
+        """
+        problem_data = self.problem.problem_data
+        for filename in (self.config['in'], self.config['out']):
+            if not filename or not problem_data.in_archive(filename) or self._should_stream(filename):
+                continue
+            key = self._data_key(filename)
+            if key is None:
+                self._prefetched[filename] = self._read_data(filename)
+            elif key not in get_shared_data_cache():
+                self._read_data(filename)
+
     def checker(self):
+        name = self.config['checker'] or 'standard'
+        # Cases mostly inherit their checker from the problem. A configuration lives as long as the problem does, so
+        # its identity tells cases with the same checker apart from the rest.
+        key = id(name.unwrap()) if isinstance(name, ConfigNode) else name
+        checker = self.problem.resolved_checkers.get(key)
+        if checker is None:
+            checker = self.problem.resolved_checkers[key] = self._resolve_checker(name)
+        return checker
+
+    def _resolve_checker(self, name):
         try:
-            name = self.config['checker'] or 'standard'
             if isinstance(name, ConfigNode):
                 params = name['args'] or {}
                 name = name['name']
@@ -372,17 +874,24 @@ class TestCase:
         if not hasattr(checker, 'check') or not callable(checker.check):
             raise InvalidInitException('malformed checker: no check method found')
 
+        if getattr(checker.check, 'accepts_problem', False):
+            # Lets the checker keep what it needs across cases on the problem, such as its compiled helper program.
+            return partial(checker.check, problem=self.problem, **params)
         return partial(checker.check, **params)
 
     def free_data(self):
         self._generated = None
+        self._prefetched.clear()
+        for data in self._streamed.values():
+            data.close()
+        self._streamed.clear()
 
     def __str__(self):
         return 'TestCase{in=%s,out=%s,points=%s}' % (self.config['in'], self.config['out'], self.config['points'])
 
     # FIXME(tbrindus): this is a hack working around the fact we can't pickle these fields, but we do need parts of
     # TestCase itself on the other end of the IPC.
-    _pickle_blacklist = ('_generated', 'config', 'problem')
+    _pickle_blacklist = ('_generated', '_generator_lock', '_streamed', '_prefetched', 'config', 'problem')
 
     def __getstate__(self):
         k = {k: v for k, v in self.__dict__.items() if k not in self._pickle_blacklist}
@@ -0,0 +1,108 @@
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from dmoj.judgeenv import clear_problem_dirs_cache, get_problem_roots
+from dmoj.utils.unicode import utf8text
+
+ProblemIndexDelta = NamedTuple(
+    'ProblemIndexDelta',
+    [
+        ('updated', List[Tuple[str, float]]),
+        ('removed', List[str]),
+        # Every problem that was looked at again and still exists or was removed, whether or not its mtime changed;
+        # editing a file inside a problem doesn't change the mtime of the problem directory.
+        ('touched', List[str]),
+    ],
+)
+
+
+class ProblemIndex:
+    """
+    An in-memory index of the problems this judge can grade, and their mtimes.
+
+    Scanning every problem root means a `listdir` per root and a couple of `stat`s per problem, which takes seconds for
+    large problem sets on network storage. So after the initial scan, the index is kept up to date from the paths that
+    the problem monitor reports as changed, and only the problems containing those paths are looked at again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._problems: Dict[str, float] = {}
+        self._roots: List[str] = []
+        self._built = False
+
+    def problems(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            if not self._built:
+                self._rebuild()
+            return list(self._problems.items())
+
+    def rebuild(self) -> ProblemIndexDelta:
+        with self._lock:
+            return self._rebuild()
+
+    def update(self, paths: Iterable[str]) -> ProblemIndexDelta:
+        with self._lock:
+            if not self._built:
+                return self._rebuild()
+
+            affected: Set[str] = set()
+            for path in paths:
+                problem = self._find_problem(utf8text(os.path.normpath(path)))
+                if problem is None:
+                    # Not inside any problem root, so the set of problem roots itself may have changed.
+                    return self._rebuild()
+                if problem:
+                    affected.add(problem)
+            return self._refresh(affected)
+
+    def _find_problem(self, path: str) -> Optional[str]:
+        # Returns the problem containing `path`, an empty string if `path` is a problem root, or None if it's in
+        # neither.
+        for root in self._roots:
+            if path == root:
+                return ''
+            if path.startswith(root + os.sep):
+                return os.path.relpath(path, root).split(os.sep, 1)[0]
+        return None
+
+    def _stat_problem(self, problem: str) -> Optional[float]:
+        # As with `get_problem_root`, the first root containing the problem wins.
+        for root in self._roots:
+            problem_dir = os.path.join(root, problem)
+            if os.access(os.path.join(problem_dir, 'init.yml'), os.R_OK):
+                try:
+                    return os.path.getmtime(problem_dir)
+                except OSError:
+                    continue
+        return None
+
+    def _refresh(self, problems: Iterable[str]) -> ProblemIndexDelta:
+        delta = ProblemIndexDelta([], [], [])
+        for problem in problems:
+            mtime = self._stat_problem(problem)
+            if mtime is None:
+                if self._problems.pop(problem, None) is not None:
+                    delta.removed.append(problem)
+                    delta.touched.append(problem)
+                continue
+            if self._problems.get(problem) != mtime:
+                self._problems[problem] = mtime
+                delta.updated.append((problem, mtime))
+            delta.touched.append(problem)
+        return delta
+
+    def _rebuild(self) -> ProblemIndexDelta:
+        clear_problem_dirs_cache()
+        self._roots = [utf8text(os.path.normpath(root)) for root in get_problem_roots()]
+
+        candidates: Set[str] = set(self._problems)
+        for root in self._roots:
+            try:
+                candidates.update(utf8text(problem) for problem in os.listdir(root))
+            except OSError:
+                pass
+
+        self._built = True
+        return self._refresh(candidates)
@@ -1,6 +1,8 @@
 import os
 from multiprocessing import cpu_count as _get_cpu_count
 
+from dmoj.utils.cpu_slots import get_cpu_slot_scheduler
+
 _cpu_count = _get_cpu_count()
 
 
@@ -31,4 +33,11 @@ def cpu_count():
     return 'cpu-count', _cpu_count
 
 
-report_callbacks = [load_fair, cpu_count]
+def cpu_slots():
+    scheduler = get_cpu_slot_scheduler()
+    if scheduler is None:
+        return 'cpu-slots', None
+    return 'cpu-slots', {'slots': scheduler.slots, 'busy': scheduler.busy_count()}
+
+
+report_callbacks = [load_fair, cpu_count, cpu_slots]
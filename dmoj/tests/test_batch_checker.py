@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from dmoj.contrib.batch import BatchChecker, ContribModule
+
+# Speaks the batch protocol, doing whatever the output file says for each case.
+CHECKER = r"""
+import sys, time
+memory = []
+while True:
+    paths = [sys.stdin.readline().rstrip('\n') for _ in range(3)]
+    if not paths[2]:
+        break
+    with open(paths[1]) as f:
+        action = f.read()
+    code = 0
+    if action == 'wa':
+        print('wrong answer')
+        code = 1
+    elif action == 'eof':
+        # testlib's exit code for unexpected EOF, which isn't one a batch checker may report.
+        code = 8
+    elif action == 'crash':
+        sys.exit(1)
+    elif action == 'hang':
+        time.sleep(60)
+    elif action == 'spin':
+        end = time.process_time() + 0.5
+        while time.process_time() < end:
+            pass
+    elif action == 'allocate':
+        memory.append(bytearray(64 * 1024 * 1024))
+        memory.pop()
+    sys.stdout.write('\0DMOJ-BATCH-END %d\n' % code)
+    sys.stdout.flush()
+    sys.stderr.write('ok\n' if code == 0 else '')
+    sys.stderr.write('\0DMOJ-BATCH-END\n')
+    sys.stderr.flush()
+"""
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.launches = []
+
+    def launch(self, *args, **kwargs):
+        self.launches.append((args, kwargs))
+        return subprocess.Popen(
+            [sys.executable, '-c', CHECKER] + list(args),
+            stdin=kwargs['stdin'],
+            stdout=kwargs['stdout'],
+            stderr=kwargs['stderr'],
+        )
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'batch checkers need /proc')
+class BatchCheckerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.executor = FakeExecutor()
+        self.checker = BatchChecker(self.executor, 0.25, 32768, ContribModule.batch_exit_codes)
+        self.addCleanup(self.checker.close)
+
+    def check(self, action):
+        path = os.path.join(self.dir.name, 'output')
+        with open(path, 'w') as f:
+            f.write(action)
+        return self.checker.check(path, path, path)
+
+    def test_many_cases(self):
+        self.assertEqual(self.check('ok'), (0, b'', b'ok\n'))
+        self.assertEqual(self.check('wa'), (1, b'wrong answer\n', b''))
+        self.assertEqual(self.check('ok'), (0, b'', b'ok\n'))
+        self.assertEqual(len(self.executor.launches), 1)
+        self.assertEqual(self.executor.launches[0][0], ('--dmoj-batch',))
+
+    def assert_falls_back(self, action):
+        self.assertIsNotNone(self.check('ok'))
+        process = self.checker._process
+        self.assertIsNone(self.check(action))
+        self.assertIsNotNone(process.poll())
+        # Once broken, the checker is never launched again.
+        self.assertIsNone(self.check('ok'))
+        self.assertEqual(len(self.executor.launches), 1)
+
+    def test_crash(self):
+        self.assert_falls_back('crash')
+
+    def test_time_limit(self):
+        self.assert_falls_back('spin')
+
+    def test_wall_time_limit(self):
+        start = time.monotonic()
+        self.assert_falls_back('hang')
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_memory_limit(self):
+        self.assert_falls_back('allocate')
+
+    def test_unknown_exit_code(self):
+        self.assertIsNotNone(self.check('ok'))
+        process = self.checker._process
+        self.assertIsNone(self.check('eof'))
+        # The case is checked on its own, but the checker carries on with the cases after it.
+        self.assertIsNone(process.poll())
+        self.assertEqual(self.check('ok'), (0, b'', b'ok\n'))
+        self.assertEqual(len(self.executor.launches), 1)
+
+    def test_busy(self):
+        with self.checker._lock:
+            self.assertIsNone(self.check('ok'))
+        self.assertIsNotNone(self.check('ok'))
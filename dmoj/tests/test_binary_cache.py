@@ -0,0 +1,123 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from dmoj.executors.binary_cache import CompiledBinaryCache
+
+
+class CompiledBinaryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = CompiledBinaryCache(self.directory.name, 2)
+
+    def build(self, key, content=b'binary', cache=None):
+        cache = cache or self.cache
+        with cache.lock(key):
+            entry_dir = cache.prepare(key)
+            executable = os.path.join(entry_dir, 'checker')
+            with open(executable, 'wb') as f:
+                f.write(content)
+            cache.commit(key, executable).close()
+        return executable
+
+    def lookup(self, key, cache=None):
+        found = (cache or self.cache).get(key)
+        if found is None:
+            return None
+        executable, manifest = found
+        manifest.close()
+        return executable
+
+    def age(self, key):
+        manifest = os.path.join(self.cache.entry_dir(key), '.manifest')
+        stat = os.stat(manifest)
+        os.utime(manifest, (stat.st_atime - 10, stat.st_mtime - 10))
+
+    def test_round_trip(self):
+        self.assertIsNone(self.lookup('a'))
+        executable = self.build('a')
+        self.assertEqual(self.lookup('a'), executable)
+        # Entries outlive the process that built them.
+        self.assertEqual(self.lookup('a', CompiledBinaryCache(self.directory.name, 2)), executable)
+
+    def test_partial_build_discarded(self):
+        with self.cache.lock('a'):
+            entry_dir = self.cache.prepare('a')
+            with open(os.path.join(entry_dir, 'checker.o'), 'wb'):
+                pass
+        self.assertIsNone(self.lookup('a'))
+
+        self.build('a')
+        self.assertFalse(os.path.exists(os.path.join(self.cache.entry_dir('a'), 'checker.o')))
+
+    def test_abandoned_build_reclaimed(self):
+        with self.cache.lock('a'):
+            self.cache.prepare('a')
+        with self.cache.lock('b'):
+            self.cache.prepare('b')
+            self.build('c')
+            # Nobody is building the first entry any more, but the second one is still being built.
+            self.assertFalse(os.path.exists(self.cache.entry_dir('a')))
+            self.assertTrue(os.path.isdir(self.cache.entry_dir('b')))
+
+    def test_least_recently_used_evicted(self):
+        self.build('a')
+        self.build('b')
+        self.age('b')
+
+        self.build('c')
+        self.assertIsNone(self.lookup('b'))
+        self.assertIsNotNone(self.lookup('a'))
+        self.assertIsNotNone(self.lookup('c'))
+
+    def test_entry_in_use_not_evicted(self):
+        self.build('a')
+        self.build('b')
+        self.age('b')
+        executable, manifest = self.cache.get('b')
+        self.age('b')
+
+        self.build('c')
+        self.assertTrue(os.path.isfile(executable))
+        self.assertIsNone(self.lookup('a'))
+
+        manifest.close()
+        self.build('d')
+        self.assertIsNone(self.lookup('b'))
+
+    def test_evicted_by_size(self):
+        cache = CompiledBinaryCache(self.directory.name, 10, max_bytes=40)
+        self.build('a', b'x' * 15, cache)
+        self.age('a')
+        self.build('b', b'x' * 15, cache)
+        self.assertIsNone(self.lookup('a', cache))
+        self.assertIsNotNone(self.lookup('b', cache))
+
+    def test_concurrent_builders_wait(self):
+        building = threading.Event()
+        finish = threading.Event()
+        found = []
+
+        def first():
+            with self.cache.lock('a'):
+                building.set()
+                finish.wait(5)
+                executable = os.path.join(self.cache.prepare('a'), 'checker')
+                with open(executable, 'wb'):
+                    pass
+                self.cache.commit('a', executable).close()
+
+        def second():
+            with self.cache.lock('a'):
+                found.append(self.lookup('a'))
+
+        threads = [threading.Thread(target=first), threading.Thread(target=second)]
+        threads[0].start()
+        self.assertTrue(building.wait(5))
+        threads[1].start()
+        finish.set()
+        for thread in threads:
+            thread.join()
+        self.assertIsNotNone(found[0])
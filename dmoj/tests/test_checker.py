@@ -1,3 +1,5 @@
+import mmap
+import tempfile
 import unittest
 
 from dmoj.result import CheckerResult
@@ -36,6 +38,31 @@ class CheckerTest(unittest.TestCase):
         self.assert_standard_pass(check, b'a', 'a')
         self.assert_standard_fail(check, b'a', 'b')
 
+    def test_buffers(self):
+        from dmoj.checkers.floats import check as floats
+        from dmoj.checkers.identical import check as identical
+        from dmoj.checkers.standard import check as standard
+
+        # Captured output and streamed test data are handed to checkers as mappings.
+        def mapped(data):
+            f = tempfile.TemporaryFile()
+            self.addCleanup(f.close)
+            f.write(data)
+            f.flush()
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        output = mapped(b'a  b\n')
+        self.assertTrue(standard(output, b'a b'))
+        self.assertFalse(standard(output, b'a c'))
+        self.assertTrue(standard(b'a b', output))
+
+        self.assertTrue(identical(mapped(b'a\nb\n'), mapped(b'a\nb\n')))
+        self.assert_identical_pe(identical(output, mapped(b'a b\n')))
+
+        self.assertTrue(floats(mapped(b'1.0 x\n\n2.0\n'), mapped(b'1.0000001 x\n2\n')))
+        self.assertFalse(floats(mapped(b'1.0\n2.0\n'), mapped(b'1.0\n')))
+        self.assertFalse(floats(mapped(b'1.0\n'), mapped(b'1.0\n2.0\n')))
+
     def assert_wa_feedback(self, result, feedback):
         self.assertIsInstance(result, CheckerResult)
         self.assertFalse(result.passed)
@@ -0,0 +1,68 @@
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from dmoj.utils.cpu_slots import CPUSlotScheduler, parse_cpu_slots
+
+
+class CPUSlotsTest(unittest.TestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.lock_dir.cleanup)
+        # Slots name CPUs regardless of how many the test host has.
+        patcher = mock.patch('os.cpu_count', return_value=4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse(self):
+        self.assertEqual(parse_cpu_slots([0, 1]), [[0], [1]])
+        self.assertEqual(parse_cpu_slots([[0, 1], 2]), [[0, 1], [2]])
+
+        self.assertRaises(ValueError, parse_cpu_slots, [[]])
+        self.assertRaises(ValueError, parse_cpu_slots, [-1])
+        self.assertRaises(ValueError, parse_cpu_slots, [[0, 1], 1])
+
+    def test_parse_unknown_cpus(self):
+        self.assertEqual(parse_cpu_slots([[0, 1], 3]), [[0, 1], [3]])
+        self.assertRaises(ValueError, parse_cpu_slots, [4])
+        self.assertRaises(ValueError, parse_cpu_slots, [[2, 5]])
+        with mock.patch('os.cpu_count', return_value=None):
+            self.assertRaises(ValueError, parse_cpu_slots, [1024])
+
+    def test_claims_are_disjoint(self):
+        scheduler = CPUSlotScheduler([[0], [1]], self.lock_dir.name)
+        with scheduler.claim() as first:
+            self.assertEqual(scheduler.busy_count(), 1)
+            with scheduler.claim() as second:
+                self.assertNotEqual(first, second)
+                self.assertEqual(scheduler.busy_count(), 2)
+        self.assertEqual(scheduler.busy_count(), 0)
+
+    def test_shared_between_schedulers(self):
+        # Schedulers in different processes coordinate through the lock files alone.
+        scheduler = CPUSlotScheduler([[0]], self.lock_dir.name)
+        other = CPUSlotScheduler([[0]], self.lock_dir.name)
+        with scheduler.claim():
+            self.assertEqual(other.busy_count(), 1)
+
+    def test_busy_count_leaves_locks_alone(self):
+        scheduler = CPUSlotScheduler([[0], [1]], self.lock_dir.name)
+        with mock.patch.object(scheduler, '_try_lock') as try_lock:
+            self.assertEqual(scheduler.busy_count(), 0)
+            try_lock.assert_not_called()
+
+    def test_claim_waits_for_free_slot(self):
+        scheduler = CPUSlotScheduler([[0]], self.lock_dir.name)
+        claimed = threading.Event()
+
+        def claim():
+            with scheduler.claim():
+                claimed.set()
+
+        with scheduler.claim():
+            thread = threading.Thread(target=claim)
+            thread.start()
+            self.assertFalse(claimed.wait(0.1))
+        self.assertTrue(claimed.wait(5))
+        thread.join()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dmoj.utils import helper_files
+from dmoj.utils.helper_files import mktemp
+from dmoj.utils.streamed_data import FileMapping
+
+
+class MktempTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        patcher = mock.patch.object(helper_files, '_helper_file_dir', self.dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def map_file(self, data):
+        path = os.path.join(self.dir.name, 'data')
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path, 'rb') as f:
+            return FileMapping.of(f, path)
+
+    def test_bytes(self):
+        with mktemp(b'1 2\n') as tmp:
+            self.assertEqual(os.path.dirname(tmp.name), self.dir.name)
+            with open(tmp.name, 'rb') as f:
+                self.assertEqual(f.read(), b'1 2\n')
+        self.assertFalse(os.path.exists(tmp.name))
+
+    def test_mapping_linked(self):
+        mapping = self.map_file(b'3\n')
+        with mktemp(mapping) as tmp:
+            self.assertTrue(os.path.samefile(tmp.name, mapping.path))
+        self.assertFalse(os.path.exists(tmp.name))
+        self.assertTrue(os.path.exists(mapping.path))
+
+    def test_mapping_copied(self):
+        # The file behind the mapping may be gone, as when evicted from the shared cache.
+        mapping = self.map_file(b'3\n')
+        os.unlink(mapping.path)
+        with mktemp(mapping) as tmp:
+            with open(tmp.name, 'rb') as f:
+                self.assertEqual(f.read(), b'3\n')
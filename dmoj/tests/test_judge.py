@@ -0,0 +1,499 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, Judge, JudgeWorker, JudgeWorkerPool, PooledJudgeWorker, Submission
+from dmoj.judgeenv import env
+from dmoj.problem_index import ProblemIndexDelta
+from dmoj.result import Result
+
+
+def make_submission(submission_id=1, source='print(3)'):
+    return Submission(submission_id, 'aplusb', 'PY3', source, 2, 65536, False, {})
+
+
+class FakeCase:
+    def __init__(self, position, fail=False, run_time=None):
+        self.position = position
+        self.fail = fail
+        self.run_time = run_time
+        self.points = 1
+        self.output_prefix_length = 0
+        self.config = mock.Mock(symlinks=None)
+
+
+class FakeGrader:
+    """
+    Runs and checks cases by sleeping, recording what happened when. A running case can be killed, after which it
+    finishes right away.
+    """
+
+    supports_concurrent_cases = True
+    binary = mock.Mock(supports_concurrent_cases=True)
+
+    def __init__(self, run_time=0.1, check_time=0.1):
+        self.run_time = run_time
+        self.check_time = check_time
+        self.events = []
+        self.lock = threading.Lock()
+        self.running = {}
+
+    def record(self, *event):
+        with self.lock:
+            self.events.append(event)
+
+    def run_case(self, case):
+        killed = threading.Event()
+        with self.lock:
+            self.running[threading.get_ident()] = killed
+        self.record('run', case.position)
+        try:
+            was_killed = killed.wait(self.run_time if case.run_time is None else case.run_time)
+        finally:
+            with self.lock:
+                del self.running[threading.get_ident()]
+        self.record('killed' if was_killed else 'ran', case.position)
+        return Result(case)
+
+    def check_case(self, case, result):
+        self.record('check', case.position)
+        time.sleep(self.check_time)
+        result.result_flag |= Result.WA if case.fail else Result.AC
+        return result
+
+    def grade(self, case):
+        return self.check_case(case, self.run_case(case))
+
+    def kill_running_processes(self, thread_idents=None):
+        with self.lock:
+            events = (
+                list(self.running.values())
+                if thread_idents is None
+                else [self.running[ident] for ident in thread_idents if ident in self.running]
+            )
+        for event in events:
+            event.set()
+
+
+class JudgeWorkerTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('dmoj.judge.multiprocessing.Process')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.worker = JudgeWorker(make_submission())
+        self.worker.grader = self.grader = FakeGrader()
+
+    def patch_env(self, **values):
+        for key, value in values.items():
+            patcher = mock.patch.object(env, key, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class PipelinedCheckingTest(JudgeWorkerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patch_env(pipelined_checking=True)
+
+    def test_results_in_order(self):
+        cases = [FakeCase(i) for i in range(4)]
+        start = time.monotonic()
+        results = list(self.worker._grade_group(cases, None))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([result.case for result in results], cases)
+        # Four runs and four checks take 0.8 seconds back to back, but only 0.5 seconds when overlapped.
+        self.assertLess(elapsed, 0.7)
+        # Each case is checked while the next one runs.
+        for i in range(3):
+            self.assertLess(self.grader.events.index(('check', i)), self.grader.events.index(('ran', i + 1)))
+
+    def test_runs_one_case_at_a_time(self):
+        self.grader.check_time = 0
+        list(self.worker._grade_group([FakeCase(i) for i in range(4)], None))
+        runs = [event for event in self.grader.events if event[0] in ('run', 'ran')]
+        self.assertEqual(runs, [(kind, i) for i in range(4) for kind in ('run', 'ran')])
+
+    def test_failure_in_batch_kills_next_case(self):
+        self.grader.run_time = 5
+        self.grader.check_time = 0
+        cases = [FakeCase(0, fail=True, run_time=0), FakeCase(1), FakeCase(2)]
+
+        start = time.monotonic()
+        results = self.worker._grade_group(cases, 1)
+        result = next(results)
+        self.assertTrue(result.result_flag & Result.WA)
+        results.close()
+        self.assertLess(time.monotonic() - start, 2)
+
+        # The case after the failure was either killed, or never got to start.
+        self.assertNotIn(('ran', 1), self.grader.events)
+        self.assertNotIn(('run', 2), self.grader.events)
+
+    def test_close_kills_case_running_ahead(self):
+        cases = [FakeCase(0), FakeCase(1, run_time=5), FakeCase(2)]
+        results = self.worker._grade_group(cases, None)
+        next(results)
+        start = time.monotonic()
+        results.close()
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertIn(('killed', 1), self.grader.events)
+        self.assertNotIn(('run', 2), self.grader.events)
+
+    def test_disabled(self):
+        self.patch_env(pipelined_checking=False)
+        list(self.worker._grade_group([FakeCase(i) for i in range(2)], None))
+        self.assertEqual(
+            self.grader.events,
+            [('run', 0), ('ran', 0), ('check', 0), ('run', 1), ('ran', 1), ('check', 1)],
+        )
+
+
+class ConcurrentCasesTest(JudgeWorkerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patch_env(case_concurrency=4, pipelined_checking=False)
+
+    def test_concurrent(self):
+        cases = [FakeCase(i) for i in range(4)]
+        start = time.monotonic()
+        results = list(self.worker._grade_group(cases, None))
+        self.assertEqual([result.case for result in results], cases)
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_executor_without_concurrent_cases(self):
+        self.grader.binary = mock.Mock(supports_concurrent_cases=False)
+        list(self.worker._grade_group([FakeCase(i) for i in range(2)], None))
+        self.assertEqual(
+            self.grader.events,
+            [('run', 0), ('ran', 0), ('check', 0), ('run', 1), ('ran', 1), ('check', 1)],
+        )
+
+
+class SpeculativeBatchesTest(JudgeWorkerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patch_env(case_concurrency=1, speculative_batches=4, pipelined_checking=False)
+        self.grader.check_time = 0
+
+    def test_failure_kills_later_cases(self):
+        cases = [FakeCase(0, run_time=0.3), FakeCase(1, fail=True, run_time=0), FakeCase(2, run_time=5), FakeCase(3)]
+        self.grader.run_time = 5
+
+        start = time.monotonic()
+        results = self.worker._grade_group(cases, 1)
+        self.assertEqual(next(results).result_flag, Result.AC)
+        self.assertTrue(next(results).result_flag & Result.WA)
+        self.assertLess(time.monotonic() - start, 2)
+
+        # The cases after the failure were killed, or never got to start, before the generator was closed.
+        for i in (2, 3):
+            self.assertNotIn(('ran', i), self.grader.events)
+            self.assertTrue(('killed', i) in self.grader.events or ('run', i) not in self.grader.events)
+        # The case before the failure still ran to completion.
+        self.assertIn(('ran', 0), self.grader.events)
+        results.close()
+
+    def test_cases_run_ahead(self):
+        cases = [FakeCase(i) for i in range(4)]
+        start = time.monotonic()
+        results = list(self.worker._grade_group(cases, 1))
+        self.assertEqual([result.case for result in results], cases)
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_not_outside_batches(self):
+        list(self.worker._grade_group([FakeCase(i) for i in range(2)], None))
+        self.assertEqual(
+            self.grader.events, [('run', 0), ('ran', 0), ('check', 0), ('run', 1), ('ran', 1), ('check', 1)]
+        )
+
+
+class FakePooledJudgeWorker(PooledJudgeWorker):
+    # Grades without loading the problem, reporting the pid of the worker process instead; a submission whose source is
+    # `crash` kills the process mid-grading.
+    def _grade_cases(self):
+        yield IPC.GRADING_BEGIN, (os.getpid(),)
+        if self.submission.source == 'crash':
+            os._exit(1)
+        yield IPC.GRADING_END, ()
+
+
+class JudgeWorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('dmoj.judge.PooledJudgeWorker', FakePooledJudgeWorker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = JudgeWorkerPool(1, 2)
+        self.addCleanup(self.pool.close)
+        self.pool.start()
+
+    def grade(self, submission_id, source='print(3)'):
+        worker = self.pool.acquire(make_submission(submission_id, source))
+        try:
+            messages = list(worker.communicate())
+        except EOFError:
+            messages = None
+        worker.wait_with_timeout()
+        self.pool.release(worker)
+        return worker, messages
+
+    def test_reuse(self):
+        first, messages = self.grade(1)
+        pid = first.worker_process.pid
+        self.assertEqual(messages, [(IPC.HELLO, ()), (IPC.GRADING_BEGIN, (pid,)), (IPC.GRADING_END, ())])
+
+        second, messages = self.grade(2)
+        self.assertIs(second, first)
+        self.assertEqual(messages[1], (IPC.GRADING_BEGIN, (pid,)))
+        self.assertEqual(second.jobs_done, 2)
+
+    def test_ping(self):
+        worker = self.pool._idle[0]
+        self.assertTrue(worker.is_healthy())
+        self.assertTrue(worker.is_healthy())
+
+    def test_recycle(self):
+        first, _ = self.grade(1)
+        self.grade(2)
+        third, messages = self.grade(3)
+        self.assertIsNot(third, first)
+        self.assertFalse(first.worker_process.is_alive())
+        self.assertEqual(messages[1], (IPC.GRADING_BEGIN, (third.worker_process.pid,)))
+
+    def test_idle_worker_died(self):
+        dead = self.pool._idle[0]
+        dead.worker_process.kill()
+        dead.worker_process.join()
+
+        worker, messages = self.grade(1)
+        self.assertIsNot(worker, dead)
+        self.assertEqual(messages[1], (IPC.GRADING_BEGIN, (worker.worker_process.pid,)))
+
+    def test_worker_died_grading(self):
+        dead, messages = self.grade(1, source='crash')
+        self.assertIsNone(messages)
+        dead.worker_process.join()
+
+        worker, messages = self.grade(2)
+        self.assertIsNot(worker, dead)
+        self.assertEqual(messages[1], (IPC.GRADING_BEGIN, (worker.worker_process.pid,)))
+
+
+class FakeWorker:
+    """
+    Talks to the judge like a worker process, without one. Grading goes on until `finish` is set or grading is aborted,
+    and a submission whose source is `error` fails right after the handshake.
+    """
+
+    def __init__(self, submission, problem_config=None):
+        self.submission = submission
+        self.abort_requested = False
+        self.compiled = threading.Event()
+        self.started = threading.Event()
+        self.finish = threading.Event()
+        self.done = threading.Event()
+        self._grading_slot_granted = threading.Event()
+
+    def communicate(self):
+        yield IPC.HELLO, ()
+        if self.submission.source == 'error':
+            raise RuntimeError('worker died')
+        if env.compile_slots:
+            self.compiled.set()
+            yield IPC.COMPILED, ()
+            self._grading_slot_granted.wait()
+        if not self.abort_requested:
+            self.started.set()
+            yield IPC.GRADING_BEGIN, (False,)
+            self.finish.wait()
+        if self.abort_requested:
+            yield IPC.GRADING_ABORTED, ()
+        else:
+            yield IPC.GRADING_END, ()
+
+    def start_grading(self):
+        self._grading_slot_granted.set()
+
+    def request_abort_grading(self):
+        self.abort_requested = True
+        self._grading_slot_granted.set()
+        self.finish.set()
+
+    def wait_with_timeout(self):
+        # The judge is done with the worker once it waits for it to exit.
+        self.done.set()
+
+
+class JudgeTestCase(unittest.TestCase):
+    grading_slots = 1
+    compile_slots = 0
+
+    def setUp(self):
+        for key, value in (
+            ('grading_slots', self.grading_slots),
+            ('compile_slots', self.compile_slots),
+            ('worker_pool_size', 0),
+        ):
+            patcher = mock.patch.object(env, key, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.workers = {}
+        self.workers_created = threading.Condition()
+        patcher = mock.patch('dmoj.judge.JudgeWorker', self.make_worker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.judge = Judge(mock.Mock())
+        self.addCleanup(self.finish_all)
+
+    def make_worker(self, submission, problem_config=None):
+        worker = FakeWorker(submission, problem_config)
+        with self.workers_created:
+            self.workers[submission.id] = worker
+            self.workers_created.notify_all()
+        return worker
+
+    def begin(self, submission_id, source='print(3)'):
+        thread = threading.Thread(
+            target=self.judge.begin_grading,
+            args=(make_submission(submission_id, source),),
+            kwargs={'report': mock.Mock()},
+            daemon=True,
+        )
+        thread.start()
+
+    def worker(self, submission_id):
+        with self.workers_created:
+            self.assertTrue(self.workers_created.wait_for(lambda: submission_id in self.workers, timeout=5))
+            return self.workers[submission_id]
+
+    def assert_started(self, submission_id):
+        self.assertTrue(self.worker(submission_id).started.wait(5))
+
+    def assert_not_created(self, submission_id):
+        time.sleep(0.3)
+        self.assertNotIn(submission_id, self.workers)
+
+    def finish(self, submission_id):
+        worker = self.worker(submission_id)
+        worker.finish.set()
+        self.assertTrue(worker.done.wait(5))
+
+    def finish_all(self):
+        for worker in list(self.workers.values()):
+            worker.request_abort_grading()
+
+
+class GradingSlotsTest(JudgeTestCase):
+    grading_slots = 2
+
+    def test_slots_bound_grading(self):
+        self.begin(1)
+        self.begin(2)
+        self.assert_started(1)
+        self.assert_started(2)
+        self.begin(3)
+        self.assert_not_created(3)
+
+        self.finish(1)
+        self.assert_started(3)
+
+    def test_slot_released_after_error(self):
+        self.begin(1)
+        self.begin(2, source='error')
+        self.assert_started(1)
+        self.assertTrue(self.worker(2).done.wait(5))
+        self.judge.packet_manager.internal_error_packet.assert_called_once_with(2, mock.ANY)
+
+        self.begin(3)
+        self.assert_started(3)
+
+    def test_slot_released_after_abort(self):
+        self.begin(1)
+        self.begin(2)
+        self.assert_started(1)
+        self.assert_started(2)
+        self.begin(3)
+        self.assert_not_created(3)
+
+        self.judge.abort_grading(2)
+        self.assert_started(3)
+        self.judge.packet_manager.submission_aborted_packet.assert_called_once_with(2)
+
+
+class CompileSlotsTest(JudgeTestCase):
+    compile_slots = 2
+
+    def assert_compiled(self, submission_id):
+        self.assertTrue(self.worker(submission_id).compiled.wait(5))
+
+    def begin_four(self):
+        # The first submission trades its compile slot for the grading slot, so two more compile while it's graded.
+        self.begin(1)
+        self.assert_started(1)
+        self.begin(2)
+        self.assert_compiled(2)
+        self.begin(3)
+        self.assert_compiled(3)
+        self.begin(4)
+        self.assert_not_created(4)
+
+    def test_compile_ahead_of_grading_slot(self):
+        self.begin_four()
+        self.assertFalse(self.workers[2].started.is_set() or self.workers[3].started.is_set())
+
+        self.finish(1)
+        self.assert_compiled(4)
+        time.sleep(0.3)
+        self.assertEqual(sum(self.workers[i].started.is_set() for i in (2, 3, 4)), 1)
+
+    def test_abort_waiting_for_grading_slot(self):
+        self.begin_four()
+
+        self.judge.abort_grading(2)
+        # The aborted submission gave up its compile slot, but never took the grading slot.
+        self.assert_compiled(4)
+        self.assertFalse(self.workers[2].started.is_set())
+        self.assertFalse(self.workers[3].started.is_set())
+        self.judge.packet_manager.submission_aborted_packet.assert_called_once_with(2)
+
+        self.finish(1)
+        self.assert_started(3)
+
+
+class ProblemUpdatesTest(JudgeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.judge.problem_index = mock.Mock()
+        self.judge.problem_configs = mock.Mock()
+        self.judge.updater.start()
+        self.addCleanup(self.judge.updater.join)
+        self.addCleanup(self.judge.updater_signal.set)
+        self.addCleanup(setattr, self.judge, 'updater_exit', True)
+
+    def update(self, delta, last_call):
+        # Returns once the updater has made `last_call`.
+        called = threading.Event()
+        last_call.side_effect = lambda *args: called.set()
+        self.judge.problem_index.update.return_value = delta
+        self.judge.update_problems(['/problems/aplusb/1.in'])
+        self.assertTrue(called.wait(5))
+        self.judge.problem_index.update.assert_called_once_with({'/problems/aplusb/1.in'})
+
+    def test_touched_problem_invalidated(self):
+        self.update(ProblemIndexDelta([], [], ['aplusb']), self.judge.problem_configs.invalidate)
+        self.judge.problem_configs.invalidate.assert_called_once_with(['aplusb'])
+        self.judge.packet_manager.supported_problems_delta_packet.assert_not_called()
+
+    def test_changed_problem_reported(self):
+        self.update(
+            ProblemIndexDelta([('aplusb', 2.0)], ['helloworld'], ['aplusb', 'helloworld']),
+            self.judge.packet_manager.supported_problems_delta_packet,
+        )
+        self.judge.problem_configs.invalidate.assert_called_once_with(['aplusb', 'helloworld'])
+        self.judge.packet_manager.supported_problems_delta_packet.assert_called_once_with(
+            [('aplusb', 2.0)], ['helloworld']
+        )
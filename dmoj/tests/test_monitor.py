@@ -0,0 +1,57 @@
+import threading
+import unittest
+from unittest import mock
+
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileMovedEvent
+
+from dmoj.monitor import SendProblemsHandler
+
+
+class SendProblemsHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.refresher = mock.Mock()
+        self.handler = SendProblemsHandler(self.refresher, window=0.2)
+        self.addCleanup(self.handler.stop)
+
+        self.called = threading.Event()
+        self.calls = []
+
+        def callback(paths):
+            self.calls.append(paths)
+            self.called.set()
+
+        self.handler.callback = callback
+
+    def test_burst_coalesced(self):
+        self.handler.on_any_event(FileCreatedEvent('/problems/aplusb/1.in'))
+        self.handler.on_any_event(FileModifiedEvent('/problems/aplusb/init.yml'))
+        self.handler.on_any_event(FileMovedEvent('/problems/old/init.yml', '/problems/new/init.yml'))
+        self.handler.on_any_event(FileModifiedEvent('/problems/aplusb/init.yml'))
+
+        self.assertTrue(self.called.wait(5))
+        self.assertEqual(
+            self.calls,
+            [
+                [
+                    '/problems/aplusb/1.in',
+                    '/problems/aplusb/init.yml',
+                    '/problems/new/init.yml',
+                    '/problems/old/init.yml',
+                ]
+            ],
+        )
+        self.refresher.refresh.assert_called_once_with()
+
+    def test_later_events_start_new_window(self):
+        self.handler.on_any_event(FileModifiedEvent('/problems/aplusb/init.yml'))
+        self.assertTrue(self.called.wait(5))
+        self.called.clear()
+
+        self.handler.on_any_event(FileModifiedEvent('/problems/helloworld/init.yml'))
+        self.assertTrue(self.called.wait(5))
+        self.assertEqual(self.calls, [['/problems/aplusb/init.yml'], ['/problems/helloworld/init.yml']])
+
+    def test_stop_cancels_pending_update(self):
+        self.handler.on_any_event(FileModifiedEvent('/problems/aplusb/init.yml'))
+        self.handler.stop()
+        self.assertFalse(self.called.wait(0.5))
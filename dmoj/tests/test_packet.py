@@ -0,0 +1,279 @@
+import socket
+import threading
+import time
+import unittest
+from typing import List
+from unittest import mock
+
+from dmoj.packet import PacketCodec, PacketManager, msgpack
+from dmoj.result import Result
+
+
+class RecordingPacketManager(PacketManager):
+    def __init__(self):
+        self.packets = []
+        self.sent = threading.Condition()
+        super().__init__('localhost', 0, mock.Mock(), 'judge', 'key')
+
+    def _send_packet(self, packet: dict):
+        with self.sent:
+            self.packets.append(packet)
+            self.sent.notify_all()
+
+    def wait_for_packets(self, count: int, timeout: float = 5) -> bool:
+        with self.sent:
+            return self.sent.wait_for(lambda: len(self.packets) >= count, timeout)
+
+
+class TestCaseFlushTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = RecordingPacketManager()
+        self.flusher = threading.Thread(target=self.manager._flush_testcase_queue_forever)
+        self.flusher.start()
+        self.addCleanup(self.flusher.join)
+        self.addCleanup(self.manager.close)
+
+    def queue_result(self, submission_id: int, position: int):
+        result = Result(mock.Mock(points=1, output_prefix_length=0))
+        self.manager.test_case_status_packet(submission_id, position, result)
+
+    def test_first_result_sent_immediately(self):
+        with mock.patch('dmoj.packet.env', mock.Mock(testcase_flush_window=60)):
+            start = time.monotonic()
+            self.queue_result(1, 1)
+            self.assertTrue(self.manager.wait_for_packets(1))
+            self.assertLess(time.monotonic() - start, 1)
+
+    def test_results_coalesced_within_window(self):
+        with mock.patch('dmoj.packet.env', mock.Mock(testcase_flush_window=0.5)):
+            self.queue_result(1, 1)
+            self.assertTrue(self.manager.wait_for_packets(1))
+            self.queue_result(1, 2)
+            self.queue_result(2, 1)
+            self.queue_result(1, 3)
+            self.assertTrue(self.manager.wait_for_packets(3))
+
+        packets = {packet['submission-id']: packet for packet in self.manager.packets[1:]}
+        self.assertEqual(len(self.manager.packets), 3)
+        self.assertEqual([case['position'] for case in packets[1]['cases']], [2, 3])
+        self.assertEqual([case['position'] for case in packets[2]['cases']], [1])
+
+    def test_close_wakes_idle_flusher(self):
+        self.manager.close()
+        self.flusher.join(5)
+        self.assertFalse(self.flusher.is_alive())
+
+
+class PacketCodecTest(unittest.TestCase):
+    packet = {'name': 'test-case-status', 'submission-id': 1, 'cases': [{'position': 1, 'feedback': 'ok'}]}
+
+    def assert_round_trip(self, codec: PacketCodec, packet: dict) -> bytes:
+        data = codec.encode(packet)
+        header, payload = data[: codec.SIZE_PACK.size], data[codec.SIZE_PACK.size :]
+        self.assertEqual(codec.payload_size(header), len(payload))
+        self.assertEqual(codec.decode(header, payload), packet)
+        return data
+
+    def test_default_is_compressed_json(self):
+        data = self.assert_round_trip(PacketCodec(), self.packet)
+        self.assertEqual(PacketCodec.SIZE_PACK.unpack(data[:4])[0], len(data) - 4)
+
+    def test_compression_threshold(self):
+        codec = PacketCodec(compression_threshold=1024)
+        small = self.assert_round_trip(codec, self.packet)
+        self.assertIn(b'test-case-status', small)
+
+        large = dict(self.packet, output='a' * 4096)
+        data = self.assert_round_trip(codec, large)
+        self.assertTrue(PacketCodec.SIZE_PACK.unpack(data[:4])[0] & PacketCodec.COMPRESSED_FLAG)
+        self.assertLess(len(data), 1024)
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        self.assert_round_trip(PacketCodec('msgpack'), self.packet)
+        self.assert_round_trip(PacketCodec('msgpack', compression_threshold=0), self.packet)
+
+    def test_unsupported_encoding(self):
+        self.assertRaises(ValueError, PacketCodec, 'xml')
+
+
+class FakeSite:
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.server.settimeout(5)
+        self.port = self.server.getsockname()[1]
+        self.conn = None
+        self.codec = PacketCodec()
+
+    def accept(self):
+        self.conn, _ = self.server.accept()
+        self.conn.settimeout(5)
+        self.input = self.conn.makefile('rb')
+
+    def send(self, packet: dict):
+        self.conn.sendall(self.codec.encode(packet))
+
+    def receive(self) -> dict:
+        header = self.input.read(PacketCodec.SIZE_PACK.size)
+        return self.codec.decode(header, self.input.read(self.codec.payload_size(header)))
+
+    def drop_connection(self):
+        if self.conn is not None:
+            self.input.close()
+            self.conn.close()
+            self.conn = None
+        self.codec = PacketCodec()
+
+    def close(self):
+        self.drop_connection()
+        self.server.close()
+
+
+class NetworkTest(unittest.TestCase):
+    site_codec = PacketCodec()
+
+    def setUp(self):
+        patcher = mock.patch('dmoj.packet.get_runtime_versions', return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.site = FakeSite()
+        self.addCleanup(self.site.close)
+
+        self.judge = mock.Mock(grading_slots=1, current_submissions=[])
+        self.judge.problem_index.problems.return_value = [('aplusb', 1.0)]
+        self.manager = PacketManager('127.0.0.1', self.site.port, self.judge, 'judge', 'key')
+        self.runner = threading.Thread(target=self.manager.run)
+        self.runner.start()
+        self.addCleanup(self.runner.join, 5)
+        self.addCleanup(self.manager.close)
+
+        self.handshake = self.accept_judge(last_seq=0)
+
+    def accept_judge(self, **reply) -> dict:
+        self.site.accept()
+        handshake = self.site.receive()
+        self.assertEqual(handshake['name'], 'handshake')
+        self.assertEqual(handshake['id'], 'judge')
+        reply.setdefault('encoding', self.site_codec.encoding)
+        reply.setdefault('compression-threshold', self.site_codec.compression_threshold)
+        self.site.send({'name': 'handshake-success', **{key.replace('_', '-'): value for key, value in reply.items()}})
+        self.site.codec = self.site_codec
+        return handshake
+
+    def test_ping_while_judge_busy(self):
+        aborting = threading.Event()
+        finish_abort = threading.Event()
+        self.addCleanup(finish_abort.set)
+
+        def abort_grading(submission_id):
+            aborting.set()
+            finish_abort.wait(5)
+
+        self.judge.abort_grading.side_effect = abort_grading
+        self.site.send({'name': 'terminate-submission', 'submission-id': 1})
+        self.assertTrue(aborting.wait(5))
+
+        self.site.send({'name': 'ping', 'when': 1.5})
+        response = self.site.receive()
+        self.assertEqual(response['name'], 'ping-response')
+        self.assertEqual(response['when'], 1.5)
+
+    def test_packets_from_other_threads(self):
+        threads = [threading.Thread(target=self.manager.submission_acknowledged_packet, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        received = {self.site.receive()['submission-id'] for _ in threads}
+        self.assertEqual(received, set(range(10)))
+
+    def send_acknowledgements(self, count: int) -> List[dict]:
+        for i in range(count):
+            self.manager.submission_acknowledged_packet(i)
+        return [self.site.receive() for _ in range(count)]
+
+    def test_resume_session(self):
+        self.manager.fallback = 0
+        self.assertEqual([packet['seq'] for packet in self.send_acknowledgements(3)], [1, 2, 3])
+
+        # The site only got around to processing the first two packets before the connection dropped.
+        self.site.drop_connection()
+        handshake = self.accept_judge(last_seq=2)
+        self.assertEqual(handshake['session-id'], self.handshake['session-id'])
+
+        self.assertEqual(self.site.receive()['seq'], 3)
+        self.assertEqual([packet['seq'] for packet in self.send_acknowledgements(1)], [4])
+        self.judge.abort_grading.assert_not_called()
+
+    def test_acknowledged_packets_not_replayed(self):
+        self.manager.fallback = 0
+        self.send_acknowledgements(3)
+        self.site.send({'name': 'ping', 'when': 1, 'last-seq': 3})
+        self.assertEqual(self.site.receive()['name'], 'ping-response')
+
+        self.site.drop_connection()
+        self.accept_judge(last_seq=4)
+        self.assertEqual([packet['seq'] for packet in self.send_acknowledgements(1)], [5])
+
+    def test_session_not_resumed(self):
+        self.manager.fallback = 0
+        self.send_acknowledgements(3)
+
+        aborted = threading.Event()
+        self.judge.abort_grading.side_effect = aborted.set
+
+        self.site.drop_connection()
+        self.accept_judge()
+        self.assertTrue(aborted.wait(5))
+        self.assertEqual([packet['seq'] for packet in self.send_acknowledgements(1)], [4])
+
+    def test_forgotten_submission_not_reported(self):
+        self.manager.fallback = 0
+        self.judge.current_submissions = [mock.Mock(id=7)]
+        aborted = threading.Event()
+        self.judge.abort_grading.side_effect = aborted.set
+
+        self.site.drop_connection()
+        self.accept_judge()
+        self.assertTrue(aborted.wait(5))
+        # The grading thread has yet to notice the abort, and still reports on the submission.
+        self.manager.grading_end_packet(7)
+        self.manager.submission_acknowledged_packet(8)
+        self.assertEqual(self.site.receive()['submission-id'], 8)
+
+        self.site.send({'name': 'ping', 'when': 1})
+        self.assertEqual(self.site.receive()['submission-ids'], [])
+
+    def test_problem_deltas(self):
+        self.manager.supported_problems_delta_packet([('helloworld', 2.0)], ['aplusb'])
+        packet = self.site.receive()
+        self.assertEqual(packet['name'], 'supported-problems')
+        self.assertEqual(packet['problems'], [['aplusb', 1.0]])
+
+        self.manager.fallback = 0
+        self.site.drop_connection()
+        self.accept_judge(last_seq=1, problem_deltas=True)
+        # Once the ping is answered, the handshake reply has certainly been processed.
+        self.site.send({'name': 'ping', 'when': 1})
+        self.assertEqual(self.site.receive()['name'], 'ping-response')
+
+        self.manager.supported_problems_delta_packet([('helloworld', 2.0)], ['aplusb'])
+        packet = self.site.receive()
+        self.assertEqual(packet['name'], 'supported-problems-delta')
+        self.assertEqual(packet['updated'], [['helloworld', 2.0]])
+        self.assertEqual(packet['removed'], ['aplusb'])
+
+    def test_disconnect(self):
+        self.site.send({'name': 'disconnect'})
+        self.runner.join(5)
+        self.assertFalse(self.runner.is_alive())
+        self.judge.abort_grading.assert_called_once_with()
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class NegotiatedNetworkTest(NetworkTest):
+    site_codec = PacketCodec('msgpack', compression_threshold=1024)
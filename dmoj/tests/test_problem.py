@@ -1,9 +1,24 @@
+import concurrent.futures
+import mmap
 import os
+import pickle
+import tempfile
 import unittest
+import zipfile
 from unittest import mock
 
 from dmoj.config import InvalidInitException
-from dmoj.problem import Problem, ProblemDataManager
+from dmoj.cptbox.utils import MemoryIO
+from dmoj.judgeenv import env
+from dmoj.problem import (
+    ArchiveCache,
+    GeneratorPrefetcher,
+    Problem,
+    ProblemConfigCache,
+    ProblemDataManager,
+    TestCase as ProblemTestCase,
+)
+from dmoj.utils.shared_data_cache import SharedDataCache
 
 
 class ProblemTest(unittest.TestCase):
@@ -113,3 +128,367 @@ class ProblemTest(unittest.TestCase):
 
     def tearDown(self):
         self.data_patch.stop()
+
+
+class ProblemConfigCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.write_init('archive: data.zip\n')
+        with zipfile.ZipFile(os.path.join(self.root.name, 'data.zip'), 'w') as archive:
+            for name in ('1.in', '1.out', '2.in', '2.out'):
+                archive.writestr(name, '')
+
+        root_patch = mock.patch('dmoj.problem.get_problem_root', return_value=self.root.name)
+        root_patch.start()
+        self.addCleanup(root_patch.stop)
+
+        self.cache = ProblemConfigCache(2)
+
+    def write_init(self, content):
+        with open(os.path.join(self.root.name, 'init.yml'), 'w') as f:
+            f.write(content)
+
+    def test_cached_config_reused(self):
+        problem = Problem('test', 2, 16384, {})
+        self.cache.store('test', problem.cached_config)
+        # Cached configurations travel to the worker through a pipe.
+        cached_config = pickle.loads(pickle.dumps(self.cache.get('test')))
+
+        with mock.patch('dmoj.problem.yaml.safe_load') as safe_load:
+            cached = Problem('test', 2, 16384, {}, cached_config)
+            safe_load.assert_not_called()
+        self.assertEqual(cached.config.test_cases.unwrap(), problem.config.test_cases.unwrap())
+        self.assertEqual(len(cached.config.test_cases), 2)
+        self.assertEqual(cached.config.archive, 'data.zip')
+
+    def test_listed_test_cases(self):
+        self.write_init('archive: data.zip\ntest_cases:\n- {in: 1.in, out: 1.out, points: 5}\n')
+        problem = Problem('test', 2, 16384, {})
+        self.assertIsNone(problem.cached_config.test_cases)
+
+        cached = Problem('test', 2, 16384, {}, pickle.loads(pickle.dumps(problem.cached_config)))
+        self.assertEqual(cached.config.test_cases.unwrap(), [{'in': '1.in', 'out': '1.out', 'points': 5}])
+
+    def test_changed_files_not_used(self):
+        self.cache.store('test', Problem('test', 2, 16384, {}).cached_config)
+        self.write_init('archive: data.zip\npoints: 2\n')
+        self.assertIsNone(self.cache.get('test'))
+
+    def test_changed_listing_not_used(self):
+        os.unlink(os.path.join(self.root.name, 'data.zip'))
+        self.write_init('test_cases:\n- {in: 1.in, out: 1.out, points: 5}\n')
+        for name in ('1.in', '1.out'):
+            open(os.path.join(self.root.name, name), 'w').close()
+        os.utime(self.root.name, ns=(0, 0))
+        self.cache.store('test', Problem('test', 2, 16384, {}).cached_config)
+        self.assertIsNotNone(self.cache.get('test'))
+
+        # Without an archive, adding a file to the problem directory is enough to make the configuration stale.
+        open(os.path.join(self.root.name, 'checker.py'), 'w').close()
+        self.assertIsNone(self.cache.get('test'))
+
+    def test_invalidate(self):
+        self.cache.store('test', Problem('test', 2, 16384, {}).cached_config)
+        self.cache.invalidate(['test'])
+        self.assertIsNone(self.cache.get('test'))
+
+    def test_least_recently_used_evicted(self):
+        cached_config = Problem('test', 2, 16384, {}).cached_config
+        for problem_id in ('a', 'b'):
+            self.cache.store(problem_id, cached_config)
+        self.cache.get('a')
+        self.cache.store('c', cached_config)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        with open(os.path.join(self.root.name, 'init.yml'), 'w') as f:
+            f.write('archive: data.zip\n')
+        self.write_archive({'1.in': '1 2\r\n', '1.out': '3', '2.in': '', '2.out': ''})
+
+        for target, new in (
+            ('dmoj.problem.get_problem_root', mock.Mock(return_value=self.root.name)),
+            ('dmoj.problem.get_archive_cache', mock.Mock(return_value=ArchiveCache(2))),
+        ):
+            patcher = mock.patch(target, new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_archive(self, members):
+        with zipfile.ZipFile(os.path.join(self.root.name, 'data.zip'), 'w') as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+
+    def make_case(self):
+        problem = Problem('test', 2, 16384, {})
+        return ProblemTestCase(0, None, problem.config.test_cases[0], problem)
+
+    def test_archive_reused(self):
+        archive = Problem('test', 2, 16384, {}).problem_data.archive
+        self.assertIs(Problem('test', 2, 16384, {}).problem_data.archive, archive)
+
+        self.write_archive({'1.in': '', '1.out': ''})
+        problem = Problem('test', 2, 16384, {})
+        self.assertIsNot(problem.problem_data.archive, archive)
+        self.assertEqual(len(problem.config.test_cases), 1)
+
+    def test_evicted_archive_closed_once_released(self):
+        cache = ArchiveCache(1)
+        archive = cache.open(os.path.join(self.root.name, 'data.zip'))
+        other_path = os.path.join(self.root.name, 'other.zip')
+        with zipfile.ZipFile(other_path, 'w'):
+            pass
+        other = cache.open(other_path)
+        # Evicted, but still in use.
+        self.assertIsNotNone(archive.fp)
+        cache.release(archive)
+        self.assertIsNone(archive.fp)
+
+        # Still cached, so kept open for the next user.
+        cache.release(other)
+        self.assertIsNotNone(other.fp)
+        self.assertIs(cache.open(other_path), other)
+
+    def test_uncached_archive_closed(self):
+        cache = ArchiveCache(0)
+        archive = cache.open(os.path.join(self.root.name, 'data.zip'))
+        cache.release(archive)
+        self.assertIsNone(archive.fp)
+
+    def test_problem_releases_archive(self):
+        cache = ArchiveCache(0)
+        with mock.patch('dmoj.problem.get_archive_cache', return_value=cache):
+            problem = Problem('test', 2, 16384, {})
+            archive = problem.problem_data.archive
+            self.assertIsNotNone(archive.fp)
+            problem.close()
+            self.assertIsNone(archive.fp)
+
+            self.write_archive({})
+            with self.assertRaises(InvalidInitException):
+                Problem('test', 2, 16384, {})
+            self.assertEqual(cache._users, {})
+
+    def test_prefetch(self):
+        case = self.make_case()
+        case.prefetch_archive_data()
+        with mock.patch.object(case.problem.problem_data.archive, 'open') as open_member:
+            self.assertEqual(case.input_data(), b'1 2\n')
+            self.assertEqual(case.output_data(), b'3\n')
+            open_member.assert_not_called()
+
+        case.free_data()
+        self.assertEqual(case._prefetched, {})
+
+    def test_prefetch_into_shared_cache(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        cache = SharedDataCache(cache_dir.name, 1024)
+
+        with mock.patch('dmoj.problem.get_shared_data_cache', return_value=cache):
+            case = self.make_case()
+            case.prefetch_archive_data()
+            self.assertEqual(case._prefetched, {})
+            self.assertIn(case._data_key('1.in'), cache)
+            self.assertEqual(cache.get(case._data_key('1.out')), b'3\n')
+
+
+class SharedTestDataTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        with open(os.path.join(self.root.name, 'init.yml'), 'w') as f:
+            f.write('test_cases:\n- {in: 1.in, out: 1.out}\n')
+        with open(os.path.join(self.root.name, '1.in'), 'wb') as f:
+            f.write(b'1 2\r\n3')
+        with open(os.path.join(self.root.name, '1.out'), 'wb') as f:
+            f.write(b'6')
+
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        for target, value in (
+            ('dmoj.problem.get_problem_root', self.root.name),
+            ('dmoj.problem.get_shared_data_cache', SharedDataCache(self.cache_dir.name, 1024)),
+        ):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def make_case(self):
+        problem = Problem('test', 2, 16384, {})
+        return ProblemTestCase(1, None, problem.config.test_cases[0], problem)
+
+    def test_data_shared(self):
+        case = self.make_case()
+        self.assertEqual(case.input_data(), b'1 2\n3\n')
+        self.assertEqual(case.output_data(), b'6\n')
+
+        case = self.make_case()
+        with mock.patch.object(case, '_normalize') as normalize:
+            self.assertEqual(case.input_data(), b'1 2\n3\n')
+            self.assertEqual(case.output_data(), b'6\n')
+            normalize.assert_not_called()
+
+    def test_input_file(self):
+        case = self.make_case()
+        with case.input_file() as input_file:
+            # The data wasn't shared yet, so it's copied, and shared along the way.
+            self.assertIsInstance(input_file, MemoryIO)
+            self.assertEqual(input_file.read(), b'1 2\n3\n')
+
+        case = self.make_case()
+        with mock.patch.object(case, 'input_data') as input_data, case.input_file() as input_file:
+            # Shared data is handed out as is, so the submission reads it without the judge reading it at all.
+            input_data.assert_not_called()
+            self.assertTrue(input_file.name.startswith(self.cache_dir.name))
+            self.assertEqual(input_file.read(), b'1 2\n3\n')
+
+        with mock.patch('dmoj.problem.get_shared_data_cache', return_value=None):
+            with case.input_file() as input_file:
+                self.assertEqual(input_file.read(), b'1 2\n3\n')
+                with self.assertRaises(IOError):
+                    input_file.write(b'4')
+
+    def test_streamed(self):
+        case = self.make_case()
+        with mock.patch.object(env, 'test_data_stream_threshold', 1):
+            input_buffer, output_buffer = case.input_buffer(), case.output_buffer()
+            self.assertIsInstance(input_buffer, mmap.mmap)
+            self.assertEqual(input_buffer[:], b'1 2\n3\n')
+            self.assertEqual(output_buffer[:], b'6\n')
+            with case.input_file() as input_file:
+                self.assertEqual(input_file.read(), b'1 2\n3\n')
+
+        paths = [data.path for data in case._streamed.values()]
+        case.free_data()
+        self.assertFalse(any(map(os.path.exists, paths)))
+
+    def test_shared_buffers(self):
+        # The first case to read the data shares it, and later ones map it.
+        self.assertEqual(self.make_case().input_buffer(), b'1 2\n3\n')
+        case = self.make_case()
+        input_buffer, output_buffer = case.input_buffer(), case.output_buffer()
+        self.assertTrue(input_buffer.path.startswith(self.cache_dir.name))
+        self.assertEqual(input_buffer[:], b'1 2\n3\n')
+        self.assertEqual(output_buffer[:], b'6\n')
+
+    def test_changed_data_not_shared(self):
+        self.assertEqual(self.make_case().input_data(), b'1 2\n3\n')
+        with open(os.path.join(self.root.name, '1.in'), 'wb') as f:
+            f.write(b'4 5 6')
+        self.assertEqual(self.make_case().input_data(), b'4 5 6\n')
+
+
+class GeneratorCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        with open(os.path.join(self.root.name, 'init.yml'), 'w') as f:
+            f.write('generator: gen.cpp\ntest_cases:\n- {generator_args: [1]}\n- {generator_args: [2]}\n')
+        self.write_generator('int main() {}')
+
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+        self.compile = mock.Mock()
+        self.compile.return_value.launch.return_value.unsafe_communicate.return_value = (b'1 2', b'3')
+        for target, new in (
+            ('dmoj.problem.get_problem_root', mock.Mock(return_value=self.root.name)),
+            ('dmoj.problem.get_generator_cache', mock.Mock(return_value=SharedDataCache(self.cache_dir.name, 1024))),
+            ('dmoj.problem.compile_with_auxiliary_files', self.compile),
+            ('dmoj.problem.parse_helper_file_error', mock.Mock()),
+        ):
+            patcher = mock.patch(target, new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_generator(self, source):
+        with open(os.path.join(self.root.name, 'gen.cpp'), 'w') as f:
+            f.write(source)
+
+    def generate(self, position=0):
+        problem = Problem('test', 2, 16384, {})
+        case = ProblemTestCase(position, None, problem.config.test_cases[position], problem)
+        return case.input_data(), case.output_data()
+
+    def test_output_reused(self):
+        self.assertEqual(self.generate(), (b'1 2\n', b'3\n'))
+        self.assertEqual(self.generate(), (b'1 2\n', b'3\n'))
+        self.compile.assert_called_once()
+
+    def test_keyed_by_args_and_source(self):
+        self.generate(0)
+        self.generate(1)
+        self.assertEqual(self.compile.call_count, 2)
+
+        self.write_generator('int main() { return 0; }')
+        self.generate(0)
+        self.assertEqual(self.compile.call_count, 3)
+
+
+class CheckerResolutionTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        with open(os.path.join(self.root.name, 'init.yml'), 'w') as f:
+            f.write(
+                'checker: {name: floats, args: {precision: 3}}\n'
+                'test_cases:\n- {in: 1.in, out: 1.out}\n- {in: 2.in, out: 2.out}\n'
+                '- {in: 3.in, out: 3.out, checker: identical}\n'
+            )
+
+        root_patch = mock.patch('dmoj.problem.get_problem_root', return_value=self.root.name)
+        root_patch.start()
+        self.addCleanup(root_patch.stop)
+        self.problem = Problem('test', 2, 16384, {})
+
+    def test_resolved_once_per_problem(self):
+        first, second, third = (
+            ProblemTestCase(i, None, config, self.problem) for i, config in enumerate(self.problem.config.test_cases)
+        )
+        self.assertIs(first.checker(), second.checker())
+        self.assertEqual(first.checker().keywords, {'precision': 3})
+        self.assertIsNot(third.checker(), first.checker())
+
+    def test_helper_compiled_once(self):
+        with mock.patch('dmoj.problem.compile_with_auxiliary_files') as compile:
+            for _ in range(2):
+                self.problem.get_helper_executor(['checker.cpp'], [], None, 10)
+            self.problem.get_helper_executor(['checker.cpp'], ['-DDEBUG'], None, 10)
+        self.assertEqual(compile.call_count, 2)
+
+
+class GeneratorPrefetcherTest(unittest.TestCase):
+    def test_prefetches_upcoming_cases(self):
+        cases = [mock.Mock() for _ in range(5)]
+        prefetcher = GeneratorPrefetcher(cases, 2)
+        self.addCleanup(prefetcher.close)
+        for position in range(2):
+            prefetcher.advance(position)
+            concurrent.futures.wait(prefetcher._futures)
+
+        self.assertEqual([case.prefetch_data.call_count for case in cases], [0, 1, 1, 1, 0])
+
+    def test_skips_cases_already_graded(self):
+        cases = [mock.Mock() for _ in range(3)]
+        prefetcher = GeneratorPrefetcher(cases, 1)
+        with prefetcher._lock:
+            prefetcher._position = 1
+        prefetcher._prefetch(1)
+        prefetcher.close()
+
+        cases[1].prefetch_data.assert_not_called()
+
+    def test_failures_left_for_grading(self):
+        case = mock.Mock()
+        case.prefetch_data.side_effect = RuntimeError('generator crashed')
+        prefetcher = GeneratorPrefetcher([mock.Mock(), case], 1)
+        prefetcher._prefetch(1)
+        prefetcher.close()
+
+        case.prefetch_data.assert_called_once_with()
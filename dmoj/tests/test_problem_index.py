@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dmoj.problem_index import ProblemIndex
+
+
+class ProblemIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+
+        patcher = mock.patch('dmoj.problem_index.get_problem_roots', return_value=[self.root.name])
+        self.get_problem_roots = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.index = ProblemIndex()
+
+    def add_problem(self, problem: str, mtime: float) -> str:
+        problem_dir = os.path.join(self.root.name, problem)
+        os.makedirs(problem_dir, exist_ok=True)
+        with open(os.path.join(problem_dir, 'init.yml'), 'w'):
+            pass
+        os.utime(problem_dir, (mtime, mtime))
+        return problem_dir
+
+    def test_initial_scan(self):
+        self.add_problem('aplusb', 1)
+        self.add_problem('helloworld', 2)
+        os.mkdir(os.path.join(self.root.name, 'not_a_problem'))
+
+        self.assertEqual(sorted(self.index.problems()), [('aplusb', 1), ('helloworld', 2)])
+
+    def test_update(self):
+        aplusb = self.add_problem('aplusb', 1)
+        self.add_problem('helloworld', 2)
+        self.index.problems()
+
+        self.add_problem('new', 3)
+        os.utime(aplusb, (4, 4))
+        delta = self.index.update([os.path.join(self.root.name, 'new'), os.path.join(aplusb, 'init.yml')])
+        self.assertEqual(sorted(delta.updated), [('aplusb', 4), ('new', 3)])
+        self.assertEqual(delta.removed, [])
+        self.assertEqual(sorted(delta.touched), ['aplusb', 'new'])
+
+        os.unlink(os.path.join(aplusb, 'init.yml'))
+        delta = self.index.update([os.path.join(aplusb, 'init.yml'), self.root.name])
+        self.assertEqual(delta, ([], ['aplusb'], ['aplusb']))
+        self.assertEqual(sorted(self.index.problems()), [('helloworld', 2), ('new', 3)])
+
+    def test_unchanged_problem_touched(self):
+        aplusb = self.add_problem('aplusb', 1)
+        self.index.problems()
+        # The problem's files changed, but its mtime didn't, so the site needn't hear about it.
+        self.assertEqual(self.index.update([os.path.join(aplusb, '1.in')]), ([], [], ['aplusb']))
+
+    def test_non_problem_not_touched(self):
+        self.index.problems()
+        os.mkdir(os.path.join(self.root.name, 'not_a_problem'))
+        self.assertEqual(self.index.update([os.path.join(self.root.name, 'not_a_problem', 'x')]), ([], [], []))
+
+    def test_path_outside_roots_rescans(self):
+        self.index.problems()
+        self.assertEqual(self.get_problem_roots.call_count, 1)
+
+        other = tempfile.TemporaryDirectory()
+        self.addCleanup(other.cleanup)
+        self.get_problem_roots.return_value = [self.root.name, other.name]
+        os.mkdir(os.path.join(other.name, 'elsewhere'))
+        with open(os.path.join(other.name, 'elsewhere', 'init.yml'), 'w'):
+            pass
+
+        delta = self.index.update([os.path.join(other.name, 'elsewhere')])
+        self.assertEqual([problem for problem, _ in delta.updated], ['elsewhere'])
+        self.assertEqual(self.get_problem_roots.call_count, 2)
@@ -0,0 +1,69 @@
+import fcntl
+import os
+import tempfile
+import unittest
+
+from dmoj.utils.shared_data_cache import SharedDataCache
+
+
+class SharedDataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = SharedDataCache(self.directory.name, 10)
+
+    def age(self, key, seconds):
+        path = self.cache._entry_path(key)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+    def test_round_trip(self):
+        self.assertIsNone(self.cache.get(('1.in', 1)))
+        self.cache.put(('1.in', 1), b'1 2\n')
+        self.assertIn(('1.in', 1), self.cache)
+        self.assertEqual(self.cache.get(('1.in', 1)), b'1 2\n')
+        self.assertIsNone(self.cache.get(('1.in', 2)))
+
+    def test_open(self):
+        self.assertIsNone(self.cache.open('1.in'))
+        self.cache.put('1.in', b'1 2\n')
+        with self.cache.open('1.in') as f:
+            self.assertEqual(f.read(), b'1 2\n')
+
+    def test_shared_between_caches(self):
+        # Caches in different processes share entries through the directory alone.
+        self.cache.put('1.in', b'1 2\n')
+        self.assertEqual(SharedDataCache(self.directory.name, 10).get('1.in'), b'1 2\n')
+
+    def test_too_large(self):
+        self.cache.put('1.in', b'x' * 11)
+        self.assertIsNone(self.cache.get('1.in'))
+
+    def test_least_recently_read_evicted(self):
+        self.cache.put('a', b'aaaa')
+        self.age('a', 20)
+        self.cache.put('b', b'bbbb')
+        self.age('b', 10)
+        self.assertEqual(self.cache.get('a'), b'aaaa')
+
+        self.cache.put('c', b'cccc')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), b'aaaa')
+        self.assertEqual(self.cache.get('c'), b'cccc')
+
+    def test_abandoned_writes_removed(self):
+        abandoned = os.path.join(self.directory.name, '.abandoned')
+        with open(abandoned, 'wb') as f:
+            f.write(b'xxxx')
+        writing = open(os.path.join(self.directory.name, '.writing'), 'wb')
+        self.addCleanup(writing.close)
+        fcntl.flock(writing, fcntl.LOCK_EX)
+        writing.write(b'xxxx')
+        writing.flush()
+
+        self.cache.put('a', b'aaaa')
+        self.assertFalse(os.path.exists(abandoned))
+        self.assertTrue(os.path.exists(writing.name))
+        # The file still being written counts towards the budget.
+        self.cache.put('b', b'bbbb')
+        self.assertEqual(sum(key in self.cache for key in 'ab'), 1)
@@ -0,0 +1,30 @@
+import signal
+import unittest
+from unittest import mock
+
+from dmoj.graders.standard import StandardGrader
+from dmoj.result import Result
+
+
+class PopulateResultTest(unittest.TestCase):
+    def populate(self, sig, is_ole):
+        def populate_result(error, result, process):
+            # As the executor reports a process killed by a signal.
+            result.result_flag |= Result.RTE | (Result.OLE if process.is_ole else 0)
+
+        grader = StandardGrader.__new__(StandardGrader)
+        grader.binary = mock.Mock()
+        grader.binary.populate_result.side_effect = populate_result
+        result = Result(mock.Mock())
+        grader.populate_result(b'', result, mock.Mock(signal=sig, is_ole=is_ole))
+        return result.readable_codes()
+
+    def test_output_limit_in_file(self):
+        self.assertEqual(self.populate(signal.SIGXFSZ, is_ole=True), ['OLE'])
+
+    def test_file_size_limit(self):
+        # Going over the size limit of any other file is still a runtime error.
+        self.assertEqual(self.populate(signal.SIGXFSZ, is_ole=False), ['RTE'])
+
+    def test_killed_after_output_limit(self):
+        self.assertEqual(self.populate(signal.SIGSEGV, is_ole=True), ['OLE', 'RTE'])
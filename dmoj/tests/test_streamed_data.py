@@ -0,0 +1,49 @@
+import io
+import os
+import unittest
+
+from dmoj.utils.streamed_data import StreamedData, normalize_newlines
+
+
+class NormalizeNewlinesTest(unittest.TestCase):
+    def normalize(self, data, chunk_size=2):
+        dest = io.BytesIO()
+        normalize_newlines(io.BytesIO(data), dest, chunk_size)
+        return dest.getvalue()
+
+    def test_matches_in_memory_normalization(self):
+        for data, expected in (
+            (b'', b''),
+            (b'a', b'a\n'),
+            (b'a\n', b'a\n'),
+            (b'a\r\nb\r\n', b'a\nb\n'),
+            (b'a\rb\r', b'a\nb\n'),
+            (b'a\r\r\nb', b'a\n\nb\n'),
+            (b'\r', b'\n'),
+        ):
+            for chunk_size in (1, 2, 3, 1024):
+                self.assertEqual(self.normalize(data, chunk_size), expected, (data, chunk_size))
+
+    def test_crlf_split_across_chunks(self):
+        self.assertEqual(self.normalize(b'a\r\nb', chunk_size=2), b'a\nb\n')
+
+
+class StreamedDataTest(unittest.TestCase):
+    def test_file_backed(self):
+        data = StreamedData.from_stream(io.BytesIO(b'1 2\r\n3'))
+        self.assertEqual(data.buffer()[:], b'1 2\n3\n')
+        with data.open() as f:
+            self.assertEqual(f.read(), b'1 2\n3\n')
+
+        data.close()
+        self.assertFalse(os.path.exists(data.path))
+
+    def test_binary(self):
+        data = StreamedData.from_stream(io.BytesIO(b'\r\n\0'), normalize=False)
+        self.addCleanup(data.close)
+        self.assertEqual(data.buffer()[:], b'\r\n\0')
+
+    def test_empty(self):
+        data = StreamedData.from_stream(io.BytesIO(b''))
+        self.addCleanup(data.close)
+        self.assertEqual(data.buffer(), b'')
@@ -0,0 +1,130 @@
+import fcntl
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence, Union
+
+from dmoj.judgeenv import env
+
+# How long to sleep between scans while every slot is busy.
+SLOT_POLL_INTERVAL = 0.01
+# Number of CPUs a `cpu_set_t` can hold; the sandbox can't pin to CPUs beyond it.
+CPU_SETSIZE = 1024
+
+
+class CPUSlotScheduler:
+    """
+    Leases disjoint sets of CPUs to sandboxed processes, so that concurrently running submissions never share a core
+    and their timings stay comparable to a lone run.
+
+    A slot is held through a `flock` on a per-slot lock file. This makes the lease visible to every judge and worker
+    process on the host, and the kernel drops the lease on its own should the holder die.
+    """
+
+    def __init__(self, slots: Sequence[List[int]], lock_dir: str) -> None:
+        self.slots = [list(cpus) for cpus in slots]
+        self.lock_dir = lock_dir
+        os.makedirs(lock_dir, exist_ok=True)
+        self._lock_paths = [os.path.join(lock_dir, 'cpu-%s.lock' % '-'.join(map(str, cpus))) for cpus in self.slots]
+
+    def _try_lock(self, index: int) -> Optional[int]:
+        fd = os.open(self._lock_paths[index], os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    @contextmanager
+    def claim(self) -> Iterator[List[int]]:
+        # Start scanning at a random slot, so that leases spread out instead of everyone contending for the first one.
+        start = random.randrange(len(self.slots))
+        while True:
+            for offset in range(len(self.slots)):
+                index = (start + offset) % len(self.slots)
+                fd = self._try_lock(index)
+                if fd is None:
+                    continue
+
+                try:
+                    yield self.slots[index]
+                finally:
+                    # Closing the descriptor releases the lock.
+                    os.close(fd)
+                return
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    def busy_count(self) -> Optional[int]:
+        """
+        Returns the number of slots leased right now, or None if that can't be told.
+
+        The locks are looked up in `/proc/locks` rather than taken, since taking one, however briefly, could make a
+        concurrent `claim` pass over a free slot.
+        """
+        try:
+            with open('/proc/locks') as f:
+                # e.g. "1: FLOCK  ADVISORY  WRITE 1234 fd:01:5678 0 EOF"; processes waiting on a lock are listed after
+                # "->" instead.
+                held = {fields[5] for fields in map(str.split, f) if len(fields) > 5 and fields[1] == 'FLOCK'}
+        except OSError:
+            return None
+
+        busy = 0
+        for path in self._lock_paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Never claimed.
+                continue
+            if '%02x:%02x:%d' % (os.major(stat.st_dev), os.minor(stat.st_dev), stat.st_ino) in held:
+                busy += 1
+        return busy
+
+
+def parse_cpu_slots(config: Sequence[Union[int, Sequence[int]]]) -> List[List[int]]:
+    cpu_limit = min(CPU_SETSIZE, os.cpu_count() or CPU_SETSIZE)
+    slots = []
+    for entry in config:
+        cpus = [entry] if isinstance(entry, int) else list(entry)
+        if not cpus or not all(isinstance(cpu, int) and cpu >= 0 for cpu in cpus):
+            raise ValueError(f'invalid sandbox CPU slot: {entry!r}')
+        if max(cpus) >= cpu_limit:
+            raise ValueError(f'sandbox CPU slot {entry!r} names a CPU this host does not have')
+        slots.append(cpus)
+
+    seen = [cpu for cpus in slots for cpu in cpus]
+    if len(seen) != len(set(seen)):
+        raise ValueError('sandbox CPU slots must not overlap')
+    return slots
+
+
+_scheduler: Optional[CPUSlotScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_cpu_slot_scheduler() -> Optional[CPUSlotScheduler]:
+    global _scheduler
+
+    if not env.sandbox_cpus:
+        return None
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            lock_dir = os.path.join(env.tempdir or tempfile.gettempdir(), 'dmoj-cpu-slots')
+            _scheduler = CPUSlotScheduler(parse_cpu_slots(env.sandbox_cpus), lock_dir)
+        return _scheduler
+
+
+@contextmanager
+def claim_cpu_slot() -> Iterator[Optional[List[int]]]:
+    scheduler = get_cpu_slot_scheduler()
+    if scheduler is None:
+        yield None
+        return
+
+    with scheduler.claim() as cpus:
+        yield cpus
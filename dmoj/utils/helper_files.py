@@ -1,9 +1,11 @@
 import os
 import tempfile
+import threading
 from typing import IO, List, Optional, Sequence, TYPE_CHECKING
 
 from dmoj.cptbox.filesystem_policies import RecursiveDir
 from dmoj.error import InternalError
+from dmoj.judgeenv import env
 from dmoj.result import Result
 from dmoj.utils.os_ext import strsignal
 
@@ -12,8 +14,47 @@ if TYPE_CHECKING:
     from dmoj.executors.base_executor import BaseExecutor
 
 
-def mktemp(data: bytes) -> IO:
-    tmp = tempfile.NamedTemporaryFile()
+_helper_file_dir: Optional[str] = None
+_helper_file_dir_lock = threading.Lock()
+
+
+def get_helper_file_dir() -> str:
+    global _helper_file_dir
+
+    with _helper_file_dir_lock:
+        if _helper_file_dir is None:
+            directory = env.helper_file_dir
+            if not directory:
+                # Prefer a memory-backed filesystem, so that handing over a large output never touches the disk.
+                base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+                directory = os.path.join(base, 'dmoj-helper-files')
+            os.makedirs(directory, exist_ok=True)
+            _helper_file_dir = directory
+        return _helper_file_dir
+
+
+def mktemp(data) -> IO:
+    """
+    Returns a temporary file holding `data`, named by its `name`, for a helper program to read. The file is removed when
+    closed.
+
+    Data mapped from a file, such as streamed or shared test data, is hard linked rather than copied where possible.
+    """
+    tmp = tempfile.NamedTemporaryFile(dir=get_helper_file_dir())
+
+    path = getattr(data, 'path', None)
+    if path is not None:
+        link_path = tmp.name + '.link'
+        try:
+            os.link(path, link_path)
+        except OSError:
+            # Likely on another filesystem, or already evicted from the shared cache, so copy from the mapping instead.
+            pass
+        else:
+            # The link takes the temporary file's place, and is removed with it.
+            os.replace(link_path, tmp.name)
+            return tmp
+
     tmp.write(data)
     tmp.flush()
     return tmp
@@ -63,7 +104,7 @@ def compile_with_auxiliary_files(
 
     executor = executors.executors[lang].Executor
 
-    kwargs = {'fs': executor.fs + [RecursiveDir(tempfile.gettempdir())]}
+    kwargs = {'fs': executor.fs + [RecursiveDir(tempfile.gettempdir()), RecursiveDir(get_helper_file_dir())]}
 
     if issubclass(executor, CompiledExecutor):
         kwargs['compiler_time_limit'] = compiler_time_limit
@@ -0,0 +1,174 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Dict, Hashable, IO, Optional, Union
+
+from dmoj.judgeenv import env
+from dmoj.utils.streamed_data import FileMapping
+
+# Prefix of files in the cache directory that aren't cache entries: the eviction lock, and entries being written.
+_RESERVED_PREFIX = '.'
+_LOCK_NAME = _RESERVED_PREFIX + 'lock'
+
+
+class SharedDataCache:
+    """
+    A host-wide cache of test data, kept as files in a directory.
+
+    Every worker grading a problem would otherwise read each input and output file (or decompress each archive member,
+    or run each generator) and normalize it for itself. Here, the first worker to need the data stores it, and every
+    later one, in any judge on the host, reads it back. Test data files are cached in a shared memory filesystem, and
+    generator output, which is far more expensive to recreate, on disk.
+
+    Entries are written to a temporary file and renamed into place, so readers never see a partial entry. Reading an
+    entry bumps its mtime, and whoever adds an entry evicts the least recently read ones until the cache fits in
+    `budget` bytes again. An entry that is evicted while being read stays readable until closed. Writers hold a `flock`
+    on their temporary file until it's renamed, so that eviction can tell those left by a worker that died halfway, and
+    remove them.
+    """
+
+    def __init__(self, directory: str, budget: int) -> None:
+        self.directory = directory
+        self.budget = budget
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, _LOCK_NAME)
+
+    def _entry_path(self, key: Hashable) -> str:
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return os.path.exists(self._entry_path(key))
+
+    def open(self, key: Hashable) -> Optional[IO[bytes]]:
+        path = self._entry_path(key)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted in the meantime, but we can still read it.
+            pass
+        return f
+
+    def map(self, key: Hashable) -> Optional[Union[bytes, FileMapping]]:
+        """
+        Returns a read-only mapping of the entry for `key`, or None if there isn't one.
+        """
+        f = self.open(key)
+        if f is None:
+            return None
+        with f:
+            return FileMapping.of(f, f.name)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        f = self.open(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        if len(data) > self.budget:
+            return
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=_RESERVED_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.write(data)
+                f.flush()
+                os.rename(temp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+
+        self._evict()
+
+    def _evict(self) -> None:
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+            entries = []
+            pending = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name == _LOCK_NAME:
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if not entry.name.startswith(_RESERVED_PREFIX):
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    elif not self._remove_abandoned(entry.path):
+                        pending += stat.st_size
+
+            total = pending + sum(size for _, size, _ in entries)
+            if total <= self.budget:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.budget:
+                    break
+        finally:
+            # Closing the descriptor releases the lock.
+            os.close(fd)
+
+    @staticmethod
+    def _remove_abandoned(temp_path: str) -> bool:
+        try:
+            with open(temp_path, 'rb') as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Nobody is writing this file any more, so its writer died before renaming it into place.
+                os.unlink(temp_path)
+        except BlockingIOError:
+            return False
+        except OSError:
+            # Renamed into place or removed in the meantime.
+            pass
+        return True
+
+
+def default_shared_data_cache_dir() -> str:
+    # Prefer a memory-backed filesystem, falling back on wherever temporary files go.
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'dmoj-test-data')
+
+
+_caches: Dict[str, SharedDataCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(directory: str, budget: int) -> Optional[SharedDataCache]:
+    if budget <= 0:
+        return None
+
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = _caches[directory] = SharedDataCache(directory, budget)
+        return cache
+
+
+def get_shared_data_cache() -> Optional[SharedDataCache]:
+    return _get_cache(env.test_data_cache_dir or default_shared_data_cache_dir(), env.test_data_cache_size)
+
+
+def get_generator_cache() -> Optional[SharedDataCache]:
+    directory = env.generator_cache_dir or os.path.join(env.tempdir or tempfile.gettempdir(), 'dmoj-generator-cache')
+    return _get_cache(directory, env.generator_cache_size)
@@ -0,0 +1,108 @@
+import mmap
+import os
+import shutil
+import tempfile
+from typing import IO, Optional, Union
+
+# How much test data is read into memory at once while streaming it into a file.
+STREAM_CHUNK_SIZE = 1048576
+
+
+def normalize_newlines(source: IO[bytes], dest: IO[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+    """
+    Copies `source` to `dest` a chunk at a time, normalizing newlines exactly as `TestCase._normalize` does: every
+    newline format (\\r\\n, \\r, \\n) becomes \\n, and non-empty data gains a trailing newline if it lacks one.
+    """
+    last = b''
+    # A \r at the end of a chunk may be the first half of a \r\n, so it's held back until the next chunk is read.
+    pending_cr = False
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if pending_cr:
+            chunk = b'\r' + chunk
+        pending_cr = chunk.endswith(b'\r')
+        if pending_cr:
+            chunk = chunk[:-1]
+
+        chunk = chunk.replace(b'\r\n', b'\r').replace(b'\r', b'\n')
+        if chunk:
+            dest.write(chunk)
+            last = chunk[-1:]
+
+    if pending_cr:
+        dest.write(b'\n')
+    elif last and last != b'\n':
+        dest.write(b'\n')
+
+
+class FileMapping(mmap.mmap):
+    """
+    A read-only mapping of a file, which remembers the file's path, so that the file can be handed on as is rather than
+    copied.
+    """
+
+    path: str
+
+    @classmethod
+    def of(cls, f: IO[bytes], path: str) -> Union[bytes, 'FileMapping']:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            # Empty files can't be mapped.
+            return b''
+        mapping = cls(f.fileno(), size, access=mmap.ACCESS_READ)
+        mapping.path = path
+        return mapping
+
+
+class StreamedData:
+    """
+    Test data that lives in a temporary file, rather than in memory.
+
+    Multi-gigabyte cases would otherwise be held in memory several times over: as read, as normalized, and as copied
+    for the submission and the checker. Instead, the data is normalized into a file a chunk at a time; the submission
+    reads it from the file, and checkers see it through a read-only mapping, which the kernel pages in and out as
+    needed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._buffer: Optional[Union[bytes, FileMapping]] = None
+
+    @classmethod
+    def from_stream(cls, source: IO[bytes], normalize: bool = True) -> 'StreamedData':
+        fd, path = tempfile.mkstemp(prefix='dmoj-data-')
+        try:
+            with os.fdopen(fd, 'wb') as dest:
+                if normalize:
+                    normalize_newlines(source, dest)
+                else:
+                    shutil.copyfileobj(source, dest, STREAM_CHUNK_SIZE)
+            return cls(path)
+        except BaseException:
+            os.unlink(path)
+            raise
+
+    def open(self) -> IO[bytes]:
+        return open(self.path, 'rb')
+
+    def buffer(self) -> Union[bytes, FileMapping]:
+        if not self.size:
+            return b''
+        if self._buffer is None:
+            with self.open() as f:
+                self._buffer = FileMapping.of(f, self.path)
+        return self._buffer
+
+    def close(self) -> None:
+        # The mapping stays valid after the file is gone, for as long as anyone still references it.
+        self._buffer = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __del__(self):
+        self.close()
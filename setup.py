@@ -165,6 +165,7 @@ setup(
     packages=find_packages(),
     package_data={
         'dmoj.cptbox': ['syscalls/aliases.list', 'syscalls/*.tbl'],
+        'dmoj.contrib': ['*.h'],
         'dmoj.executors': ['java_sandbox.jar', '*.policy'],
     },
     entry_points={
@@ -177,7 +178,7 @@ setup(
     ext_modules=cythonize(extensions),
     install_requires=['watchdog', 'pyyaml', 'termcolor', 'pygments', 'setproctitle', 'pylru'],
     tests_require=['requests', 'parameterized'],
-    extras_require={'test': ['requests', 'parameterized']},
+    extras_require={'test': ['requests', 'parameterized'], 'msgpack': ['msgpack']},
     cmdclass={'build_ext': build_ext_dmoj},
     author='DMOJ Team',
     author_email='contact@dmoj.ca',
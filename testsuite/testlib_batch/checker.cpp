@@ -0,0 +1,9 @@
+#include "testlib_batch.h"
+
+int main(int argc, char *argv[]) {
+  registerTestlibCmd(argc, argv);
+  long long expected = ans.readLong(), found = ouf.readLong();
+  if (expected != found)
+    quitf(_wa, "expected %lld, found %lld", expected, found);
+  quitf(_ok, "%lld", found);
+}